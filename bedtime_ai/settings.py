@@ -310,8 +310,24 @@ STRIPE_PRICE_IDS = {
 STRIPE_SUCCESS_URL = 'http://write-456414.uc.r.appspot.com/payment/success/'  # Update with your domain
 STRIPE_CANCEL_URL = 'http://write-456414.uc.r.appspot.com/payment/cancel/'  # Update with your domain
 
+# PDF export settings
+# Story images are resampled to this DPI for their placed size and recompressed at this JPEG quality
+PDF_IMAGE_DPI = 150
+PDF_IMAGE_QUALITY = 80
+
 # Media files configuration
 
+# Story media (covers, chapter images, audio, PDFs)
+# 'gcs' serves from the write-res bucket, or from STORY_MEDIA_BASE_URL if a CDN sits in front of it;
+# 'local' writes under MEDIA_ROOT for offline runs and tests.
+STORY_MEDIA_BACKEND = os.environ.get('STORY_MEDIA_BACKEND', 'gcs')
+STORY_MEDIA_BUCKET = 'write-res'
+STORY_MEDIA_BASE_URL = os.environ.get('STORY_MEDIA_BASE_URL', f'https://storage.googleapis.com/{STORY_MEDIA_BUCKET}')
+# Media URLs carry the blob generation, so uploads can be cached forever
+STORY_MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Hand out V4 signed URLs instead of public ones (requires a service account that can sign)
+STORY_MEDIA_SIGNED_URLS = False
+STORY_MEDIA_SIGNED_URL_TTL = 3600  # seconds
 
 # Timeout settings
 CONN_MAX_AGE = 60
@@ -0,0 +1,119 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from gemini.models import Story
+from gemini.jobs import requeue_failed_stories
+from gemini.tier_utils import settle_story_quotas
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Rows changed per UPDATE/DELETE statement
+BULK_CHUNK_SIZE = 1000
+# Setting a story back to 'processing' would leave it with no job and no quota slot;
+# failed stories are put back into generation by the 'requeue' action instead
+BULK_SETTABLE_STATUSES = [choice for choice, _ in Story.STATUS_CHOICES if choice != 'processing']
+
+
+def select_stories(status=None, older_than_hours=None, user_id=None, tier=None):
+    """
+    Returns the stories matching the admin filters; filters left as None are not applied.
+
+    Args:
+        status (str): Story status, e.g. 'processing'
+        older_than_hours (float): Only stories not updated for this many hours
+        user_id (int): Only this user's stories
+        tier (str): Only stories of users on this tier
+    """
+    stories = Story.objects.all()
+    if status:
+        stories = stories.filter(status=status)
+    if older_than_hours is not None:
+        stories = stories.filter(updated_at__lt=timezone.now() - timedelta(hours=older_than_hours))
+    if user_id:
+        stories = stories.filter(adventure__user_id=user_id)
+    if tier:
+        stories = stories.filter(adventure__user__profile__tier=tier)
+    return stories
+
+
+def iter_id_chunks(stories, chunk_size=BULK_CHUNK_SIZE):
+    """Yields the matching story ids in ascending chunks, re-querying after each one."""
+    last_id = 0
+    ids = stories.order_by('id').values_list('id', flat=True)
+    while True:
+        chunk = list(ids.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1]
+        yield chunk
+
+
+def bulk_update_story_status(stories, new_status, error='', chunk_size=BULK_CHUNK_SIZE):
+    """
+    Sets the status of every matching story, one UPDATE per chunk.
+    Open quota reservations are settled like a finished generation would:
+    committed for 'completed', released otherwise.
+
+    Returns:
+        int: Number of stories updated
+
+    Raises:
+        ValueError: For 'processing' or an unknown status
+    """
+    if new_status == 'processing':
+        raise ValueError("Stories can't be set to 'processing'; use the 'requeue' action to regenerate failed stories")
+    if new_status not in BULK_SETTABLE_STATUSES:
+        raise ValueError(f"Invalid status value: {new_status}")
+
+    updated = 0
+    for chunk in iter_id_chunks(stories, chunk_size):
+        fields = {'status': new_status, 'updated_at': timezone.now()}
+        if error:
+            fields['error'] = error
+        updated += Story.objects.filter(id__in=chunk).update(**fields)
+        settle_story_quotas(chunk, 'committed' if new_status == 'completed' else 'released')
+
+    logger.info(f"Bulk status update set {updated} stories to '{new_status}'")
+    return updated
+
+
+def bulk_delete_stories(stories, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Deletes every matching story, one chunk at a time. Delete signals still run,
+    so story counters and storage cleanup stay correct.
+
+    Returns:
+        int: Number of stories deleted
+    """
+    deleted = 0
+    for chunk in iter_id_chunks(stories, chunk_size):
+        # One settle per chunk instead of one per story in the pre_delete receiver
+        settle_story_quotas(chunk, 'released')
+        deleted += Story.objects.filter(id__in=chunk).delete()[1].get(Story._meta.label, 0)
+
+    logger.info(f"Bulk delete removed {deleted} stories")
+    return deleted
+
+
+def bulk_story_action(stories, action, new_status=None, error='', chunk_size=BULK_CHUNK_SIZE):
+    """
+    Applies one admin action to the matching stories.
+
+    Args:
+        action (str): 'set_status', 'delete' or 'requeue'
+
+    Returns:
+        dict: Counts of affected stories for the response
+    """
+    if action == 'set_status':
+        return {'updated': bulk_update_story_status(stories, new_status, error, chunk_size)}
+    if action == 'delete':
+        return {'deleted': bulk_delete_stories(stories, chunk_size)}
+    if action == 'requeue':
+        requeued, skipped = requeue_failed_stories(stories, chunk_size)
+        return {'requeued': requeued, 'skipped': skipped}
+    raise ValueError(f"Invalid action: {action}")
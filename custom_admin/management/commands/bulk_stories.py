@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from custom_admin.bulk import BULK_CHUNK_SIZE, BULK_SETTABLE_STATUSES, bulk_story_action, select_stories
+from gemini.models import Story
+
+
+class Command(BaseCommand):
+    help = 'Changes the status of, deletes or requeues every story matching the filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['set_status', 'delete', 'requeue'])
+        parser.add_argument('--status', choices=[choice for choice, _ in Story.STATUS_CHOICES],
+                            help='Only stories with this status')
+        parser.add_argument('--older-than-hours', type=float, help='Only stories not updated for this many hours')
+        parser.add_argument('--user-id', type=int, help="Only this user's stories")
+        parser.add_argument('--tier', help='Only stories of users on this tier')
+        parser.add_argument('--new-status', choices=BULK_SETTABLE_STATUSES,
+                            help="Status to set with set_status; use the requeue action to regenerate stories")
+        parser.add_argument('--error', default='', help='Error message recorded with set_status')
+        parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE, help='Rows changed per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the matching stories')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'set_status' and not options['new_status']:
+            raise CommandError('set_status needs --new-status')
+
+        stories = select_stories(
+            status=options['status'],
+            older_than_hours=options['older_than_hours'],
+            user_id=options['user_id'],
+            tier=options['tier']
+        )
+        matched = stories.count()
+        if options['dry_run']:
+            self.stdout.write(f"{matched} stories match")
+            return
+
+        # Requeued generations run in this process, so the command returns once they have finished
+        result = bulk_story_action(
+            stories,
+            options['action'],
+            new_status=options['new_status'],
+            error=options['error'],
+            chunk_size=options['chunk_size']
+        )
+        counts = ', '.join(f"{count} {key}" for key, count in result.items())
+        self.stdout.write(self.style.SUCCESS(f"{matched} stories matched: {counts}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from custom_admin.stats import STATS_DAYS, refresh_admin_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the admin dashboard totals and daily stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=STATS_DAYS, help='Recent days of daily stats to recompute')
+
+    def handle(self, *args, **options):
+        snapshot = refresh_admin_stats(options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed stats: {snapshot.user_count} users, {snapshot.adventure_count} adventures, "
+            f"{snapshot.story_count} stories"
+        ))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('stories_created', models.PositiveIntegerField(default=0)),
+                ('stories_completed', models.PositiveIntegerField(default=0)),
+                ('stories_failed', models.PositiveIntegerField(default=0)),
+                ('input_token_count', models.BigIntegerField(default=0)),
+                ('output_token_count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('adventure_count', models.PositiveIntegerField(default=0)),
+                ('story_count', models.PositiveIntegerField(default=0)),
+                ('stories_by_status', models.JSONField(default=dict)),
+                ('stories_by_tier', models.JSONField(default=dict)),
+                ('users_by_tier', models.JSONField(default=dict)),
+                ('input_token_count', models.BigIntegerField(default=0)),
+                ('output_token_count', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,39 @@
 from django.db import models
 
-# Create your models here.
+
+class StatsSnapshot(models.Model):
+    """
+    Site-wide totals for the admin dashboard, recomputed by custom_admin.stats.refresh_admin_stats
+    so the dashboard reads one row instead of counting whole tables.
+    """
+    user_count = models.PositiveIntegerField(default=0)
+    adventure_count = models.PositiveIntegerField(default=0)
+    story_count = models.PositiveIntegerField(default=0)
+    stories_by_status = models.JSONField(default=dict)  # {'completed': 120, 'failed': 3, ...}
+    stories_by_tier = models.JSONField(default=dict)  # {'free': 80, 'daily': 40, ...}
+    users_by_tier = models.JSONField(default=dict)
+    input_token_count = models.BigIntegerField(default=0)
+    output_token_count = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats as of {self.refreshed_at:%Y-%m-%d %H:%M}"
+
+
+class DailyStats(models.Model):
+    """Stories, tokens and sign-ups for one day."""
+    date = models.DateField(unique=True)
+    new_users = models.PositiveIntegerField(default=0)
+    stories_created = models.PositiveIntegerField(default=0)
+    stories_completed = models.PositiveIntegerField(default=0)
+    stories_failed = models.PositiveIntegerField(default=0)
+    input_token_count = models.BigIntegerField(default=0)
+    output_token_count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = "Daily stats"
+
+    def __str__(self):
+        return f"Stats for {self.date}"
@@ -0,0 +1,111 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from gemini.models import Adventure, Story
+from user_profile.models import UserProfile
+from .models import StatsSnapshot, DailyStats
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# --- Configuration ---
+
+# Days of DailyStats recomputed on every refresh; older days don't change
+STATS_DAYS = 30
+# The dashboard refreshes the snapshot in the background once it is older than this
+STATS_MAX_AGE = timedelta(minutes=15)
+
+
+def refresh_snapshot():
+    """Recomputes the site totals with one grouped query per breakdown."""
+    stories_by_status = dict(Story.objects.values_list('status').annotate(total=Count('id')))
+    stories_by_tier = dict(
+        Story.objects.values_list('adventure__user__profile__tier').annotate(total=Count('id'))
+    )
+    users_by_tier = dict(UserProfile.objects.values_list('tier').annotate(total=Count('id')))
+    tokens = Story.objects.aggregate(
+        input_tokens=Sum('input_token_count'),
+        output_tokens=Sum('output_token_count')
+    )
+
+    snapshot = StatsSnapshot.objects.order_by('-id').first() or StatsSnapshot()
+    snapshot.user_count = User.objects.count()
+    snapshot.adventure_count = Adventure.objects.count()
+    snapshot.story_count = sum(stories_by_status.values())
+    snapshot.stories_by_status = stories_by_status
+    snapshot.stories_by_tier = {str(tier or 'none'): total for tier, total in stories_by_tier.items()}
+    snapshot.users_by_tier = users_by_tier
+    snapshot.input_token_count = tokens['input_tokens'] or 0
+    snapshot.output_token_count = tokens['output_tokens'] or 0
+    snapshot.save()
+    return snapshot
+
+
+def refresh_daily_stats(days=STATS_DAYS):
+    """Recomputes the last `days` days of DailyStats and upserts them."""
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    since_start = timezone.make_aware(datetime.combine(since, time.min))
+
+    rows = {day: DailyStats(date=day) for day in (since + timedelta(days=i) for i in range(days))}
+
+    story_days = Story.objects.filter(created_at__gte=since_start).annotate(
+        day=TruncDate('created_at')
+    ).values('day').annotate(
+        created=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+        failed=Count('id', filter=Q(status='failed')),
+        input_tokens=Sum('input_token_count'),
+        output_tokens=Sum('output_token_count')
+    )
+    for entry in story_days:
+        row = rows.get(entry['day'])
+        if row is None:
+            continue
+        row.stories_created = entry['created']
+        row.stories_completed = entry['completed']
+        row.stories_failed = entry['failed']
+        row.input_token_count = entry['input_tokens'] or 0
+        row.output_token_count = entry['output_tokens'] or 0
+
+    user_days = User.objects.filter(date_joined__gte=since_start).annotate(
+        day=TruncDate('date_joined')
+    ).values('day').annotate(total=Count('id'))
+    for entry in user_days:
+        if entry['day'] in rows:
+            rows[entry['day']].new_users = entry['total']
+
+    DailyStats.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=[
+            'new_users', 'stories_created', 'stories_completed', 'stories_failed',
+            'input_token_count', 'output_token_count', 'updated_at'
+        ]
+    )
+    return len(rows)
+
+
+def refresh_admin_stats(days=STATS_DAYS):
+    """Refreshes the snapshot and the recent daily rows."""
+    snapshot = refresh_snapshot()
+    refresh_daily_stats(days)
+    logger.info(f"Admin stats refreshed: {snapshot.user_count} users, {snapshot.story_count} stories")
+    return snapshot
+
+
+def refresh_admin_stats_job():
+    """Thread target for refreshing stale stats after a dashboard load."""
+    try:
+        refresh_admin_stats()
+    except Exception as e:
+        logger.error(f"Error refreshing admin stats: {str(e)}", exc_info=True)
+    finally:
+        connection.close()
@@ -1,3 +1,131 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from gemini.models import Adventure, Story, QuotaReservation
+from gemini.media import get_media_backend
+from gemini.story_store import StoryArtifactStore, get_legacy_story_prefix
+from gemini.tier_utils import get_usage_counter, reserve_story_quota
+from user_profile.models import UserProfile, UsageCounter
+from .bulk import bulk_delete_stories, bulk_update_story_status
+from .views import KeysetPage, get_story_storage_info, get_user_story_listings, list_data
+
+
+def create_reserved_story(username='reader'):
+    """A free-tier user with one generating story that holds a quota reservation."""
+    user = get_user_model().objects.create(username=username)
+    profile = UserProfile.objects.create(user=user, tier='free')
+    get_usage_counter(profile)
+    adventure = Adventure.objects.create(user=user, adventure_number=1)
+    story = Story.objects.create(adventure=adventure, prompt='A story', status='processing')
+    allowed, counter = reserve_story_quota(profile)
+    QuotaReservation.objects.create(story=story, counter=counter)
+    return user, story
+
+
+class SingleStoryAdminTests(TestCase):
+    def setUp(self):
+        self.user, self.story = create_reserved_story()
+
+    def counter(self):
+        return UsageCounter.objects.get(user=self.user)
+
+    def test_completing_one_story_commits_its_reservation(self):
+        self.assertEqual(bulk_update_story_status(Story.objects.filter(pk=self.story.pk), 'completed'), 1)
+        counter = self.counter()
+        self.assertEqual(counter.stories_reserved, 0)
+        self.assertEqual(counter.stories_created, 1)
+
+    def test_failing_one_story_releases_its_reservation(self):
+        bulk_update_story_status(Story.objects.filter(pk=self.story.pk), 'failed')
+        counter = self.counter()
+        self.assertEqual(counter.stories_reserved, 0)
+        self.assertEqual(counter.stories_created, 0)
+
+    def test_processing_is_rejected(self):
+        with self.assertRaises(ValueError):
+            bulk_update_story_status(Story.objects.filter(pk=self.story.pk), 'processing')
+
+    def test_deleting_one_story_releases_its_reservation(self):
+        self.assertEqual(bulk_delete_stories(Story.objects.filter(pk=self.story.pk)), 1)
+        self.assertEqual(self.counter().stories_reserved, 0)
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create(username='reader')
+        adventure = Adventure.objects.create(user=user, adventure_number=1)
+        Story.objects.bulk_create([Story(adventure=adventure, prompt=f'Story {i}') for i in range(7)])
+        self.ids = list(Story.objects.order_by('-id').values_list('id', flat=True))
+
+    def stories(self):
+        return Story.objects.order_by('-id')
+
+    def test_pages_walk_forward_and_back_by_cursor(self):
+        first = KeysetPage(self.stories(), None, 3)
+        self.assertEqual([s.id for s in first], self.ids[:3])
+        self.assertFalse(first.has_previous())
+        self.assertEqual(first.next_page_number(), self.ids[2])
+
+        second = KeysetPage(self.stories(), first.next_page_number(), 3)
+        self.assertEqual([s.id for s in second], self.ids[3:6])
+        self.assertIsNone(second.previous_page_number())
+
+        last = KeysetPage(self.stories(), second.next_page_number(), 3)
+        self.assertEqual([s.id for s in last], self.ids[6:])
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.previous_page_number(), second.after)
+
+    def test_list_data_renders_a_keyset_page_obj(self):
+        request = RequestFactory().get('/list/story/', {'after': self.ids[1]})
+        request.user = get_user_model().objects.create(username='admin', is_superuser=True)
+        with mock.patch('custom_admin.views.render') as render:
+            list_data(request, 'story')
+        context = render.call_args[0][2]
+        self.assertEqual([s.id for s in context['page_obj']], self.ids[2:])
+        self.assertEqual(context['page_obj'].object_list[0].adventure.user.username, 'reader')
+
+
+class StoryStorageInfoTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(STORY_MEDIA_BACKEND='local', MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_media_backend.cache_clear()
+        self.addCleanup(get_media_backend.cache_clear)
+
+        self.user, self.story = create_reserved_story()
+        self.store = StoryArtifactStore.for_ids(
+            self.user.id, self.story.adventure_id, self.story.id, user_name=self.user.username
+        )
+
+    def storage_info(self):
+        listings = get_user_story_listings(self.user.id, self.user.username)
+        self.store.set_listing(listings.get(self.store.prefix, []))
+        self.store.set_legacy_listing(listings.get(self.store.legacy_prefix, []))
+        return get_story_storage_info(self.store)
+
+    def test_unmigrated_audio_and_bytes_are_reported(self):
+        legacy_prefix = get_legacy_story_prefix(self.user.username, self.story.adventure_id, self.story.id)
+        get_media_backend().upload(f"{legacy_prefix}/audio.mp3", b'audio', 'audio/mpeg')
+        self.store.upload(self.store.cover_key(), b'cover', 'image/jpeg')
+
+        audio_info, storage_info = self.storage_info()
+        self.assertEqual(audio_info, {'exists': True, 'size': 5})
+        self.assertEqual(storage_info, {'objects': 2, 'size': 10})
+
+    @override_settings(STORY_MEDIA_LEGACY_FALLBACK=False)
+    def test_legacy_folder_is_skipped_once_the_fallback_is_off(self):
+        legacy_prefix = get_legacy_story_prefix(self.user.username, self.story.adventure_id, self.story.id)
+        get_media_backend().upload(f"{legacy_prefix}/audio.mp3", b'audio', 'audio/mpeg')
+
+        self.store = StoryArtifactStore.for_ids(
+            self.user.id, self.story.adventure_id, self.story.id, user_name=self.user.username
+        )
+        audio_info, storage_info = self.storage_info()
+        self.assertFalse(audio_info['exists'])
+        self.assertEqual(storage_info['objects'], 0)
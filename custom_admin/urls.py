@@ -8,6 +8,7 @@ urlpatterns = [
     path('modify-user/<int:user_id>/', views.modify_user_profile, name='modify_user_profile'),
     path('delete-user/<int:user_id>/', views.delete_user, name='delete_user'),
     path('get-instances/', views.get_model_instances, name='get_instances'),
+    path('export-instances/', views.export_model_instances, name='export_instances'),
     path('get-instance-data/', views.get_instance_data, name='get_instance_data'),
     path('get-adventure-stories/', views.get_adventure_stories, name='get_adventure_stories'),
     path('list/<str:model_name>/', views.list_data, name='list_data'),
@@ -17,4 +18,6 @@ urlpatterns = [
     path('get_adventure_details/<int:adventure_id>/', views.get_adventure_details, name='get_adventure_details'),
     path('get_story_details/<int:story_id>/', views.get_story_details, name='get_story_details'),
     path('update_story_status/<int:story_id>/', views.update_story_status, name='update_story_status'),
+    path('bulk_stories/', views.bulk_stories, name='bulk_stories'),
+    path('model-costs/', views.model_cost_report, name='model_cost_report'),
 ]
@@ -2,7 +2,8 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required
 from django.apps import apps
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from access.models import ContactModel
 from gemini.models import Adventure, Story, StoryImages, ChapterImage
@@ -12,12 +13,21 @@ from django.contrib import messages
 from django.shortcuts import redirect
 from django.utils import timezone
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Count, Q
+from django.db.models import Q, Sum
 from django.core.paginator import Paginator
 from django.http import HttpResponseForbidden, HttpResponseNotAllowed
 import json
 import logging
-from google.cloud import storage
+import threading
+from datetime import timedelta
+from gemini.artifacts import collect_unreferenced_artifacts_job
+from gemini.story_content import get_raw_content
+from gemini.story_store import StoryArtifactStore, get_legacy_user_prefix, get_user_prefix, legacy_fallback_enabled
+from gemini.media import get_media_backend
+from gemini.model_calls import get_model_cost_report
+from .models import StatsSnapshot, DailyStats
+from .bulk import bulk_delete_stories, bulk_story_action, bulk_update_story_status, select_stories
+from .stats import STATS_DAYS, STATS_MAX_AGE, refresh_admin_stats, refresh_admin_stats_job
 from django.contrib.auth import authenticate, login
 
 # Get the custom User model
@@ -30,24 +40,199 @@ def is_approved_admin(user):
         return False
     return user.email == 'recdohbargus@gmail.com' or user.is_superuser
 
+# Sort keys accepted by the dashboard user list, prefix with '-' for descending
+DASHBOARD_USER_SORTS = {
+    'joined': 'date_joined',
+    'username': 'username',
+    'email': 'email',
+    'last_login': 'last_login',
+    'tier': 'profile__tier',
+}
+DASHBOARD_PAGE_SIZE = 25
+
+# Models the admin browser can list. Rows are read as .values() of these fields, and the
+# label reproduces the model's __str__ from them, so no row loads its related objects.
+ADMIN_MODEL_VIEWS = {
+    'auth.User': {
+        'model': User,
+        'fields': ['id', 'username', 'email', 'date_joined', 'profile__tier'],
+        'search': ['username', 'email'],
+        'label': '{username}',
+    },
+    'user_profile.UserProfile': {
+        'model': UserProfile,
+        'fields': ['id', 'user_id', 'user__username', 'name', 'tier', 'stories_created'],
+        'search': ['user__username', 'name'],
+        'label': "{user__username}'s profile",
+    },
+    'gemini.Adventure': {
+        'model': Adventure,
+        'fields': ['id', 'adventure_number', 'user_id', 'user__username', 'story_count', 'created_at'],
+        'search': ['user__username', 'world_data'],
+        'label': "{user__username}'s Adventure {adventure_number}",
+    },
+    'gemini.Story': {
+        'model': Story,
+        'fields': ['id', 'title', 'status', 'adventure_id', 'adventure__adventure_number',
+                   'adventure__user__username', 'created_at'],
+        'search': ['title', 'summary', 'adventure__user__username'],
+        'label': "{title} ({adventure__user__username}'s Adventure {adventure__adventure_number})",
+    },
+    'gemini.StoryImages': {
+        'model': StoryImages,
+        'fields': ['id', 'story_id'],
+        'search': [],
+        'label': 'Images for Story {story_id}',
+    },
+}
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 500
+LIST_PAGE_SIZE = 20
+# Rows fetched per query while streaming an export
+ADMIN_EXPORT_CHUNK_SIZE = 2000
+
+def get_admin_rows(model_path, search=''):
+    """
+    Returns the projected rows of an admin model, newest first, or None for an unknown model.
+
+    Args:
+        model_path (str): Key of ADMIN_MODEL_VIEWS, e.g. 'gemini.Story'
+        search (str): Optional text matched against the model's search fields in SQL
+    """
+    view = ADMIN_MODEL_VIEWS.get(model_path)
+    if view is None:
+        return None
+    rows = view['model'].objects.all()
+    if search and view['search']:
+        query = Q()
+        for field in view['search']:
+            query |= Q(**{f"{field}__icontains": search})
+        rows = rows.filter(query)
+    elif search and search.isdigit():
+        rows = rows.filter(pk=int(search))
+    return rows.order_by('-id').values(*view['fields'])
+
+def get_admin_label(model_path, row):
+    return ADMIN_MODEL_VIEWS[model_path]['label'].format(**row)
+
+def get_keyset_page(rows, after=None, limit=ADMIN_PAGE_SIZE):
+    """
+    Returns one page of rows ordered by descending id, starting below the `after` id.
+
+    Returns:
+        tuple: (list of rows, id to pass as `after` for the next page, or None on the last page)
+    """
+    if after:
+        rows = rows.filter(id__lt=after)
+    page = list(rows[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        return page, last['id'] if isinstance(last, dict) else last.pk
+    return page, None
+
+class KeysetPage:
+    """
+    A keyset page shaped like Django's Page, so page_obj templates keep working without a COUNT or OFFSET.
+    Page "numbers" are `after` cursors: next_page_number() and previous_page_number() return the
+    id to pass back, and None means the first page.
+    """
+    def __init__(self, rows, after=None, limit=ADMIN_PAGE_SIZE):
+        self.object_list, self.next_after = get_keyset_page(rows, after, limit)
+        self.after = after
+        self.previous_after = None
+        if after:
+            # The previous page starts below the (limit + 1)th smallest id at or above the cursor
+            above = rows.filter(id__gte=after).order_by('id').values_list('id', flat=True)[limit:limit + 1]
+            self.previous_after = next(iter(above), None)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_after is not None
+
+    def has_previous(self):
+        return self.after is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.next_after
+
+    def previous_page_number(self):
+        return self.previous_after
+
+def get_page_args(request):
+    """Reads the `after` and `limit` query parameters, clamping the limit."""
+    after = request.GET.get('after')
+    after = int(after) if after and after.isdigit() else None
+    limit = request.GET.get('limit', '')
+    limit = int(limit) if limit.isdigit() else ADMIN_PAGE_SIZE
+    return after, max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
+
+def get_dashboard_stats():
+    """
+    Returns the stats snapshot, refreshing it in the background once it is stale.
+    Only the load that claims the refresh starts it, so concurrent dashboard loads
+    don't each run the full set of count queries.
+    """
+    snapshot = StatsSnapshot.objects.order_by('-id').first()
+    if snapshot is None:
+        # First load ever; compute once so the dashboard has numbers
+        return refresh_admin_stats()
+    if snapshot.refreshed_at < timezone.now() - STATS_MAX_AGE:
+        # Claim by moving refreshed_at forward; a failed refresh is retried once it is stale again
+        claimed = StatsSnapshot.objects.filter(
+            pk=snapshot.pk,
+            refreshed_at=snapshot.refreshed_at
+        ).update(refreshed_at=timezone.now())
+        if not claimed:
+            return snapshot
+        thread = threading.Thread(target=refresh_admin_stats_job)
+        thread.daemon = True
+        thread.start()
+    return snapshot
+
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def admin_dashboard(request):
     """Enhanced dashboard view with more statistics and user management."""
-    # Get counts for dashboard statistics
-    user_count = User.objects.count()
-    adventure_count = Adventure.objects.count()
-    story_count = Story.objects.count()
-    
-    # Get users with their story counts
-    users = User.objects.annotate(
-        story_count=Count('adventures__stories')
-    ).prefetch_related('adventures', 'profile')
+    # Totals come from the stats table, not from counting every table on each load
+    stats = get_dashboard_stats()
+    daily_stats = DailyStats.objects.all()[:STATS_DAYS]
+
+    # One page of users, sorted in the database
+    sort = request.GET.get('sort', '-joined')
+    sort_field = DASHBOARD_USER_SORTS.get(sort.lstrip('-'))
+    if sort_field is None:
+        sort = '-joined'
+        sort_field = DASHBOARD_USER_SORTS['joined']
+    ordering = f"-{sort_field}" if sort.startswith('-') else sort_field
+    users = User.objects.select_related('profile').order_by(ordering, 'id')
+    page_obj = Paginator(users, DASHBOARD_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    # Story counts for just this page, from the per-adventure counters
+    page_users = list(page_obj.object_list)
+    story_counts = dict(
+        Adventure.objects.filter(user__in=page_users).values_list('user_id').annotate(total=Sum('story_count'))
+    )
+    for user in page_users:
+        user.story_count = story_counts.get(user.id, 0)
     
     return render(request, 'custom_admin/dashboard.html', {
-        'user_count': user_count,
-        'adventure_count': adventure_count,
-        'story_count': story_count,
-        'users': users,
+        'user_count': stats.user_count,
+        'adventure_count': stats.adventure_count,
+        'story_count': stats.story_count,
+        'stats': stats,
+        'daily_stats': daily_stats,
+        'users': page_users,
+        'page_obj': page_obj,
+        'sort': sort,
     })
 
 @user_passes_test(is_approved_admin, login_url='/access/login/')
@@ -57,33 +242,41 @@ def get_model_instances(request):
         return JsonResponse({'error': 'Model not specified'}, status=400)
     
     try:
-        app_label, model_name = model_path.split('.')
-        instances = None
-        
-        if app_label == 'auth' and model_name == 'User':
-            instances = User.objects.all().prefetch_related('profile')
-        elif app_label == 'user_profile' and model_name == 'UserProfile':
-            instances = UserProfile.objects.all().select_related('user')
-        elif app_label == 'gemini':
-            if model_name == 'Adventure':
-                instances = Adventure.objects.all().select_related('user')
-            elif model_name == 'Story':
-                instances = Story.objects.all().select_related('adventure')
-            elif model_name == 'StoryImages':
-                instances = StoryImages.objects.all().select_related('story')
-        
-        if instances is None:
+        rows = get_admin_rows(model_path, request.GET.get('search', ''))
+        if rows is None:
             return JsonResponse({'error': 'Invalid model'}, status=400)
-        
+
+        after, limit = get_page_args(request)
+        page, next_after = get_keyset_page(rows, after, limit)
         instances_data = [{
-            'id': instance.pk,
-            'str_representation': str(instance),
-        } for instance in instances]
-        
-        return JsonResponse({'instances': instances_data})
+            **row,
+            'str_representation': get_admin_label(model_path, row),
+        } for row in page]
+
+        return JsonResponse({'instances': instances_data, 'next_after': next_after})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+@user_passes_test(is_approved_admin, login_url='/access/login/')
+def export_model_instances(request):
+    """Streams every row of a model as JSON, reading it from the database in chunks."""
+    model_path = request.GET.get('model')
+    rows = get_admin_rows(model_path, request.GET.get('search', '')) if model_path else None
+    if rows is None:
+        return JsonResponse({'error': 'Invalid model'}, status=400)
+
+    def stream():
+        yield '{"instances": ['
+        for i, row in enumerate(rows.iterator(chunk_size=ADMIN_EXPORT_CHUNK_SIZE)):
+            row['str_representation'] = get_admin_label(model_path, row)
+            yield (',' if i else '') + json.dumps(row, cls=DjangoJSONEncoder)
+        yield ']}'
+
+    response = StreamingHttpResponse(stream(), content_type='application/json')
+    filename = model_path.replace('.', '_').lower()
+    response['Content-Disposition'] = f'attachment; filename="{filename}_export.json"'
+    return response
+
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def get_instance_data(request):
     model_path = request.GET.get('model')
@@ -195,6 +388,44 @@ def get_adventure_stories(request):
         print(f"Error in get_adventure_stories: {str(e)}")
         return JsonResponse({'error': str(e)}, status=400)
 
+def get_user_story_listings(user_id, user_name=None):
+    """
+    Lists the user's whole storage folder once and groups the objects by story folder.
+    With user_name, and while the legacy fallback is on, the '<username>/' folder of
+    unmigrated stories is listed once too and grouped the same way.
+
+    Returns:
+        dict: {story_prefix: [StoredObject]}, legacy story prefixes included
+    """
+    story_listings = {}
+    try:
+        for obj in get_media_backend().list(f"{get_user_prefix(user_id)}/"):
+            # users/<id>/adventure_<id>/story_<id>/<file>
+            story_prefix = '/'.join(obj.name.split('/')[:4])
+            story_listings.setdefault(story_prefix, []).append(obj)
+        if user_name and legacy_fallback_enabled():
+            for obj in get_media_backend().list(get_legacy_user_prefix(user_name)):
+                # <username>/adventure_<id>/story_<id>/<file>
+                story_prefix = '/'.join(obj.name.split('/')[:3])
+                story_listings.setdefault(story_prefix, []).append(obj)
+    except Exception as e:
+        logger.error(f"Error listing storage for user {user_id}: {e}")
+    return story_listings
+
+def get_story_storage_info(store):
+    """Audio file and stored totals of a story, from its store's listings, legacy folder included."""
+    objects = list(store.list().values()) + list(store.list_legacy().values())
+    audio = store.resolve(store.audio_key())
+    audio_info = {
+        'exists': audio is not None,
+        'size': audio.size if audio else 0
+    }
+    storage_info = {
+        'objects': len(objects),
+        'size': sum(obj.size or 0 for obj in objects)
+    }
+    return audio_info, storage_info
+
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def modify_user_profile(request, user_id):
     user = get_object_or_404(User.objects.select_related('profile'), id=user_id)
@@ -237,11 +468,14 @@ def modify_user_profile(request, user_id):
     # Get all adventures for this user with their stories and related data
     adventures = Adventure.objects.filter(user=user).prefetch_related(
         'stories',
-        'stories__content',
+        'stories__chapters',
         'stories__story_images',
         'stories__story_images__chapter_images'
     ).order_by('-created_at')
     
+    # Everything the user has stored, in one listing, split up per story below
+    story_listings = get_user_story_listings(user.id, user.username)
+
     adventures_data = []
     for adventure in adventures:
         stories_data = []
@@ -249,22 +483,12 @@ def modify_user_profile(request, user_id):
             # Get story images info
             has_images = False
             if hasattr(story, 'story_images'):
-                has_images = bool(story.story_images.cover_image) or story.story_images.chapter_images.exists()
+                has_images = bool(story.story_images.cover_image) or bool(story.story_images.chapter_images.all())
 
-            # Get audio info
-            audio_info = {'exists': False, 'size': 0}
-            try:
-                storage_client = storage.Client()
-                bucket = storage_client.bucket('write-audio')
-                filename = f"{user.id}_{adventure.id}_{story.id}_audio.mp3"
-                blob = bucket.blob(filename)
-                if blob.exists():
-                    audio_info = {
-                        'exists': True,
-                        'size': blob.size
-                    }
-            except Exception as e:
-                logger.error(f"Error checking audio for story {story.id}: {e}")
+            store = StoryArtifactStore.for_ids(user.id, adventure.id, story.id, user_name=user.username)
+            store.set_listing(story_listings.get(store.prefix, []))
+            store.set_legacy_listing(story_listings.get(store.legacy_prefix, []))
+            audio_info, storage_info = get_story_storage_info(store)
 
             stories_data.append({
                 'id': story.id,
@@ -277,8 +501,9 @@ def modify_user_profile(request, user_id):
                 'error': story.error,
                 'has_images': has_images,
                 'audio': audio_info,
+                'storage': storage_info,
                 'audio_voice': story.audio_voice,
-                'content': story.content.raw_content if hasattr(story, 'content') else None,
+                'content': get_raw_content(story),
                 'story_images': getattr(story, 'story_images', None)
             })
 
@@ -313,9 +538,9 @@ def get_adventure_details(request, adventure_id):
         
         # Get stories with related data
         stories = Story.objects.filter(adventure_id=adventure_id).select_related(
-            'content',
             'story_images'
         ).prefetch_related(
+            'chapters',
             'story_images__chapter_images'
         )
         
@@ -330,7 +555,7 @@ def get_adventure_details(request, adventure_id):
                 'input_token_count': story.input_token_count,
                 'output_token_count': story.output_token_count,
                 'audio_voice': story.audio_voice,
-                'content': story.content.raw_content if hasattr(story, 'content') else None,
+                'content': get_raw_content(story),
                 'story_images': {
                     'cover_image': story.story_images.cover_image.url if hasattr(story, 'story_images') and story.story_images.cover_image else None,
                     'chapter_images': [
@@ -368,31 +593,30 @@ def get_adventure_details(request, adventure_id):
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def get_story_details(request, story_id):
     story = get_object_or_404(Story.objects.select_related(
-        'content',
+        'adventure__user',
         'story_images'
     ).prefetch_related(
+        'chapters',
         'story_images__chapter_images'
     ), id=story_id)
     
     # Get story images info
     has_images = False
     if hasattr(story, 'story_images'):
-        has_images = bool(story.story_images.cover_image) or story.story_images.chapter_images.exists()
+        has_images = bool(story.story_images.cover_image) or bool(story.story_images.chapter_images.all())
 
-    # Get audio info
-    audio_info = {'exists': False, 'size': 0}
+    # Audio and storage totals from one listing of the story folder
+    store = StoryArtifactStore.for_ids(
+        story.adventure.user_id, story.adventure_id, story.id, user_name=story.adventure.user.username
+    )
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-audio')
-        filename = f"{story.adventure.user.id}_{story.adventure.id}_{story.id}_audio.mp3"
-        blob = bucket.blob(filename)
-        if blob.exists():
-            audio_info = {
-                'exists': True,
-                'size': blob.size
-            }
+        store.list()
+        store.list_legacy()
     except Exception as e:
-        logger.error(f"Error checking audio for story {story.id}: {e}")
+        logger.error(f"Error listing storage for story {story.id}: {e}")
+        store.set_listing([])
+        store.set_legacy_listing([])
+    audio_info, storage_info = get_story_storage_info(store)
 
     data = {
         'id': story.id,
@@ -405,8 +629,9 @@ def get_story_details(request, story_id):
         'error': story.error,
         'has_images': has_images,
         'audio': audio_info,
+        'storage': storage_info,
         'audio_voice': story.audio_voice,
-        'content': story.content.raw_content if hasattr(story, 'content') else None,
+        'content': get_raw_content(story),
         'story_images': {
             'cover_image': story.story_images.cover_image.url if hasattr(story, 'story_images') and story.story_images.cover_image else None,
             'chapter_images': [
@@ -415,7 +640,7 @@ def get_story_details(request, story_id):
                     'chapter_key': img.chapter_key,
                     'image_url': img.image.url,
                     'text_marker': img.text_marker
-                } for img in story.story_images.chapter_images.all() if hasattr(story, 'story_images')
+                } for img in (story.story_images.chapter_images.all() if hasattr(story, 'story_images') else [])
             ]
         }
     }
@@ -424,8 +649,10 @@ def get_story_details(request, story_id):
 
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def list_data(request, model_name):
-    """View to list instances of a specific model."""
-    page = request.GET.get('page', 1)
+    """View to list instances of a specific model, keyset-paginated by descending id."""
+    # `page` is accepted too, since page_obj hands out cursors as page numbers
+    after = request.GET.get('after') or request.GET.get('page', '')
+    after = int(after) if after.isdigit() else None
     search = request.GET.get('search', '')
     
     if model_name == 'user':
@@ -452,8 +679,7 @@ def list_data(request, model_name):
     # Add proper ordering
     items = items.order_by('-id')
     
-    paginator = Paginator(items, 20)  # 20 items per page
-    page_obj = paginator.get_page(page)
+    page_obj = KeysetPage(items, after, LIST_PAGE_SIZE)
     
     return render(request, 'custom_admin/list_data.html', {
         'page_obj': page_obj,
@@ -509,6 +735,12 @@ def create_user(request):
     
     return render(request, 'custom_admin/create_user.html', {'form': form})
 
+def start_artifact_gc():
+    """Collects images and audio that the deleted stories were the last users of, in the background."""
+    thread = threading.Thread(target=collect_unreferenced_artifacts_job)
+    thread.daemon = True
+    thread.start()
+
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 @require_POST
 def delete_data(request):
@@ -528,11 +760,12 @@ def delete_data(request):
             messages.success(request, f'Adventure {instance_id} deleted successfully')
         elif model_name == 'story':
             story = get_object_or_404(Story, pk=instance_id)
-            story.delete()
+            bulk_delete_stories(Story.objects.filter(pk=story.pk))
             messages.success(request, f'Story {story.title} deleted successfully')
         else:
             return JsonResponse({'success': False, 'error': 'Invalid model name'})
         
+        start_artifact_gc()
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -545,6 +778,7 @@ def delete_user(request, user_id):
         user = get_object_or_404(User, id=user_id)
         username = user.username
         user.delete()
+        start_artifact_gc()
         messages.success(request, f'User {username} deleted successfully')
         return JsonResponse({'success': True})
     except Exception as e:
@@ -553,6 +787,57 @@ def delete_user(request, user_id):
             'error': str(e)
         }, status=400)
 
+@user_passes_test(is_approved_admin, login_url='/access/login/')
+def model_cost_report(request):
+    """Model spend and latency per pipeline stage over the last `days` days, from the model call ledger."""
+    days = request.GET.get('days', '')
+    days = int(days) if days.isdigit() else STATS_DAYS
+    report = get_model_cost_report(since=timezone.now() - timedelta(days=days))
+    return JsonResponse({
+        'days': days,
+        'total_cost': round(sum(row['cost'] for row in report), 2),
+        'stages': report,
+    })
+
+@user_passes_test(is_approved_admin, login_url='/access/login/')
+@require_POST
+def bulk_stories(request):
+    """
+    Applies one action to every story matching the filters in a single request.
+
+    POST fields:
+        action: 'set_status', 'delete' or 'requeue'
+        status, older_than_hours, user_id, tier: Filters; empty ones are ignored
+        new_status, error: For 'set_status'
+        dry_run: Only return how many stories match
+    """
+    try:
+        older_than_hours = request.POST.get('older_than_hours')
+        stories = select_stories(
+            status=request.POST.get('status') or None,
+            older_than_hours=float(older_than_hours) if older_than_hours else None,
+            user_id=request.POST.get('user_id') or None,
+            tier=request.POST.get('tier') or None
+        )
+        matched = stories.count()
+        if request.POST.get('dry_run'):
+            return JsonResponse({'success': True, 'matched': matched})
+
+        result = bulk_story_action(
+            stories,
+            request.POST.get('action'),
+            new_status=request.POST.get('new_status'),
+            error=request.POST.get('error', '')
+        )
+        if result.get('deleted'):
+            start_artifact_gc()
+        return JsonResponse({'success': True, 'matched': matched, **result})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error in bulk story action: {str(e)}", exc_info=True)
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @user_passes_test(is_approved_admin, login_url='/access/login/')
 def update_story_status(request, story_id):
     if request.method == 'POST':
@@ -560,13 +845,12 @@ def update_story_status(request, story_id):
             story = get_object_or_404(Story, id=story_id)
             new_status = request.POST.get('status')
             
-            # Validate the status is one of the allowed choices
-            if new_status in dict(Story.STATUS_CHOICES):
-                story.status = new_status
-                story.save()
+            # Same path as the bulk action, so the story's quota slot is settled
+            try:
+                bulk_update_story_status(Story.objects.filter(pk=story.pk), new_status)
                 messages.success(request, f'Status updated for Story #{story_id}')
-            else:
-                messages.error(request, 'Invalid status value')
+            except ValueError as e:
+                messages.error(request, str(e))
                 
             # Redirect back to the user profile page
             return redirect('custom_admin:modify_user_profile', user_id=story.adventure.user.id)
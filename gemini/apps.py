@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GeminiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gemini'
+
+    def ready(self):
+        # Queues storage cleanup when users, adventures and stories are deleted
+        from . import signals  # noqa: F401
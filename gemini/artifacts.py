@@ -0,0 +1,171 @@
+import json
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Artifact, ArtifactReference
+from .media import get_media_backend
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Content-addressed blobs live outside the per-user story folders:
+# cas/<kind>/<first 2 hex chars>/<content_key>.<ext>
+# They deduplicate generation, not storage: each story still stores its own served copy
+# (the post-processed image, the combined audio) in its folder, so every new image or
+# audio chunk is stored twice. The CAS copy saves the model call on a repeat prompt.
+ARTIFACT_PREFIX = 'cas'
+
+# Artifacts younger than this are never collected, so a blob that was just stored
+# isn't deleted before the story that generated it has recorded its reference.
+ARTIFACT_GC_GRACE = timedelta(hours=1)
+
+
+def get_content_key(kind, model, config, payload):
+    """
+    Returns the sha256 content key for a generation request.
+
+    Args:
+        kind (str): 'image' or 'audio'
+        model (str): Model or voice family used for generation
+        config (dict): Generation settings that change the output
+        payload (str): The prompt or text that was sent
+    """
+    request = json.dumps({
+        'kind': kind,
+        'model': model,
+        'config': config,
+        'payload': payload,
+    }, sort_keys=True)
+    return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+
+def get_artifact_blob_name(kind, content_key, extension):
+    return f"{ARTIFACT_PREFIX}/{kind}/{content_key[:2]}/{content_key}.{extension}"
+
+
+def get_artifacts(content_keys):
+    """Returns {content_key: Artifact} for the keys that are already stored, in one query."""
+    return {
+        artifact.content_key: artifact
+        for artifact in Artifact.objects.filter(content_key__in=list(content_keys))
+    }
+
+
+def load_artifact(artifact):
+    """
+    Downloads an artifact's bytes.
+    Returns None if the blob has gone missing, in which case the stale row is dropped
+    so the caller regenerates and stores it again.
+    """
+    data = get_media_backend().download(artifact.blob_name)
+    if data is None:
+        logger.warning(f"Artifact blob {artifact.blob_name} is missing, removing its record")
+        artifact.delete()
+    return data
+
+
+def store_artifact(kind, content_key, data, content_type, extension):
+    """
+    Uploads generated bytes under their content key and records the Artifact.
+    If another job stored the same key first, its record is returned instead.
+    """
+    existing = Artifact.objects.filter(content_key=content_key).first()
+    if existing:
+        return existing
+
+    blob_name = get_artifact_blob_name(kind, content_key, extension)
+    get_media_backend().upload(blob_name, data, content_type)
+    try:
+        return Artifact.objects.create(
+            content_key=content_key,
+            kind=kind,
+            blob_name=blob_name,
+            content_type=content_type,
+            size=len(data)
+        )
+    except IntegrityError:
+        # Same content stored concurrently; both uploads wrote identical bytes to the same blob
+        return Artifact.objects.get(content_key=content_key)
+
+
+def add_artifact_reference(artifact, story, role):
+    """
+    Points a story role (e.g. 'cover') at an artifact, replacing any earlier artifact for that role.
+    A replaced artifact left without references is deleted by the scheduled GC.
+
+    The artifact row is locked while the reference is taken, the same lock the GC takes
+    before deleting, so an artifact found in the cache can't be collected in between.
+
+    Returns:
+        bool: False if the artifact was collected since it was looked up; nothing is recorded
+    """
+    with transaction.atomic():
+        if not Artifact.objects.select_for_update().filter(pk=artifact.pk).exists():
+            logger.warning(f"Artifact {artifact.content_key} was collected before story {story.id} referenced it")
+            return False
+        ArtifactReference.objects.update_or_create(
+            story=story,
+            role=role,
+            defaults={'artifact': artifact}
+        )
+    return True
+
+
+def prune_artifact_references(story, role_prefix, keep_roles):
+    """Removes a story's references under role_prefix that aren't in keep_roles."""
+    ArtifactReference.objects.filter(
+        story=story,
+        role__startswith=role_prefix
+    ).exclude(role__in=list(keep_roles)).delete()
+
+
+def get_reference_count(artifact):
+    return artifact.references.count()
+
+
+def collect_unreferenced_artifacts(grace=ARTIFACT_GC_GRACE):
+    """
+    Deletes artifacts that no story references anymore, along with their blobs.
+
+    Returns:
+        tuple: (artifacts deleted, bytes reclaimed)
+    """
+    unreferenced = Artifact.objects.filter(
+        references__isnull=True,
+        created_at__lt=timezone.now() - grace
+    )
+    blob_names = []
+    reclaimed = 0
+    for artifact in unreferenced.iterator():
+        # Drop the row first and only if it is still unreferenced, holding the lock
+        # add_artifact_reference takes, so no story can pick up an artifact whose blob
+        # is about to go away
+        with transaction.atomic():
+            locked = Artifact.objects.select_for_update().filter(pk=artifact.pk).first()
+            if locked is None or locked.references.exists():
+                continue
+            locked.delete()
+        blob_names.append(artifact.blob_name)
+        reclaimed += artifact.size
+
+    deleted = len(blob_names)
+    if blob_names:
+        get_media_backend().delete_many(blob_names)
+
+    logger.info(f"Artifact GC deleted {deleted} artifacts, reclaimed {reclaimed} bytes")
+    return deleted, reclaimed
+
+
+def collect_unreferenced_artifacts_job():
+    """Thread target for running artifact GC after a delete; the cron handler runs it too."""
+    try:
+        collect_unreferenced_artifacts()
+    except Exception as e:
+        logger.error(f"Error collecting unreferenced artifacts: {str(e)}", exc_info=True)
+    finally:
+        connection.close()
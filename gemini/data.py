@@ -29,7 +29,8 @@ def get_adventure_story_data(adventure_id=7, story_id=3):
                 'created_at': story.created_at.isoformat(),
                 'outline': story.outline,
                 'summary': story.summary,
-                'raw_file': story.raw_file,
+                'status': story.status,
+                'error': story.error,
             }
         }
         
@@ -0,0 +1,94 @@
+import os
+import logging
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Shipped with the app so Linux containers get a real TrueType font instead of load_default()
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+
+# Candidate files per family, tried in order. The bundled font is always the last resort
+# before PIL's bitmap default.
+FONT_FAMILIES = {
+    'sans-bold': [
+        "arial.ttf",
+        "/System/Library/Fonts/Helvetica.ttc",  # Common on macOS
+        "C:\\Windows\\Fonts\\arial.ttf",  # Common on Windows
+        os.path.join(BUNDLED_FONT_DIR, 'DejaVuSans-Bold.ttf'),
+    ],
+}
+DEFAULT_FONT_FAMILY = 'sans-bold'
+
+# Scratch surface for measuring text without needing the image being drawn on
+_measure_draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+@lru_cache(maxsize=None)
+def resolve_font_path(family=DEFAULT_FONT_FAMILY):
+    """
+    Returns the first font file of a family that FreeType can open, or None.
+    The probe runs once per family per process.
+    """
+    for font_path in FONT_FAMILIES.get(family, FONT_FAMILIES[DEFAULT_FONT_FAMILY]):
+        try:
+            ImageFont.truetype(font_path, size=10)
+            logger.info(f"Using font {font_path} for family {family}")
+            return font_path
+        except IOError:
+            continue
+    logger.warning(f"No TrueType font found for family {family}, using default font")
+    return None
+
+
+@lru_cache(maxsize=64)
+def get_font(family=DEFAULT_FONT_FAMILY, size=30):
+    """
+    Returns a loaded font for (family, size), parsing the font file only once.
+
+    Args:
+        family (str): Key of FONT_FAMILIES
+        size (int): Font size in pixels
+
+    Returns:
+        ImageFont.FreeTypeFont: The font, or PIL's default font if no file could be loaded
+    """
+    font_path = resolve_font_path(family)
+    if font_path:
+        return ImageFont.truetype(font_path, size=size)
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def measure_text(text, font):
+    """Returns (width, height) of text rendered in font. Fonts are cached so they hash stably."""
+    bbox = _measure_draw.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+def wrap_text(text, font, max_width):
+    """
+    Greedily wraps text into lines no wider than max_width.
+    A single word wider than max_width gets a line of its own.
+    """
+    lines = []
+    current_line = []
+
+    for word in text.split():
+        current_line.append(word)
+        line = ' '.join(current_line)
+        if measure_text(line, font)[0] > max_width:
+            if len(current_line) == 1:
+                lines.append(line)
+                current_line = []
+            else:
+                current_line.pop()
+                lines.append(' '.join(current_line))
+                current_line = [word]
+
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
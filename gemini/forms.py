@@ -152,7 +152,7 @@ class CharacterBaseForm(forms.ModelForm):
 
 # Modify the formset factory based on adventure status
 def get_character_formset(adventure=None):
-    max_num = 7 if adventure and adventure.stories.exists() else 5
+    max_num = 7 if adventure and adventure.has_stories else 5
     return formset_factory(CharacterBaseForm, 
                           extra=1, 
                           max_num=max_num,
@@ -217,7 +217,7 @@ class SettingBaseForm(forms.ModelForm):
 
 # Modify the formset factory based on adventure status
 def get_setting_formset(adventure=None):
-    max_num = 7 if adventure and adventure.stories.exists() else 3
+    max_num = 7 if adventure and adventure.has_stories else 3
     return formset_factory(SettingBaseForm, 
                           extra=1, 
                           max_num=max_num,
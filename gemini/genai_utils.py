@@ -5,9 +5,12 @@ import random
 import logging
 from google.cloud import storage
 import google.generativeai as genai
-from gemini.models import Adventure, StoryContent
+from gemini.models import Adventure
+from .story_content import save_chapter
+from .jobs import record_heartbeat
+from .model_calls import track_model_call, add_usage, get_model_name
 from google.cloud import secretmanager
-from .img_utils import generate_and_store_image, add_image_data
+from .img_utils import generate_and_store_image, generate_and_store_images
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -43,32 +46,32 @@ def get_bucket_data(bucket_name, blob_name):
         logger.error(f"Error fetching system instructions: {e}")
         raise
 
-def get_response(prompt, chat):
-    """Gets a response from the model using chat."""
+def get_response(prompt, chat, story_id=None, stage='chat'):
+    """
+    Gets a response from the model using chat. Every request, including the
+    acknowledged chunks of a long prompt, is recorded in the model call ledger.
+
+    Returns:
+        tuple: (response text, prompt_token_count, candidates_token_count) summed over all requests
+    """
     try:
         logger.info(f"Making Google AI request with prompt length: {len(prompt)}")
         start_time = time.time()
+        model_name = get_model_name(chat)
+        prompt_token_count = 0
+        candidates_token_count = 0
 
-        # Break long prompts into chunks if needed
-        if len(prompt) > 100000:
+        # Break long prompts into chunks if needed; all but the last chunk are just acknowledged
+        chunks = chunk_context(prompt) if len(prompt) > 100000 else [prompt]
+        if len(chunks) > 1:
             logger.debug("Breaking long prompt into chunks")
-            chunks = chunk_context(prompt)
-            final_response = ""
-            for i, chunk in enumerate(chunks):
-                if i < len(chunks) - 1:
-                    # For all but the last chunk, just acknowledge receipt
-                    chat.send_message(chunk)
-                else:
-                    # For the last chunk, get the actual response
-                    response = chat.send_message(chunk)
-                    prompt_token_count = response.usage_metadata.prompt_token_count
-                    candidates_token_count = response.usage_metadata.candidates_token_count
-                    final_response = response.text
-        else:
-            response = chat.send_message(prompt)
-            prompt_token_count = response.usage_metadata.prompt_token_count
-            candidates_token_count = response.usage_metadata.candidates_token_count
-            final_response = response.text
+        for chunk in chunks:
+            with track_model_call(stage, model_name, story_id) as call:
+                response = chat.send_message(chunk)
+                add_usage(call, response)
+            prompt_token_count += call['input_tokens']
+            candidates_token_count += call['output_tokens']
+        final_response = response.text
         
         duration = time.time() - start_time
         logger.info(f"Google AI request completed in {duration:.2f} seconds")
@@ -80,8 +83,61 @@ def get_response(prompt, chat):
         logger.error(f"Request details - Prompt length: {len(prompt)}")
         raise
 
+def clean_text(text):
+    """Strips markdown/quote wrappers and newlines from a short model response."""
+    text = text.strip().strip('`').strip('"').strip("'").strip('*').strip('#')
+    return text.replace('\n', ' ').strip()
+
+def get_json_response(model, prompt, required_keys, max_attempts=3, story_id=None, stage='json'):
+    """
+    Makes a single JSON-mode request and returns the parsed object.
+
+    Args:
+        model (GenerativeModel): Model to call
+        prompt (str): Prompt describing the JSON object to return
+        required_keys (list): Keys that must be present with non-empty values
+        max_attempts (int): Requests to make before giving up on malformed output
+        story_id (int): Story the ledger rows are recorded for
+        stage (str): Pipeline step the ledger rows are recorded under
 
-def create_cache(cache_data):
+    Returns:
+        tuple: (dict, prompt_token_count, candidates_token_count), token counts summed over attempts
+    """
+    prompt_token_count = 0
+    candidates_token_count = 0
+    model_name = get_model_name(model)
+    for attempt in range(1, max_attempts + 1):
+        with track_model_call(stage, model_name, story_id, attempt=attempt) as call:
+            response = model.generate_content(
+                prompt,
+                generation_config={'response_mime_type': 'application/json'}
+            )
+            add_usage(call, response)
+            try:
+                data = json.loads(response.text)
+                missing = [key for key in required_keys if not isinstance(data, dict) or not data.get(key)]
+                if missing:
+                    call['outcome'] = 'invalid'
+                    call['error'] = f"Missing keys: {missing}"
+                    logger.warning(f"JSON response missing {missing} (attempt {attempt})")
+            except json.JSONDecodeError as e:
+                call['outcome'] = 'invalid'
+                call['error'] = str(e)
+                logger.warning(f"Invalid JSON response (attempt {attempt}): {str(e)}")
+        prompt_token_count += call['input_tokens']
+        candidates_token_count += call['output_tokens']
+        if call['outcome'] == 'success':
+            return data, prompt_token_count, candidates_token_count
+    raise ValueError(f"No valid JSON response with keys {required_keys} after {max_attempts} attempts")
+
+
+def create_cache(cache_data, story_id=None):
+    """
+    Starts the story's chat and sends it the adventure context.
+
+    Returns:
+        tuple: (chat, prompt_token_count, candidates_token_count) summed over the context chunks
+    """
     try:
         logger.debug("Starting cache creation process...")
         
@@ -103,14 +159,18 @@ def create_cache(cache_data):
         chat = model.start_chat()
         
         # Send initial context in chunks if needed
+        prompt_token_count = 0
+        candidates_token_count = 0
         context_chunks = chunk_context(cache_data)
         for chunk in context_chunks:
-            response = chat.send_message(
-                f"Here is part of the story context: {chunk}",
-                generation_config={'temperature': 0.1}  # Low temperature for context processing
-            )
-            prompt_token_count = response.usage_metadata.prompt_token_count
-            candidates_token_count = response.usage_metadata.candidates_token_count
+            with track_model_call('context', get_model_name(model), story_id) as call:
+                response = chat.send_message(
+                    f"Here is part of the story context: {chunk}",
+                    generation_config={'temperature': 0.1}  # Low temperature for context processing
+                )
+                add_usage(call, response)
+            prompt_token_count += call['input_tokens']
+            candidates_token_count += call['output_tokens']
         
         return chat, prompt_token_count, candidates_token_count
 
@@ -317,16 +377,17 @@ def set_outline_format(age_group):
             }
     return outline_format
 
-def fix_outline_format(incorrect_outline, age_group):
+def fix_outline_format(incorrect_outline, age_group, story_id=None):
     """
     Sends a one-off request to Gemini to fix an incorrectly formatted outline.
     
     Args:
         incorrect_outline (dict/str): The incorrectly formatted outline
         age_group (str): The age group to determine correct format
+        story_id (int): Story the ledger row is recorded for
     
     Returns:
-        dict: The corrected outline
+        tuple: (corrected outline, prompt_token_count, candidates_token_count)
     """
     try:
         # Get the expected structure
@@ -357,7 +418,9 @@ def fix_outline_format(incorrect_outline, age_group):
         """
 
         # Get the response
-        response = model.generate_content(format_prompt)
+        with track_model_call('outline_fix', get_model_name(model), story_id) as call:
+            response = model.generate_content(format_prompt)
+            add_usage(call, response)
         
         # Parse the response
         try:
@@ -372,7 +435,7 @@ def fix_outline_format(incorrect_outline, age_group):
             # Validate the fixed outline
             is_valid, error_msg = validate_outline_structure(fixed_outline, age_group)
             if is_valid:
-                return fixed_outline
+                return fixed_outline, call['input_tokens'], call['output_tokens']
             else:
                 raise ValueError(f"Fixed outline still invalid: {error_msg}")
                 
@@ -401,7 +464,9 @@ def get_outline(prompt, chat, age_group, story_instance):
     """
     
     try:
-        outline, prompt_token_count, candidates_token_count = get_response(outline_prompt, chat)
+        outline, prompt_token_count, candidates_token_count = get_response(
+            outline_prompt, chat, story_instance.id, 'outline'
+        )
         logger.info(f"Outline: {outline}")
         
         # Clean up the response
@@ -431,27 +496,44 @@ def get_outline(prompt, chat, age_group, story_instance):
 
         # Validate the structure
         is_valid, error_msg = validate_outline_structure(outline_dict, age_group)
-        if is_valid:
-            # Save the title to the story instance right after validating the outline
-            story_instance.outline = json.dumps(outline_dict)
-            story_instance.title = outline_dict['title']
-            story_instance.save(update_fields=['title', 'outline'])
-            return outline_dict, chat, prompt_token_count, candidates_token_count
-        else:
+        if not is_valid:
             logger.error(f"Invalid outline structure: {error_msg}")
             # Try to fix the format
             try:
                 logger.info("Attempting to fix outline format...")
-                fixed_outline = fix_outline_format(outline_dict, age_group)
-                return fixed_outline, chat
+                outline_dict, fix_prompt_count, fix_candidates_count = fix_outline_format(
+                    outline_dict, age_group, story_instance.id
+                )
+                prompt_token_count += fix_prompt_count
+                candidates_token_count += fix_candidates_count
             except Exception as fix_error:
                 logger.error(f"Failed to fix outline format: {str(fix_error)}")
                 raise
+
+        # Save the title to the story instance right after validating the outline
+        story_instance.outline = json.dumps(outline_dict)
+        story_instance.title = outline_dict['title']
+        story_instance.save(update_fields=['title', 'outline'])
+        return outline_dict, chat, prompt_token_count, candidates_token_count
                 
     except Exception as e:
         logger.error(f"Error in get_outline: {str(e)}")
         raise RuntimeError("Failed to generate valid outline")
 
+def get_saved_outline(story_instance, age_group):
+    """Returns the outline an earlier run of this story saved, or None if there is no valid one."""
+    if not story_instance.outline:
+        return None
+    try:
+        outline = json.loads(story_instance.outline)
+    except json.JSONDecodeError:
+        return None
+    is_valid, error_msg = validate_outline_structure(outline, age_group)
+    if not is_valid:
+        logger.warning(f"Saved outline of story {story_instance.id} is invalid: {error_msg}")
+        return None
+    return outline
+
    
 def validate_outline_structure(outline, age_group, path="root"):
     """
@@ -510,9 +592,11 @@ def validate_outline_structure(outline, age_group, path="root"):
         return False, f"Validation error: {str(e)}"
 
 
-def write_story(outline, age_group, chat, prompt, story_instance):
+def write_story(outline, age_group, chat, prompt, story_instance, store=None):
     """
     Writes a story based on the validated outline structure, maintaining a running summary.
+    Images are written through store, which the caller builds from the job's ids.
+    Chapters already saved by an earlier, interrupted run are reused instead of rewritten.
     """
     try:
         logger.debug("Starting story writing process...")
@@ -561,13 +645,28 @@ def write_story(outline, age_group, chat, prompt, story_instance):
         candidates_token_count = 0
         last_summary = "1st chapter"
         rules = get_bucket_data('write-456414.appspot.com', 'rules3.txt')
+        saved_chapters = {
+            (chapter.part_number, chapter.chapter_number): chapter
+            for chapter in story_instance.chapters.all()
+            if chapter.image_prompt
+        }
+        if saved_chapters:
+            logger.info(f"Resuming story {story_instance.id} with {len(saved_chapters)} chapters already written")
         for part_num in range(1, num_parts + 1):
             part_key = f"Part {part_num}"
             part_chapters = outline[part_key]
+            part_image_prompts = {}
             
             for chapter_num in range(1, num_chapters + 1):
                 chapter_key = f"Chapter {chapter_num}"
                 chapter_title = part_chapters[chapter_key]
+
+                saved = saved_chapters.get((part_num, chapter_num))
+                if saved:
+                    part_image_prompts[(part_key, chapter_key)] = saved.image_prompt
+                    last_summary = saved.summary
+                    summary += f"{saved.summary} "
+                    continue
                 
                 chapter_prompt = f"""
                 Now write the content for {part_key}, {chapter_key}: "{chapter_title}"
@@ -588,7 +687,9 @@ def write_story(outline, age_group, chat, prompt, story_instance):
                 """
                 
                 logger.debug(f"Generating content for {part_key}, {chapter_key}")
-                chapter_content, chapter_prompt_count, chapter_candidates_count = get_response(chapter_prompt, chat)
+                chapter_content, chapter_prompt_count, chapter_candidates_count = get_response(
+                    chapter_prompt, chat, story_instance.id, 'chapter'
+                )
                 prompt_token_count += chapter_prompt_count
                 candidates_token_count += chapter_candidates_count
                 # Add chapter to full story
@@ -598,7 +699,7 @@ def write_story(outline, age_group, chat, prompt, story_instance):
                 chat_length = len(chat.history)
                 chat.history.pop(chat_length - 1)
                 
-                # Generate summary of this chapter
+                # Summary, notes for the next chapter and the image prompt come back in one request
                 summary_prompt = f"""
                 You are writing a story about: {prompt}
                 The summary response from the previous chapter: {last_summary}
@@ -606,80 +707,52 @@ def write_story(outline, age_group, chat, prompt, story_instance):
                 Write and organize this response in the most concise way that you can still reference it easily.
                 Each of these repsponses will be presented back to you to continue writing. 
                 They will also be collected for another instance of your model to reference. They are not for the reader.
-                Please summarize the current chapter content concisely:
+                Current chapter content:
                 {chapter_content}
-                Add a note at the end to tell yourself about any plot elements that need to be continued or built upon based on the writing rules.    
-                Cross reference the previous summary and notes with the current chapter to write notes for the next chapter
+                
+                Respond with a JSON object with these keys:
+                - "summary": a concise summary of the current chapter content
+                - "continuation_notes": notes to yourself about any plot elements that need to be continued or built upon based on the writing rules. Cross reference the previous summary and notes with the current chapter to write notes for the next chapter
+                - "image_prompt": one element of this chapter described visually as you would to someone not there
                 """
                 
-                summary_response = summary_model.generate_content(summary_prompt)
-                summary_prompt_count = summary_response.usage_metadata.prompt_token_count
-                summary_candidates_count = summary_response.usage_metadata.candidates_token_count
+                chapter_notes, summary_prompt_count, summary_candidates_count = get_json_response(
+                    summary_model,
+                    summary_prompt,
+                    ['summary', 'image_prompt'],
+                    story_id=story_instance.id,
+                    stage='chapter_notes'
+                )
                 prompt_token_count += summary_prompt_count
                 candidates_token_count += summary_candidates_count
-                chapter_summary = summary_response.text.strip()
+                continuation_notes = clean_text(str(chapter_notes.get('continuation_notes') or ''))
+                chapter_summary = clean_text(str(chapter_notes['summary']))
+                if continuation_notes:
+                    chapter_summary = f"{chapter_summary} Notes: {continuation_notes}"
                 
-                # Clean the summary (remove any markdown, quotes, etc.)
-                chapter_summary = chapter_summary.strip('`').strip('"').strip("'")
-                chapter_summary = chapter_summary.replace('\n', ' ').strip()
-    
+                # Images for the part are generated together once all its chapters are written
+                image_prompt = f"Create an image of: {clean_text(str(chapter_notes['image_prompt']))}"
+                part_image_prompts[(part_key, chapter_key)] = image_prompt
                 
-                # Get or create StoryContent instance for this story
-                story_content, created = StoryContent.objects.get_or_create(story=story_instance)
-
-                # Initialize the part in raw_content if it doesn't exist
-                if part_key not in story_content.raw_content:
-                    story_content.raw_content[part_key] = {}
-
-                # Add the chapter content and summary
-                story_content.raw_content[part_key][chapter_key] = {
-                    'full_text': chapter_content,
-                    'summary': chapter_summary
-                }
-
-                # Save the changes
-                story_content.save()
+                # One row per chapter: a single upsert, no re-read of the chapters before it
+                save_chapter(story_instance, part_num, chapter_num, chapter_content, chapter_summary, image_prompt)
+                record_heartbeat(story_instance.id)
                 
                 logger.debug(f"Updated summary after {part_key}, {chapter_key}")
-                count = 0
-                for i in range(5):
-                    try:
-                        image_prompt = f"""Choose an element of this story summary: {chapter_summary}.
-                                        Describe it visually as you would to someone not there.""" 
-                        image_prompt_response = summary_model.generate_content(image_prompt)
-                        image_prompt_count = image_prompt_response.usage_metadata.prompt_token_count
-                        image_candidates_count = image_prompt_response.usage_metadata.candidates_token_count
-                        prompt_token_count += image_prompt_count
-                        candidates_token_count += image_candidates_count
-                        chapter_image_prompt = image_prompt_response.text.strip()
-                        
-                        # Clean the summary (remove any markdown, quotes, etc.)
-                        chapter_image_prompt = chapter_image_prompt.strip('`').strip('"').strip("'").strip('*').strip('#')
-                        chapter_image_prompt = chapter_image_prompt.replace('\n', ' ').strip()
-                    
-                        prompt = f"Create an image of:" + chapter_image_prompt
-                        
-                        # Generate chapter-specific image
-                        generate_and_store_image(
-                            story_instance, 
-                            prompt, 
-                            part_key=part_key, 
-                            chapter_key=chapter_key
-                        )
-                        
-                        logger.debug(f"Generated image for story {story_instance.id}, {part_key}, {chapter_key}")
-                    except Exception as e:
-                        count += 1
-                        logger.error(f"Error {count} making chapter image for {story_instance.id}, {part_key}, {chapter_key}: {str(e)}")
-                        exponential_backoff(count)
                 
                 # Set new last summary and image prompt  
                 last_summary = chapter_summary
                 # Add to running summary
                 summary += f"{chapter_summary} "
+
+            # Generate this part's chapter images in one batch
+            # On a resumed part, images stored before the interruption come back from the artifact cache
+            stored = generate_and_store_images(story_instance, part_image_prompts, store=store)
+            record_heartbeat(story_instance.id)
+            logger.debug(f"Generated {len(stored)}/{len(part_image_prompts)} images for story {story_instance.id}, {part_key}")
         logger.info("Story writing completed successfully")
         
-        final_prompt_token_count, final_candidates_token_count = create_story_summary(story_instance, summary)
+        final_prompt_token_count, final_candidates_token_count = create_story_summary(story_instance, summary, store)
         prompt_token_count += final_prompt_token_count
         candidates_token_count += final_candidates_token_count
         # Return only the story content
@@ -694,7 +767,7 @@ def exponential_backoff(attempt, max_delay=120):
     delay = min(max_delay, (2 ** attempt) + random.uniform(0, 1))
     time.sleep(delay)
 
-def create_story_summary(story_instance, full_summary):
+def create_story_summary(story_instance, full_summary, store=None):
     """Creates and saves a concise 2-sentence summary directly to the story instance."""
     try:
         # Create a new model instance for the summary
@@ -711,21 +784,24 @@ def create_story_summary(story_instance, full_summary):
         Create a compelling 2 to 3 sentence summary of this story:
         {full_summary}
         
-        Provide ONLY the summary with no additional text or formatting.
+        Respond with a JSON object with these keys:
+        - "summary": the summary, with no additional text or formatting
+        - "image_prompt": one element of the story described visually as you would to someone not there, for the cover image
         """
         
         # Add debug logging
         logger.debug(f"Generating summary for story {story_instance.id}")
         logger.debug(f"Story instance before summary: {story_instance.__dict__}")
         
-        response = model.generate_content(summary_prompt)
-        prompt_token_count = response.usage_metadata.prompt_token_count
-        candidates_token_count = response.usage_metadata.candidates_token_count
-        short_summary = response.text.strip()
-        
-        # Clean the summary
-        short_summary = short_summary.strip('`').strip('"').strip("'")
-        short_summary = short_summary.replace('\n', ' ').strip()
+        summary_data, prompt_token_count, candidates_token_count = get_json_response(
+            model,
+            summary_prompt,
+            ['summary', 'image_prompt'],
+            story_id=story_instance.id,
+            stage='story_summary'
+        )
+        short_summary = clean_text(str(summary_data['summary']))
+        cover_image_prompt = clean_text(str(summary_data['image_prompt']))
         logger.info(f"Summary content: {short_summary}")
         # Add debug logging for the summary
         logger.debug(f"Generated summary: {short_summary}")
@@ -738,34 +814,23 @@ def create_story_summary(story_instance, full_summary):
         count = 0
         for i in range(5):
             try:
-                image_prompt = f"""Pick an element from this story summary: {short_summary}.
-                                    Descride this choice visually as you would to someone not there.""" 
-                image_prompt_response = model.generate_content(image_prompt)
-                image_prompt_count = image_prompt_response.usage_metadata.prompt_token_count
-                image_candidates_count = image_prompt_response.usage_metadata.candidates_token_count
-                prompt_token_count += image_prompt_count
-                candidates_token_count += image_candidates_count
-                chapter_image_prompt = image_prompt_response.text.strip()
-                chapter_image_prompt = chapter_image_prompt.strip('`').strip('"').strip("'").strip('*').strip('#')
-                chapter_image_prompt = chapter_image_prompt.replace('\n', ' ').strip()
-                    
-                    
-                prompt = f"Create an image of: " + chapter_image_prompt
+                prompt = f"Create an image of: {cover_image_prompt}"
                        
-                # Generate chapter-specific image
-                generate_and_store_image(
+                # Generate the cover; title and author are composited before upload
+                success = generate_and_store_image(
                     story_instance, 
-                    prompt
+                    prompt,
+                    store=store
                 )
+                if not success:
+                    raise RuntimeError("no cover image was stored")
                 logger.debug(f"Generated cover image for story {story_instance.id}")
+                break
             except Exception as e:
                 count += 1
                 logger.error(f"Error {count} making cover image for {story_instance.id}: {str(e)}")
                 exponential_backoff(count)
         
-        success = add_image_data(story_instance)
-        if not success:
-            logger.error(f"Failed to add cover data for story {story_instance.id}")
         return prompt_token_count, candidates_token_count
 
     except Exception as e:
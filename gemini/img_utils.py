@@ -1,15 +1,22 @@
 import os
 from google import  genai
 from google.genai import types
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from io import BytesIO
+from functools import partial, lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import secretmanager
 import logging
-from google.cloud import storage
 from django.contrib.auth.models import User
+from django.db import connection
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import StoryImages, Adventure
+from .models import StoryImages, ChapterImage, Adventure
+from .font_utils import get_font, measure_text, wrap_text
+from .media import media_url
+from .story_store import StoryArtifactStore, get_image_base_name
+from .model_calls import track_model_call
+from .artifacts import get_content_key, get_artifacts, load_artifact, store_artifact, add_artifact_reference
 
 logger = logging.getLogger(__name__)
 def get_secret(secret_id):
@@ -29,60 +36,247 @@ if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY environment variable must be set")
 
 
-def generate_image(prompt):
-    try:
-        logger.info(f"Starting image generation with prompt: {prompt}")
-        
-        client = genai.Client(api_key=GOOGLE_API_KEY)
-        
-        config = types.GenerateImagesConfig(
-            number_of_images=1,
-            include_rai_reason=True,
-            output_mime_type='image/jpeg'
-        )
+# Responsive copies made whenever a cover or chapter image is stored.
+# Each width is written as JPEG and WebP; the full-size image also gets a WebP copy.
+IMAGE_VARIANT_WIDTHS = {
+    'thumb': 240,
+    'medium': 480,
+}
+IMAGE_VARIANT_QUALITY = {
+    'jpeg': 82,
+    'webp': 80,
+}
+
+# Imagen accepts one prompt per request and returns up to 4 candidates for it, each one
+# billed. Only one is used, so spares are asked for only when retrying a prompt whose
+# candidate was safety-filtered.
+IMAGES_PER_PROMPT = 1
+FILTERED_RETRY_IMAGES_PER_PROMPT = 2
+MAX_IMAGE_WORKERS = 4
+IMAGE_BATCH_RETRIES = 2
+SAFE_IMAGE_PROMPT_PREFIX = "A gentle, family-friendly storybook illustration. "
+
+IMAGEN_MODEL = 'imagen-3.0-generate-002'
+
+@lru_cache(maxsize=1)
+def get_image_client():
+    """Returns a shared genai client for Imagen calls."""
+    return genai.Client(api_key=GOOGLE_API_KEY)
+
+def load_generated_image(image_bytes):
+    """Verifies Imagen output bytes and reopens them as a usable PIL image."""
+    image_io = BytesIO(image_bytes)
+    image = Image.open(image_io)
+    image.verify()  # Verify it's a valid image
+    image_io.seek(0)  # Reset after verify
+    return Image.open(image_io)  # Reopen for actual use
+
+def generate_images(prompt, number_of_images=IMAGES_PER_PROMPT, story_id=None, stage='image', attempt=1):
+    """
+    Requests several candidate images for one prompt in a single Imagen call,
+    recorded in the model call ledger.
 
-        response = client.models.generate_images(
-            model='imagen-3.0-generate-002',
+    Args:
+        prompt (str): The prompt for image generation
+        number_of_images (int): Candidates to request, 1-4
+        story_id (int): Story the ledger row is recorded for
+        stage (str): Pipeline step, e.g. 'chapter_image' or 'cover_image'
+        attempt (int): 1 for the first request, higher for retries
+
+    Returns:
+        tuple: (list of PIL.Image, list of RAI filter reasons for dropped candidates)
+    """
+    logger.info(f"Starting image generation ({number_of_images} candidates) with prompt: {prompt}")
+    
+    config = types.GenerateImagesConfig(
+        number_of_images=number_of_images,
+        include_rai_reason=True,
+        output_mime_type='image/jpeg'
+    )
+
+    with track_model_call(stage, IMAGEN_MODEL, story_id, kind='image', attempt=attempt) as call:
+        response = get_image_client().models.generate_images(
+            model=IMAGEN_MODEL,
             prompt=prompt,
             config=config
         )
 
-        if hasattr(response, 'generated_images'):
-            for generated_image in response.generated_images:
-                if hasattr(generated_image, 'image') and hasattr(generated_image.image, 'image_bytes'):
-                    try:
-                        image_bytes = generated_image.image.image_bytes
-                        if not image_bytes:
-                            logger.error("Received empty image bytes")
-                            return None
-                            
-                        logger.debug(f"Received image bytes of length: {len(image_bytes)}")
-                        
-                        # Create BytesIO object and write bytes
-                        image_io = BytesIO(image_bytes)
-                        
-                        # Try to open and verify the image
-                        image = Image.open(image_io)
-                        image.verify()  # Verify it's a valid image
-                        image_io.seek(0)  # Reset after verify
-                        image = Image.open(image_io)  # Reopen for actual use
-                        
-                        logger.info("Successfully created image")
-                        return image
-                    except Exception as e:
-                        logger.error(f"Error processing image bytes: {str(e)}")
-                        return None
-                else:
-                    logger.error("Response missing image or image_bytes attribute")
-        else:
-            logger.error("Response missing generated_images attribute")
-            
-        return None
+        images = []
+        filtered_reasons = []
+        for generated_image in getattr(response, 'generated_images', None) or []:
+            rai_reason = getattr(generated_image, 'rai_filtered_reason', None)
+            image_bytes = getattr(getattr(generated_image, 'image', None), 'image_bytes', None)
+            if not image_bytes:
+                filtered_reasons.append(rai_reason or 'empty image bytes')
+                continue
+            try:
+                images.append(load_generated_image(image_bytes))
+            except Exception as e:
+                logger.error(f"Error processing image bytes: {str(e)}")
+
+        # Only returned images are billed
+        call['units'] = len(images)
+        if not images:
+            call['outcome'] = 'invalid'
+            call['error'] = f"No usable images: {filtered_reasons}"
+
+    if filtered_reasons:
+        logger.warning(f"{len(filtered_reasons)} candidate(s) dropped for prompt: {filtered_reasons}")
+    return images, filtered_reasons
+
+def generate_image(prompt, story_id=None, stage='image'):
+    try:
+        images, filtered_reasons = generate_images(prompt, story_id=story_id, stage=stage)
+        if not images:
+            logger.error(f"Image generation returned no usable images: {filtered_reasons}")
+            return None
+        logger.info("Successfully created image")
+        return images[0]
 
     except Exception as e:
         logger.error(f"Error in generate_image: {str(e)}", exc_info=True)
         return None
 
+def generate_image_batch(prompts, max_workers=MAX_IMAGE_WORKERS, retries=IMAGE_BATCH_RETRIES, story_id=None, stage='chapter_image'):
+    """
+    Generates one image per prompt for a batch of prompts (a part, or a whole story).
+
+    Imagen takes a single prompt per request, so the batch is fanned out over
+    concurrent calls that each ask for IMAGES_PER_PROMPT candidates. Prompts that
+    come back empty are split out and retried on their own; those whose candidates
+    were safety-filtered are retried with a softened prompt and
+    FILTERED_RETRY_IMAGES_PER_PROMPT candidates, errors with the same request.
+
+    Args:
+        prompts (dict): {key: prompt}
+        max_workers (int): Concurrent Imagen calls
+        retries (int): Individual retries for prompts that produced no image
+        story_id (int): Story the ledger rows are recorded for
+        stage (str): Pipeline step the ledger rows are recorded under
+
+    Returns:
+        dict: {key: PIL.Image or None}
+    """
+    results = {key: None for key in prompts}
+    # Keys whose last request came back with every candidate safety-filtered
+    filtered = set()
+
+    def run(key, prompt, number_of_images, attempt=1):
+        """Returns (key, image or None, whether the candidates were safety-filtered)."""
+        try:
+            images, filtered_reasons = generate_images(prompt, number_of_images, story_id, stage, attempt)
+            return key, (images[0] if images else None), bool(filtered_reasons)
+        except Exception as e:
+            logger.error(f"Error generating image for {key}: {str(e)}")
+            return key, None, False
+
+    def run_in_worker(key, prompt, number_of_images):
+        try:
+            return run(key, prompt, number_of_images)
+        finally:
+            # Ledger rows are written on the worker thread's own connection
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as executor:
+        for key, image, was_filtered in executor.map(run_in_worker, prompts.keys(), prompts.values(), [IMAGES_PER_PROMPT] * len(prompts)):
+            results[key] = image
+            if was_filtered:
+                filtered.add(key)
+
+    for attempt in range(1, retries + 1):
+        pending = [key for key, image in results.items() if image is None]
+        if not pending:
+            break
+        logger.info(f"Retrying {len(pending)} image prompt(s) individually, attempt {attempt}")
+        for key in pending:
+            if key in filtered:
+                key, image, was_filtered = run(
+                    key, SAFE_IMAGE_PROMPT_PREFIX + prompts[key], FILTERED_RETRY_IMAGES_PER_PROMPT, attempt + 1
+                )
+            else:
+                key, image, was_filtered = run(key, prompts[key], IMAGES_PER_PROMPT, attempt + 1)
+            results[key] = image
+            if was_filtered:
+                filtered.add(key)
+
+    return results
+
+def get_image_content_key(prompt):
+    """Content key of a generated image: same prompt and model, same artifact."""
+    return get_content_key('image', IMAGEN_MODEL, {'output_mime_type': 'image/jpeg'}, prompt)
+
+def get_cached_images(prompts):
+    """
+    Looks up previously generated images for a batch of prompts.
+
+    Args:
+        prompts (dict): {key: prompt}
+
+    Returns:
+        dict: {key: (PIL.Image, Artifact)} for the prompts that were cache hits
+    """
+    content_keys = {key: get_image_content_key(prompt) for key, prompt in prompts.items()}
+    artifacts = get_artifacts(content_keys.values())
+    cached = {}
+    for key, content_key in content_keys.items():
+        artifact = artifacts.get(content_key)
+        if not artifact:
+            continue
+        image_bytes = load_artifact(artifact)
+        if image_bytes:
+            cached[key] = (Image.open(BytesIO(image_bytes)), artifact)
+    return cached
+
+def cache_generated_image(prompt, image):
+    """Stores a freshly generated image as an artifact so repeat prompts skip Imagen."""
+    try:
+        image_io = BytesIO()
+        image.convert('RGB').save(image_io, format='JPEG', quality=95)
+        return store_artifact(
+            'image', get_image_content_key(prompt), image_io.getvalue(), 'image/jpeg', 'jpg'
+        )
+    except Exception as e:
+        # The story image is still stored under the story path without the artifact
+        logger.error(f"Error caching generated image: {str(e)}")
+        return None
+
+def generate_and_store_images(story_instance, prompts, max_workers=MAX_IMAGE_WORKERS, store=None):
+    """
+    Generates a batch of chapter images and stores each as PartX_ChapterY.jpg.
+
+    Args:
+        story_instance (Story): The Story model instance
+        prompts (dict): {(part_key, chapter_key): prompt}
+        max_workers (int): Concurrent Imagen calls
+        store (StoryArtifactStore): Store of the story, built from story_instance if not given
+
+    Returns:
+        list: The (part_key, chapter_key) keys that were stored
+    """
+    store = store or StoryArtifactStore.for_story(story_instance)
+    stored = []
+    cached = get_cached_images(prompts)
+    if cached:
+        logger.info(f"{len(cached)}/{len(prompts)} image prompts for story {story_instance.id} were cache hits")
+    misses = {key: prompt for key, prompt in prompts.items() if key not in cached}
+    generated = generate_image_batch(misses, max_workers=max_workers, story_id=story_instance.id) if misses else {}
+
+    for (part_key, chapter_key) in prompts:
+        if (part_key, chapter_key) in cached:
+            image, artifact = cached[(part_key, chapter_key)]
+        else:
+            image = generated.get((part_key, chapter_key))
+            artifact = cache_generated_image(prompts[(part_key, chapter_key)], image) if image else None
+        if image is None:
+            logger.error(f"No image generated for story {story_instance.id}, {part_key}, {chapter_key}")
+            continue
+        try:
+            store_image(story_instance, image, part_key, chapter_key, artifact=artifact, store=store)
+            stored.append((part_key, chapter_key))
+        except Exception as e:
+            logger.error(f"Error storing image for story {story_instance.id}, {part_key}, {chapter_key}: {str(e)}")
+    return stored
+
 
 def manipulate_image(image_path, output_path, new_width, new_height, top_text, bottom_text, font_size=30, font_color=(255, 255, 255), text_bg_color=(0, 0, 0, 128)):
     """
@@ -108,12 +302,7 @@ def manipulate_image(image_path, output_path, new_width, new_height, top_text, b
         draw = ImageDraw.Draw(resized_img)
         img_width, img_height = resized_img.size
 
-        # Choose a font (you might need to adjust the path based on your system)
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except IOError:
-            font = ImageFont.load_default()
-            print("Arial font not found, using default font.")
+        font = get_font(size=font_size)
 
         # --- Overlay Top Text ---
         top_text_width, top_text_height = draw.textbbox((0, 0), top_text, font=font)[2:]
@@ -153,7 +342,7 @@ def manipulate_image(image_path, output_path, new_width, new_height, top_text, b
     except Exception as e:
         print(f"An error occurred: {e}")
 
-def generate_and_store_image(story_instance, prompt, part_key=None, chapter_key=None):
+def generate_and_store_image(story_instance, prompt, part_key=None, chapter_key=None, transforms=None, store=None):
     """
     Generate an image based on a prompt and store it in GCS.
     
@@ -162,55 +351,198 @@ def generate_and_store_image(story_instance, prompt, part_key=None, chapter_key=
         prompt (str): The prompt for image generation
         part_key (str): The part identifier (e.g., 'part_1', 'part_2')
         chapter_key (str): The chapter identifier (e.g., 'chapter_1', 'chapter_2')
+        transforms (list): Callables applied to the image before it is uploaded.
+            Defaults to get_cover_transforms() for the cover and nothing for chapters.
+        store (StoryArtifactStore): Store of the story, built from story_instance if not given
     
     Returns:
         bool: Whether the operation was successful
     """
     try:
-        logger.debug(f"Generating image for story {story_instance.id} with prompt: {prompt}")
-        generated_image = generate_image(prompt)
-        
-        if not generated_image:
-            logger.error("Image generation returned None")
-            return False
-            
-        # Create StoryImages instance if it doesn't exist
-        story_images, created = StoryImages.objects.get_or_create(story=story_instance)
-        
-        # Convert PIL Image to bytes
-        image_io = BytesIO()
-        generated_image.save(image_io, format='JPEG')
-        image_io.seek(0)
-        
-        # Generate filename based on part and chapter
-        if part_key and chapter_key:
-            # Extract just the numbers, handling "Part X" and "Chapter Y" format
-            part_num = part_key.replace('Part ', '').strip()
-            chapter_num = chapter_key.replace('Chapter ', '').strip()
-            filename = f"Part{part_num}_Chapter{chapter_num}.jpg"
+        cached = get_cached_images({'image': prompt})
+        if cached:
+            logger.debug(f"Using cached image for story {story_instance.id} with prompt: {prompt}")
+            generated_image, artifact = cached['image']
         else:
-            filename = "cover.jpg"
-        
-        # Save to Google Cloud Storage
-        username = story_instance.adventure.user.username
-        adventure_id = story_instance.adventure.id
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(f"{username}/adventure_{adventure_id}/story_{story_instance.id}/{filename}")
-        
-        # Upload the image
-        blob.upload_from_file(
-            image_io,
-            content_type='image/jpeg'
-        )
-        
-        logger.debug(f"Image saved to GCS for story {story_instance.id} as {filename}")
-        return True
+            logger.debug(f"Generating image for story {story_instance.id} with prompt: {prompt}")
+            stage = 'chapter_image' if part_key and chapter_key else 'cover_image'
+            generated_image = generate_image(prompt, story_instance.id, stage)
+            
+            if not generated_image:
+                logger.error("Image generation returned None")
+                return False
+            artifact = cache_generated_image(prompt, generated_image)
+
+        if transforms is None and not (part_key and chapter_key):
+            transforms = get_cover_transforms(story_instance)
+
+        return store_image(story_instance, generated_image, part_key, chapter_key, transforms, artifact=artifact, store=store)
 
     except Exception as e:
         logger.error(f"Error in generate_and_store_image: {str(e)}")
         return False
 
+def store_image(story_instance, image, part_key=None, chapter_key=None, transforms=None, artifact=None, store=None):
+    """
+    Applies the transform chain to an in-memory image, uploads it once and records its variants.
+
+    Args:
+        story_instance (Story): The Story model instance
+        image (PIL.Image): The image to store
+        part_key (str): The part identifier, None for the cover
+        chapter_key (str): The chapter identifier, None for the cover
+        transforms (list): Callables taking and returning a PIL image
+        artifact (Artifact): The cached source image, referenced by the story so it isn't collected
+        store (StoryArtifactStore): Store of the story, built from story_instance if not given
+
+    Returns:
+        bool: Whether the operation was successful
+    """
+    image = apply_transforms(image, transforms)
+
+    # Create StoryImages instance if it doesn't exist
+    StoryImages.objects.get_or_create(story=story_instance)
+
+    # Single lossy encode; every later copy is derived from the in-memory image
+    image_io = BytesIO()
+    image.convert('RGB').save(image_io, format='JPEG', quality=95)
+
+    store = store or StoryArtifactStore.for_story(story_instance)
+    image_key = store.image_key(part_key, chapter_key)
+    
+    # Upload the image
+    generation = store.upload(image_key, image_io.getvalue(), 'image/jpeg')
+
+    record_image_variants(
+        story_instance,
+        store,
+        image,
+        part_key=part_key,
+        chapter_key=chapter_key,
+        generation=generation
+    )
+    
+    if artifact:
+        add_artifact_reference(artifact, story_instance, get_image_base_name(part_key, chapter_key))
+    
+    logger.debug(f"Image saved to GCS for story {story_instance.id} as {image_key}")
+    return True
+
+def encode_image(image, image_format):
+    """Encodes a PIL image as JPEG or WebP bytes."""
+    image_io = BytesIO()
+    image.convert('RGB').save(
+        image_io,
+        format=image_format.upper(),
+        quality=IMAGE_VARIANT_QUALITY[image_format],
+        optimize=image_format == 'jpeg'
+    )
+    return image_io.getvalue()
+
+def store_image_variants(store, part_key, chapter_key, image, generation=None):
+    """
+    Uploads thumbnail, medium and WebP copies of an image.
+
+    Args:
+        store (StoryArtifactStore): Store of the story the image belongs to
+        part_key (str): The part identifier, None for the cover
+        chapter_key (str): The chapter identifier, None for the cover
+        image (PIL.Image): The final (post-processing) image
+        generation (int): Generation of the uploaded original
+
+    Returns:
+        dict: {variant_name: {'blob': str, 'width': int, 'format': str, 'generation': int}}
+    """
+    base_name = get_image_base_name(part_key, chapter_key)
+    variants = {}
+    renditions = [('webp', image, 'webp')]
+    for size_name, width in IMAGE_VARIANT_WIDTHS.items():
+        if image.size[0] <= width:
+            continue
+        height = int(image.size[1] * width / image.size[0])
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        renditions.append((size_name, resized, 'jpeg'))
+        renditions.append((f"{size_name}_webp", resized, 'webp'))
+
+    for variant_name, variant_image, image_format in renditions:
+        extension = 'jpg' if image_format == 'jpeg' else image_format
+        suffix = '' if variant_name == 'webp' else f"_{variant_name.replace('_webp', '')}"
+        blob_name = store.variant_key(base_name, suffix, extension)
+        variant_generation = store.upload(
+            blob_name,
+            encode_image(variant_image, image_format),
+            f"image/{image_format}"
+        )
+        variants[variant_name] = {
+            'blob': blob_name,
+            'width': variant_image.size[0],
+            'format': image_format,
+            'generation': variant_generation,
+        }
+
+    # The original JPEG is the largest entry of the JPEG srcset
+    variants['full'] = {
+        'blob': store.image_key(part_key, chapter_key),
+        'width': image.size[0],
+        'format': 'jpeg',
+        'generation': generation,
+    }
+    return variants
+
+def record_image_variants(story_instance, store, image, part_key=None, chapter_key=None, generation=None):
+    """Creates the variants for a stored image and saves them on StoryImages/ChapterImage."""
+    try:
+        variants = store_image_variants(store, part_key, chapter_key, image, generation)
+    except Exception as e:
+        # Variants are an optimisation, the original image is still usable without them.
+        # It is still recorded, so its URL carries the generation and readers never
+        # mistake the story for one from before variants existed.
+        logger.error(f"Error creating image variants for story {story_instance.id}: {str(e)}")
+        variants = {'full': {
+            'blob': store.image_key(part_key, chapter_key),
+            'width': image.size[0],
+            'format': 'jpeg',
+            'generation': generation,
+        }}
+    try:
+        story_images, created = StoryImages.objects.get_or_create(story=story_instance)
+        if part_key and chapter_key:
+            ChapterImage.objects.update_or_create(
+                story_images=story_images,
+                part_key=part_key,
+                chapter_key=chapter_key,
+                defaults={
+                    'image': store.image_key(part_key, chapter_key),
+                    'variants': variants,
+                }
+            )
+        else:
+            story_images.cover_variants = variants
+            story_images.save(update_fields=['cover_variants'])
+        return variants
+    except Exception as e:
+        logger.error(f"Error recording image variants for story {story_instance.id}: {str(e)}")
+        return {}
+
+def build_srcset(variants, image_format='jpeg'):
+    """Builds an <img srcset> value from a variants dict, smallest image first."""
+    entries = sorted(
+        (variant['width'], variant['blob'], variant.get('generation'))
+        for variant in (variants or {}).values()
+        if variant.get('format') == image_format
+    )
+    return ', '.join(
+        f"{media_url(blob_name, generation)} {width}w"
+        for width, blob_name, generation in entries
+    )
+
+def get_variant_url(variants, variant_name, fallback_url):
+    """Returns the public URL of a single variant, or fallback_url if it wasn't generated."""
+    variant = (variants or {}).get(variant_name)
+    if not variant:
+        return fallback_url
+    return media_url(variant['blob'], variant.get('generation'))
+
 def get_stored_image(story_instance, part_key=None, chapter_key=None):
     """
     Retrieve an image from GCS for manipulation.
@@ -224,203 +556,131 @@ def get_stored_image(story_instance, part_key=None, chapter_key=None):
         PIL.Image or None: The image if successfully retrieved, None if any error occurs
     """
     try:
-        # Generate filename based on part and chapter
-        if part_key and chapter_key:
-            filename = f"Part{part_key}_Chapter{chapter_key}.jpg"
-        else:
-            filename = "cover.jpg"
-
-        username = story_instance.adventure.user.username
-        adventure_id = story_instance.adventure.id
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(f"{username}/adventure_{adventure_id}/story_{story_instance.id}/{filename}")
+        store = StoryArtifactStore.for_story(story_instance)
+        image_key = store.image_key(part_key, chapter_key)
         
-        if not blob.exists():
-            logger.error(f"Image not found in GCS for story {story_instance.id}, filename {filename}")
-            return None
-            
         # Download to memory for manipulation
-        image_data = BytesIO()
-        blob.download_to_file(image_data)
-        image_data.seek(0)
-        return Image.open(image_data)
+        image_bytes = store.download(image_key)
+        if image_bytes is None:
+            logger.error(f"Image not found in GCS for story {story_instance.id}, key {image_key}")
+            return None
+        return Image.open(BytesIO(image_bytes))
         
     except Exception as e:
         logger.error(f"Error retrieving image from GCS: {str(e)}")
         return None
 
-def add_image_data(story_instance, part_key=None, chapter_key=None):
+# --- Image Transforms ---
+# Each transform takes a PIL image and returns a new one, so post-processing
+# can be chained on the in-memory image before it is uploaded.
+
+COVER_WIDTH = 800
+COVER_HEIGHT = int(COVER_WIDTH * 1.3)
+
+def fit_to_aspect(image, target_width, target_height, fill='black'):
     """
-    Add text overlays to any story image, with specific handling for cover images.
+    Scales an image to cover target_width x target_height and centres it on a
+    canvas of exactly that size, cropping or letterboxing the overflow.
     """
-    try:
-        # Extract user name from the story instance
-        user_name = story_instance.adventure.user.username
-        adventure_id = story_instance.adventure.id
-        story_id = story_instance.id
+    current_ratio = image.size[0] / image.size[1]
+    target_ratio = target_width / target_height
+    
+    if current_ratio > target_ratio:
+        # Image is too wide
+        new_height = target_height
+        new_width = int(new_height * current_ratio)
+    else:
+        # Image is too tall
+        new_width = target_width
+        new_height = int(new_width / current_ratio)
+        
+    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    
+    canvas = Image.new('RGB', (target_width, target_height), fill)
+    paste_x = (target_width - new_width) // 2
+    paste_y = (target_height - new_height) // 2
+    canvas.paste(resized, (paste_x, paste_y))
+    return canvas
+
+def overlay_cover_text(image, title, author_text):
+    """Draws the wrapped title at the top of the image and the author line at the bottom."""
+    image = image.copy()
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    
+    # Calculate font sizes based on image dimensions
+    title_font_size = int(width * 0.1)  # 10% of image width
+    author_font_size = int(title_font_size * 0.6)  # 60% of title font size
 
-        # Construct image path based on whether it's a cover or chapter image
-        if part_key and chapter_key:
-            # Extract numbers from part_key and chapter_key
-            part_num = part_key.split()[-1]  # Gets the number from "Part X"
-            chapter_num = chapter_key.split()[-1]  # Gets the number from "Chapter X"
-            image_path = f"{user_name}/adventure_{adventure_id}/story_{story_id}/Part{part_num}_Chapter{chapter_num}.jpg"
-        else:
-            # Cover image path
-            image_path = f"{user_name}/adventure_{adventure_id}/story_{story_id}/cover.jpg"
+    title_font = get_font(size=title_font_size)
+    author_font = get_font(size=author_font_size)
+
+    # Calculate maximum width for text (80% of image width)
+    max_text_width = int(width * 0.8)
+    
+    # Wrap title if needed
+    title_lines = wrap_text(title, title_font, max_text_width)
+    line_spacing = title_font_size * 0.2  # 20% of font size
+    
+    # Draw title lines
+    y_position = 50  # Starting position from top
+    for line in title_lines:
+        text_width = measure_text(line, title_font)[0]
+        x_position = (width - text_width) // 2
+        draw.text((x_position, y_position), line, fill='black', font=title_font)
+        y_position += title_font_size + line_spacing
+
+    # Draw author name at bottom
+    author_width = measure_text(author_text, author_font)[0]
+    author_x = (width - author_width) // 2
+    author_y = height - author_font_size - 50  # 50 pixels from bottom
+    draw.text((author_x, author_y), author_text, fill='black', font=author_font)
+    return image
+
+def apply_transforms(image, transforms=None):
+    """Runs an image through a list of transforms in order."""
+    for transform in transforms or []:
+        image = transform(image)
+    return image
+
+def get_cover_author(story_instance):
+    """Returns the 'By <name>' line for a cover, preferring the profile name."""
+    try:
+        author_name = story_instance.adventure.user.userprofile.name
+    except (AttributeError, Adventure.user.RelatedObjectDoesNotExist):
+        try:
+            author_name = story_instance.adventure.user.username
+        except AttributeError:
+            author_name = "Anonymous"
+    return f"By {author_name}"
+
+def get_cover_transforms(story_instance):
+    """Transform chain for covers: fit to the 800x1040 book ratio, then add title and author."""
+    title = story_instance.title or f"Story #{story_instance.id}"
+    return [
+        partial(fit_to_aspect, target_width=COVER_WIDTH, target_height=COVER_HEIGHT),
+        partial(overlay_cover_text, title=title, author_text=get_cover_author(story_instance)),
+    ]
 
-        # Get the image using new naming convention
+def add_image_data(story_instance, part_key=None, chapter_key=None):
+    """
+    Re-applies cover processing to an image that is already in GCS.
+    New images are processed in memory by generate_and_store_image; this is for
+    images stored before that, e.g. when a story title changes.
+    """
+    try:
         image = get_stored_image(story_instance, part_key, chapter_key)
         if not image:
-            logger.error(f"Failed to retrieve image for story {story_id} at path {image_path}")
+            logger.error(f"Failed to retrieve image for story {story_instance.id}")
             return False
 
-        # Set dimensions with 2:3 ratio
-        target_width = 800  # You can adjust this base width as needed
-        target_height = int(target_width * 1.3)  
-        
-        # Resize image maintaining aspect ratio and adding padding if needed
-        current_ratio = image.size[0] / image.size[1]
-        target_ratio = target_width / target_height
-        
-        if current_ratio > target_ratio:
-            # Image is too wide
-            new_height = target_height
-            new_width = int(new_height * current_ratio)
-        else:
-            # Image is too tall
-            new_width = target_width
-            new_height = int(new_width / current_ratio)
-            
-        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Create new image with padding to achieve exact 2:3 ratio
-        new_image = Image.new('RGB', (target_width, target_height), 'black')
-        paste_x = (target_width - new_width) // 2
-        paste_y = (target_height - new_height) // 2
-        new_image.paste(image, (paste_x, paste_y))
-        image = new_image
-
-        if not part_key and chapter_key:
-            # Prepare for text overlay
-            draw = ImageDraw.Draw(image)
-            
-            # Calculate font sizes based on image dimensions
-            title_font_size = int(target_width * 0.1)  # 10% of image width
-            author_font_size = int(title_font_size * 0.6)  # 60% of title font size
-
-            # Try to load fonts with calculated sizes
-            try:
-                # Try system fonts in order of preference
-                font_paths = [
-                    "arial.ttf",
-                    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Common on Linux
-                    "/System/Library/Fonts/Helvetica.ttc",  # Common on macOS
-                    "C:\\Windows\\Fonts\\arial.ttf"  # Common on Windows
-                ]
-                
-                title_font = None
-                for font_path in font_paths:
-                    try:
-                        title_font = ImageFont.truetype(font_path, size=title_font_size)
-                        author_font = ImageFont.truetype(font_path, size=author_font_size)
-                        break
-                    except IOError:
-                        continue
-                
-                if not title_font:
-                    raise IOError("No suitable font found")
-                    
-            except IOError:
-                print("No suitable fonts found, using default font")
-                title_font = ImageFont.load_default()
-                author_font = ImageFont.load_default()
-
-            # Get story title and handle long titles
-            title = story_instance.title or f"Story #{story_instance.id}"
-            
-            # Get user name
-            try:
-                user_name = story_instance.adventure.user.userprofile.name
-            except (AttributeError, Adventure.user.RelatedObjectDoesNotExist):
-                try:
-                    user_name = story_instance.adventure.user.username
-                except AttributeError:
-                    user_name = "Anonymous"
-            author_text = f"By {user_name}"
-
-            # Function to wrap text
-            def wrap_text(text, font, max_width):
-                words = text.split()
-                lines = []
-                current_line = []
-                
-                for word in words:
-                    current_line.append(word)
-                    line = ' '.join(current_line)
-                    bbox = draw.textbbox((0, 0), line, font=font)
-                    if bbox[2] - bbox[0] > max_width:
-                        if len(current_line) == 1:
-                            lines.append(line)
-                            current_line = []
-                        else:
-                            current_line.pop()
-                            lines.append(' '.join(current_line))
-                            current_line = [word]
-                
-                if current_line:
-                    lines.append(' '.join(current_line))
-                return lines
-
-            # Calculate maximum width for text (80% of image width)
-            max_text_width = int(target_width * 0.8)
-            
-            # Wrap title if needed
-            title_lines = wrap_text(title, title_font, max_text_width)
-            
-            # Calculate total height needed for title
-            line_spacing = title_font_size * 0.2  # 20% of font size
-            total_title_height = (title_font_size + line_spacing) * len(title_lines)
-            
-            # Draw title lines
-            y_position = 50  # Starting position from top
-            for line in title_lines:
-                bbox = draw.textbbox((0, 0), line, font=title_font)
-                text_width = bbox[2] - bbox[0]
-                x_position = (target_width - text_width) // 2
-                draw.text((x_position, y_position), line, fill='black', font=title_font)
-                y_position += title_font_size + line_spacing
-
-            # Draw author name at bottom
-            author_bbox = draw.textbbox((0, 0), author_text, font=author_font)
-            author_width = author_bbox[2] - author_bbox[0]
-            author_x = (target_width - author_width) // 2
-            author_y = target_height - author_font_size - 50  # 50 pixels from bottom
-            draw.text((author_x, author_y), author_text, fill='black', font=author_font)
-
-        # Generate filename for saving
         if part_key and chapter_key:
-            filename = f"Part{part_key}_Chapter{chapter_key}.jpg"
+            transforms = [partial(fit_to_aspect, target_width=COVER_WIDTH, target_height=COVER_HEIGHT)]
         else:
-            filename = "cover.jpg"
-
-        # Save back to GCS
-        image_io = BytesIO()
-        image.save(image_io, format='JPEG', quality=95)
-        image_io.seek(0)
-        
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(f"{user_name}/adventure_{adventure_id}/story_{story_id}/{filename}")
-        blob.upload_from_file(
-            image_io,
-            content_type='image/jpeg'
-        )
+            transforms = get_cover_transforms(story_instance)
 
-        return True
+        return store_image(story_instance, image, part_key, chapter_key, transforms)
 
     except Exception as e:
         logger.error(f"Error in add_image_data: {str(e)}")
         return False
-
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Story, QuotaReservation
+from .tier_utils import reserve_story_quota
+from user_profile.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Story generations running at once in this process; more are queued
+STORY_JOB_WORKERS = 8
+# Stories read per query when requeueing
+REQUEUE_CHUNK_SIZE = 500
+# Seconds between heartbeats for the stories queued or running in this process.
+# Must stay well below the sweeper's STORY_STALE_AFTER.
+STORY_HEARTBEAT_INTERVAL = 60
+
+_story_executor = ThreadPoolExecutor(max_workers=STORY_JOB_WORKERS, thread_name_prefix='story-job')
+
+# {story_id: run} for every story queued or running in this process
+_active_runs = {}
+_active_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def run_story_job(story_id, user_id, run):
+    """Executor target; runs one generation and frees the worker's connection afterwards."""
+    # Imported here because the views import this module to start jobs
+    from .views import generate_story
+    try:
+        generate_story(story_id, user_id, run)
+    except Exception as e:
+        logger.error(f"Error in story job for story {story_id}: {str(e)}", exc_info=True)
+    finally:
+        with _active_lock:
+            if _active_runs.get(story_id) == run:
+                del _active_runs[story_id]
+        connection.close()
+
+
+def record_heartbeat(story_id):
+    """Marks a generating story as alive; called as each chapter and image batch is stored."""
+    Story.objects.filter(pk=story_id).update(heartbeat_at=timezone.now())
+
+
+def heartbeat_job():
+    """
+    Thread target; keeps the heartbeat of every story queued or running in this process fresh,
+    so neither a long wait for a worker nor a slow model call makes the sweeper take it over.
+    Once the process dies the heartbeats stop and the sweeper resumes its stories.
+    """
+    while True:
+        time.sleep(STORY_HEARTBEAT_INTERVAL)
+        with _active_lock:
+            active = dict(_active_runs)
+        if not active:
+            continue
+        runs = defaultdict(list)
+        for story_id, run in active.items():
+            runs[run].append(story_id)
+        try:
+            for run, story_ids in runs.items():
+                Story.objects.filter(
+                    pk__in=story_ids,
+                    status='processing',
+                    generation_run=run
+                ).update(heartbeat_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Error recording story heartbeats: {str(e)}")
+        finally:
+            connection.close()
+
+
+def start_heartbeat():
+    global _heartbeat_thread
+    with _active_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=heartbeat_job)
+            _heartbeat_thread.daemon = True
+            _heartbeat_thread.start()
+
+
+def claim_story_run(story_id, run):
+    """
+    Compare-and-set check a job makes on entry: the story must still be processing
+    under this run, i.e. no sweep or requeue has queued it again since.
+
+    Returns:
+        bool: Whether the job still owns the story
+    """
+    return bool(Story.objects.filter(
+        pk=story_id,
+        status='processing',
+        generation_run=run
+    ).update(heartbeat_at=timezone.now()))
+
+
+def enqueue_story_generation(story_id, user_id, run=0):
+    """
+    Queues generation of a story that is already 'processing' and holds its quota reservation.
+
+    Args:
+        story_id (int): Story to generate
+        user_id (int): Owner of the story; media paths are built from it
+        run (int): The story's generation_run this job was queued under
+
+    Returns:
+        Future: Completes when the generation has finished
+    """
+    # Counts as progress, so a story waiting for a free worker isn't swept as stuck
+    record_heartbeat(story_id)
+    with _active_lock:
+        _active_runs[story_id] = run
+    start_heartbeat()
+    return _story_executor.submit(run_story_job, story_id, user_id, run)
+
+
+def requeue_failed_stories(stories, chunk_size=REQUEUE_CHUNK_SIZE):
+    """
+    Puts failed stories back into generation. Each one takes a new quota slot
+    from its owner, since its earlier reservation was released when it failed.
+
+    Args:
+        stories (QuerySet): Stories to requeue; only those still 'failed' are touched
+
+    Returns:
+        tuple: (stories requeued, stories skipped because their owner is out of quota or has no profile)
+    """
+    requeued = 0
+    skipped = 0
+    last_id = 0
+    failed = stories.filter(status='failed').order_by('id').values_list('id', 'adventure__user_id', 'generation_run')
+    while True:
+        chunk = list(failed.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        profiles = UserProfile.objects.in_bulk({user_id for _, user_id, _ in chunk}, field_name='user_id')
+
+        for story_id, user_id, run in chunk:
+            profile = profiles.get(user_id)
+            if profile is None:
+                skipped += 1
+                continue
+            with transaction.atomic():
+                claimed = Story.objects.filter(pk=story_id, status='failed', generation_run=run).update(
+                    status='processing',
+                    error='',
+                    generation_attempts=0,
+                    generation_run=run + 1,
+                    updated_at=timezone.now()
+                )
+                if not claimed:
+                    continue
+                allowed, counter = reserve_story_quota(profile)
+                if not allowed:
+                    transaction.set_rollback(True)
+                    skipped += 1
+                    continue
+                if counter:
+                    QuotaReservation.objects.update_or_create(
+                        story_id=story_id,
+                        defaults={'counter': counter, 'status': 'reserved'}
+                    )
+            enqueue_story_generation(story_id, user_id, run + 1)
+            requeued += 1
+
+    logger.info(f"Requeued {requeued} failed stories, skipped {skipped}")
+    return requeued, skipped
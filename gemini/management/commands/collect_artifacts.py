@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from gemini.artifacts import ARTIFACT_GC_GRACE, collect_unreferenced_artifacts
+
+
+class Command(BaseCommand):
+    help = 'Deletes content-addressed artifacts that no story references anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=ARTIFACT_GC_GRACE.total_seconds() / 3600,
+                            help='Only artifacts stored longer ago than this')
+
+    def handle(self, *args, **options):
+        deleted, reclaimed = collect_unreferenced_artifacts(timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} artifacts, reclaimed {reclaimed / (1024 * 1024):.1f} MB"
+        ))
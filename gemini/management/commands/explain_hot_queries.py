@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from gemini.models import Adventure, Story
+from user_profile.models import UsageCounter
+
+User = get_user_model()
+
+SEED_STATUSES = ['completed', 'completed', 'completed', 'failed', 'processing']
+
+
+class Command(BaseCommand):
+    help = 'Prints EXPLAIN plans for the library, tier and admin queries, optionally against seeded data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-users', type=int, default=0,
+                            help='Seed this many users (rolled back afterwards) so the planner sees realistic sizes')
+        parser.add_argument('--adventures', type=int, default=5, help='Adventures per seeded user')
+        parser.add_argument('--stories', type=int, default=10, help='Stories per seeded adventure')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed_users']:
+                self.seed(options['seed_users'], options['adventures'], options['stories'])
+
+            user = User.objects.filter(adventures__isnull=False).order_by('-id').first()
+            if user is None:
+                self.stdout.write(self.style.ERROR('No user with adventures found; run with --seed-users'))
+                return
+            adventure = user.adventures.order_by('-created_at').first()
+            period_end = timezone.now()
+            period_start = period_end - timedelta(days=30)
+
+            for name, queryset in self.get_hot_queries(user, adventure, period_start, period_end):
+                self.explain(name, queryset, options['analyze'])
+
+            # Nothing seeded is kept
+            transaction.set_rollback(True)
+
+    def get_hot_queries(self, user, adventure, period_start, period_end):
+        return [
+            ('library: adventures of a user', Adventure.objects.filter(user=user).order_by('-created_at')),
+            ('library: processing stories of a user', Story.objects.filter(
+                adventure__user=user,
+                status='processing'
+            ).select_related('adventure')),
+            ('home: completed stories of an adventure', Story.objects.filter(
+                adventure=adventure,
+                status='completed'
+            ).select_related('story_images').order_by('-created_at')),
+            ('tier: usage counter of the current period', UsageCounter.objects.filter(
+                user_id=user.id,
+                period_start=period_start
+            )),
+            ('tier: stories in a period (counter seeding)', Story.objects.filter(
+                adventure__user_id=user.id,
+                created_at__gte=period_start,
+                created_at__lt=period_end
+            )),
+            ('admin: story list page', Story.objects.select_related('adventure__user').order_by('-id')[:20]),
+            ('admin: stuck processing stories', Story.objects.filter(
+                status='processing',
+                updated_at__lt=period_end - timedelta(hours=1)
+            )),
+            ('admin: users with story counts', User.objects.annotate(story_count=Count('adventures__stories'))),
+        ]
+
+    def explain(self, name, queryset, analyze):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"== {name}"))
+        self.stdout.write(str(queryset.query))
+        self.stdout.write(queryset.explain(analyze=analyze) if analyze else queryset.explain())
+        self.stdout.write('')
+
+    def seed(self, user_count, adventures_per_user, stories_per_adventure):
+        """Bulk-inserts users, adventures and stories spread over the last 90 days."""
+        run_id = timezone.now().strftime('%Y%m%d%H%M%S')
+        users = User.objects.bulk_create([
+            User(username=f"explain_{run_id}_{i}", email=f"explain_{run_id}_{i}@example.com")
+            for i in range(user_count)
+        ])
+        if not all(user.pk for user in users):
+            # Backends without RETURNING on bulk insert
+            users = list(User.objects.filter(username__startswith=f"explain_{run_id}_"))
+
+        Adventure.objects.bulk_create([
+            Adventure(user=user, adventure_number=number)
+            for user in users
+            for number in range(1, adventures_per_user + 1)
+        ])
+        adventures = list(Adventure.objects.filter(user__in=users))
+
+        stories = [
+            Story(adventure=adventure, prompt='Seeded story', status=SEED_STATUSES[i % len(SEED_STATUSES)])
+            for adventure in adventures
+            for i in range(stories_per_adventure)
+        ]
+        Story.objects.bulk_create(stories, batch_size=1000)
+
+        # auto_now_add gives every story the same timestamp; spread them out
+        now = timezone.now()
+        seeded = list(Story.objects.filter(adventure__in=adventures).only('id'))
+        for i, story in enumerate(seeded):
+            story.created_at = now - timedelta(minutes=(i * 37) % (90 * 24 * 60))
+        Story.objects.bulk_update(seeded, ['created_at'], batch_size=1000)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(f"Seeded {len(users)} users, {len(adventures)} adventures, {len(seeded)} stories")
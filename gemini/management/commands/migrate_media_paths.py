@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from gemini.media import get_media_backend
+from gemini.models import StoryImages, ChapterImage, StoryPdf
+from gemini.story_store import STORY_MEDIA_PREFIX, get_legacy_user_prefix
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Copies story media from username folders to the id-keyed users/<id>/ layout and updates stored blob names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Only migrate this user')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent copy requests')
+        parser.add_argument('--delete-source', action='store_true', help='Delete the old blobs once a user is fully copied')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be copied')
+
+    def handle(self, *args, **options):
+        backend = get_media_backend()
+        users = User.objects.order_by('id').only('id', 'username')
+        if options['user_id']:
+            users = users.filter(id=options['user_id'])
+
+        totals = {'copied': 0, 'skipped': 0, 'failed': 0}
+        for user in users.iterator():
+            result = self.migrate_user(backend, user, options)
+            for key in totals:
+                totals[key] += result[key]
+
+        verb = 'Would copy' if options['dry_run'] else 'Copied'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['copied']} blobs, {totals['skipped']} already migrated, {totals['failed']} failed"
+        ))
+
+    def migrate_user(self, backend, user, options):
+        """Copies one user's blobs, then points their image and PDF records at the new names."""
+        result = {'copied': 0, 'skipped': 0, 'failed': 0}
+        sources = [obj.name for obj in backend.list(get_legacy_user_prefix(user.username))]
+        if not sources:
+            return result
+
+        legacy_root = f"{user.username}/"
+        new_root = f"{STORY_MEDIA_PREFIX}/{user.id}/"
+
+        def rename(blob_name):
+            return new_root + blob_name[len(legacy_root):]
+
+        # Already-copied blobs are kept, so an interrupted run can simply be restarted
+        existing = {obj.name: obj.generation for obj in backend.list(new_root)}
+        moved = {}
+        pending = []
+        for source in sources:
+            if rename(source) in existing:
+                moved[source] = (rename(source), existing[rename(source)])
+                result['skipped'] += 1
+            else:
+                pending.append(source)
+
+        if options['dry_run']:
+            self.stdout.write(f"User {user.id}: {len(pending)} to copy, {result['skipped']} already copied")
+            result['copied'] = len(pending)
+            return result
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(backend.copy, source, rename(source)): source for source in pending}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    moved[source] = (rename(source), future.result())
+                    result['copied'] += 1
+                except Exception as e:
+                    result['failed'] += 1
+                    self.stdout.write(self.style.ERROR(f"Failed to copy {source}: {str(e)}"))
+
+        self.update_records(user, legacy_root, moved)
+
+        if options['delete_source'] and not result['failed']:
+            backend.delete_many(sources)
+
+        self.stdout.write(
+            f"User {user.id}: copied {result['copied']}, skipped {result['skipped']}, failed {result['failed']}"
+        )
+        return result
+
+    @transaction.atomic
+    def update_records(self, user, legacy_root, moved):
+        """Rewrites blob names and generations recorded in the database for the moved blobs."""
+
+        def move_variants(variants):
+            for entry in (variants or {}).values():
+                if entry.get('blob') in moved:
+                    entry['blob'], entry['generation'] = moved[entry['blob']]
+            return variants
+
+        for story_images in StoryImages.objects.filter(story__adventure__user=user):
+            story_images.cover_variants = move_variants(story_images.cover_variants)
+            story_images.save(update_fields=['cover_variants'])
+
+        chapter_images = list(ChapterImage.objects.filter(story_images__story__adventure__user=user))
+        for chapter_image in chapter_images:
+            if chapter_image.image.name in moved:
+                chapter_image.image = moved[chapter_image.image.name][0]
+            chapter_image.variants = move_variants(chapter_image.variants)
+        ChapterImage.objects.bulk_update(chapter_images, ['image', 'variants'])
+
+        story_pdfs = list(StoryPdf.objects.filter(story__adventure__user=user, blob_name__startswith=legacy_root))
+        for story_pdf in story_pdfs:
+            if story_pdf.blob_name in moved:
+                story_pdf.blob_name = moved[story_pdf.blob_name][0]
+        StoryPdf.objects.bulk_update(story_pdfs, ['blob_name'])
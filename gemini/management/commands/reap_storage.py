@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from gemini.storage_reaper import (
+    REAPER_PAGE_SIZE, REAPER_WORKERS, schedule_storage_cleanup, reap_pending_storage, find_orphaned_prefixes
+)
+
+
+class Command(BaseCommand):
+    help = 'Deletes the stored media of deleted users, adventures and stories, resuming any interrupted cleanup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', action='append', default=[], help='Also queue this storage prefix')
+        parser.add_argument('--orphans', action='store_true', help='Queue folders of users that no longer exist, legacy username folders included')
+        parser.add_argument('--page-size', type=int, default=REAPER_PAGE_SIZE, help='Objects listed per page')
+        parser.add_argument('--workers', type=int, default=REAPER_WORKERS, help='Concurrent batch deletes')
+
+    def handle(self, *args, **options):
+        for prefix in options['prefix']:
+            schedule_storage_cleanup(prefix)
+
+        if options['orphans']:
+            orphans = 0
+            for prefix in find_orphaned_prefixes():
+                schedule_storage_cleanup(prefix)
+                orphans += 1
+            self.stdout.write(f"Queued {orphans} orphaned folders")
+
+        cleaned, deleted, reclaimed = reap_pending_storage(options['page_size'], options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Cleaned {cleaned} prefixes: deleted {deleted} objects, reclaimed {reclaimed / (1024 * 1024):.1f} MB"
+        ))
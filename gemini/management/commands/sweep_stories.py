@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from gemini.sweeper import STORY_MAX_ATTEMPTS, STORY_STALE_AFTER, sweep_stuck_stories
+
+
+class Command(BaseCommand):
+    help = 'Resumes processing stories whose generation job was lost, or fails them after too many attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=int(STORY_STALE_AFTER.total_seconds() // 60),
+                            help='Minutes without a heartbeat before a story counts as stuck')
+        parser.add_argument('--max-attempts', type=int, default=STORY_MAX_ATTEMPTS,
+                            help='Runs a story gets before it is marked failed')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be resumed or failed')
+
+    def handle(self, *args, **options):
+        # Resumed generations run in this process, so the command returns once they have finished
+        resumed, failed = sweep_stuck_stories(
+            stale_after=timedelta(minutes=options['stale_minutes']),
+            max_attempts=options['max_attempts'],
+            dry_run=options['dry_run']
+        )
+        if options['dry_run']:
+            self.stdout.write(f"Would resume {resumed} stuck stories and fail {failed}")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Resumed {resumed} stuck stories and failed {failed}"))
@@ -0,0 +1,280 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from google.cloud import storage
+from google.api_core.exceptions import NotFound
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+DEFAULT_MEDIA_BUCKET = 'write-res'
+DEFAULT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# GCS accepts at most 100 calls per batch request
+GCS_BATCH_SIZE = 100
+
+# The local backend keeps custom metadata in a JSON file next to the object
+METADATA_SUFFIX = '.metadata.json'
+
+
+def get_cache_control():
+    return getattr(settings, 'STORY_MEDIA_CACHE_CONTROL', DEFAULT_CACHE_CONTROL)
+
+
+def add_generation(url, generation):
+    """Appends the blob generation so a re-uploaded object gets a new URL."""
+    if not generation:
+        return url
+    return f"{url}?generation={generation}"
+
+
+def upload_blob(blob, data, content_type):
+    """
+    Uploads bytes to a GCS blob with the long-lived Cache-Control header.
+
+    Returns:
+        int: The new generation of the blob
+    """
+    blob.cache_control = get_cache_control()
+    blob.upload_from_string(data, content_type=content_type)
+    return blob.generation
+
+
+class StoredObject:
+    """Listing entry shared by the backends: name, size, generation and custom metadata."""
+
+    __slots__ = ('name', 'size', 'generation', 'metadata')
+
+    def __init__(self, name, size, generation, metadata=None):
+        self.name = name
+        self.size = size
+        self.generation = generation
+        self.metadata = metadata or {}
+
+    def __repr__(self):
+        return f"StoredObject({self.name!r}, size={self.size}, generation={self.generation})"
+
+
+# --- Backends ---
+
+class GCSMediaBackend:
+    """Serves story media from a GCS bucket, optionally through a CDN host or signed URLs."""
+
+    def __init__(self, bucket_name, base_url, signed_urls=False, signed_url_ttl=3600):
+        self.bucket_name = bucket_name
+        self.base_url = base_url.rstrip('/')
+        self.signed_urls = signed_urls
+        self.signed_url_ttl = signed_url_ttl
+        self._local = threading.local()
+
+    @property
+    def bucket(self):
+        # One client per thread: batches are tracked on the client, so parallel
+        # delete_many() calls must not share one
+        bucket = getattr(self._local, 'bucket', None)
+        if bucket is None:
+            bucket = self._local.bucket = storage.Client().bucket(self.bucket_name)
+        return bucket
+
+    def upload(self, blob_name, data, content_type, metadata=None):
+        blob = self.bucket.blob(blob_name)
+        if metadata:
+            blob.metadata = metadata
+        return upload_blob(blob, data, content_type)
+
+    def get_generation(self, blob_name):
+        """Returns the current generation of a blob, or None if it doesn't exist (one RPC)."""
+        blob = self.bucket.get_blob(blob_name)
+        return blob.generation if blob else None
+
+    def download(self, blob_name):
+        try:
+            return self.bucket.blob(blob_name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def list(self, prefix, page_size=1000):
+        """Lists every object under a prefix; the client pages through the results."""
+        for blob in self.bucket.client.list_blobs(self.bucket, prefix=prefix, page_size=page_size):
+            yield StoredObject(blob.name, blob.size, blob.generation, blob.metadata)
+
+    def list_prefixes(self, prefix):
+        """Immediate sub-folders of a prefix, e.g. 'users/' -> 'users/1/', 'users/2/', ..."""
+        iterator = self.bucket.client.list_blobs(self.bucket, prefix=prefix, delimiter='/')
+        for page in iterator.pages:
+            yield from sorted(page.prefixes)
+
+    def delete_many(self, blob_names):
+        """Deletes objects in batched requests of up to GCS_BATCH_SIZE; missing objects are ignored."""
+        blob_names = list(blob_names)
+        client = self.bucket.client
+        for start in range(0, len(blob_names), GCS_BATCH_SIZE):
+            with client.batch(raise_exception=False):
+                for blob_name in blob_names[start:start + GCS_BATCH_SIZE]:
+                    self.bucket.blob(blob_name).delete()
+        return len(blob_names)
+
+    def copy(self, source_name, destination_name):
+        """
+        Server-side copy; object metadata, Cache-Control included, carries over.
+
+        Returns:
+            int: Generation of the new object
+        """
+        new_blob = self.bucket.copy_blob(self.bucket.blob(source_name), self.bucket, destination_name)
+        return new_blob.generation
+
+    def url(self, blob_name, generation=None):
+        if self.signed_urls:
+            return self.bucket.blob(blob_name, generation=generation).generate_signed_url(
+                version='v4',
+                expiration=timedelta(seconds=self.signed_url_ttl),
+                method='GET'
+            )
+        return add_generation(f"{self.base_url}/{quote(blob_name)}", generation)
+
+
+class LocalMediaBackend:
+    """Writes story media under a local directory; used for offline runs and tests."""
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def get_path(self, blob_name):
+        return os.path.join(self.root, *blob_name.split('/'))
+
+    def get_metadata_path(self, blob_name):
+        return self.get_path(blob_name) + METADATA_SUFFIX
+
+    def upload(self, blob_name, data, content_type, metadata=None):
+        path = self.get_path(blob_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if metadata:
+            with open(self.get_metadata_path(blob_name), 'w') as f:
+                json.dump(metadata, f)
+        elif os.path.exists(self.get_metadata_path(blob_name)):
+            os.remove(self.get_metadata_path(blob_name))
+        return self.get_generation(blob_name)
+
+    def get_generation(self, blob_name):
+        try:
+            return os.stat(self.get_path(blob_name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def download(self, blob_name):
+        try:
+            with open(self.get_path(blob_name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_metadata(self, blob_name):
+        try:
+            with open(self.get_metadata_path(blob_name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def list(self, prefix, page_size=None):
+        for directory, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                if filename.endswith(METADATA_SUFFIX):
+                    continue
+                path = os.path.join(directory, filename)
+                blob_name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if not blob_name.startswith(prefix):
+                    continue
+                stat = os.stat(path)
+                yield StoredObject(blob_name, stat.st_size, stat.st_mtime_ns, self.get_metadata(blob_name))
+
+    def list_prefixes(self, prefix):
+        directory = self.get_path(prefix.rstrip('/'))
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if os.path.isdir(os.path.join(directory, name)):
+                yield f"{prefix}{name}/"
+
+    def delete_many(self, blob_names):
+        deleted = 0
+        for blob_name in blob_names:
+            if os.path.exists(self.get_metadata_path(blob_name)):
+                os.remove(self.get_metadata_path(blob_name))
+            try:
+                os.remove(self.get_path(blob_name))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def copy(self, source_name, destination_name):
+        destination = self.get_path(destination_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(self.get_path(source_name), destination)
+        if os.path.exists(self.get_metadata_path(source_name)):
+            shutil.copyfile(self.get_metadata_path(source_name), self.get_metadata_path(destination_name))
+        return self.get_generation(destination_name)
+
+    def url(self, blob_name, generation=None):
+        return add_generation(f"{self.base_url}/{quote(blob_name)}", generation)
+
+
+@lru_cache(maxsize=1)
+def get_media_backend():
+    """Returns the configured media backend, built once per process."""
+    backend = getattr(settings, 'STORY_MEDIA_BACKEND', 'gcs')
+    if backend == 'local':
+        return LocalMediaBackend(
+            root=os.path.join(settings.MEDIA_ROOT or settings.BASE_DIR, 'story_media'),
+            base_url=f"{settings.MEDIA_URL.rstrip('/')}/story_media"
+        )
+    bucket_name = getattr(settings, 'STORY_MEDIA_BUCKET', DEFAULT_MEDIA_BUCKET)
+    return GCSMediaBackend(
+        bucket_name=bucket_name,
+        base_url=getattr(settings, 'STORY_MEDIA_BASE_URL', f"https://storage.googleapis.com/{bucket_name}"),
+        signed_urls=getattr(settings, 'STORY_MEDIA_SIGNED_URLS', False),
+        signed_url_ttl=getattr(settings, 'STORY_MEDIA_SIGNED_URL_TTL', 3600)
+    )
+
+
+# --- Public Accessors ---
+
+def upload_media(blob_name, data, content_type):
+    """
+    Uploads story media with immutable cache headers.
+
+    Returns:
+        int: The generation to pass to media_url() so the URL changes with the content
+    """
+    return get_media_backend().upload(blob_name, data, content_type)
+
+
+def get_media_generation(blob_name):
+    """Returns the generation of stored media, or None if it doesn't exist."""
+    return get_media_backend().get_generation(blob_name)
+
+
+def media_url(blob_name, generation=None):
+    """
+    Returns the URL for a piece of story media.
+
+    Uploads are cached as immutable, so pass the generation for any key that can be
+    overwritten (images, audio); only content-addressed keys are safe without it.
+
+    Args:
+        blob_name (str): Path of the media inside the bucket
+        generation (int): Blob generation recorded at upload; adds a versioned query string
+    """
+    return get_media_backend().url(blob_name, generation)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('blob_name', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('story', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pdf', to='gemini.story')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0002_storypdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='storyimages',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
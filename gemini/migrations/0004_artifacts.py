@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Artifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_key', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('audio', 'Audio')], max_length=20)),
+                ('blob_name', models.CharField(max_length=500)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArtifactReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('artifact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='gemini.artifact')),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifact_references', to='gemini.story')),
+            ],
+            options={
+                'unique_together': {('story', 'role')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:05
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def get_number(key):
+    """'Part 2', 'part2' -> 2"""
+    match = re.search(r'\d+', str(key))
+    return int(match.group()) if match else None
+
+
+def copy_story_content(apps, schema_editor):
+    """Copies each StoryContent.raw_content into Chapter rows."""
+    StoryContent = apps.get_model('gemini', 'StoryContent')
+    Chapter = apps.get_model('gemini', 'Chapter')
+    chapters = []
+    for story_content in StoryContent.objects.iterator(chunk_size=200):
+        for part_key, part_data in (story_content.raw_content or {}).items():
+            for chapter_key, chapter in (part_data or {}).items():
+                part_number = get_number(part_key)
+                chapter_number = get_number(chapter_key)
+                if part_number is None or chapter_number is None or not isinstance(chapter, dict):
+                    continue
+                chapters.append(Chapter(
+                    story_id=story_content.story_id,
+                    part_number=part_number,
+                    chapter_number=chapter_number,
+                    full_text=chapter.get('full_text') or '',
+                    summary=chapter.get('summary') or ''
+                ))
+        if len(chapters) >= 1000:
+            Chapter.objects.bulk_create(chapters, ignore_conflicts=True)
+            chapters = []
+    Chapter.objects.bulk_create(chapters, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0005_storage_cleanup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Chapter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_number', models.PositiveSmallIntegerField()),
+                ('chapter_number', models.PositiveSmallIntegerField()),
+                ('full_text', models.TextField()),
+                ('summary', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapters', to='gemini.story')),
+            ],
+            options={
+                'ordering': ['part_number', 'chapter_number'],
+                'unique_together': {('story', 'part_number', 'chapter_number')},
+            },
+        ),
+        migrations.RunPython(copy_story_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0006_chapters'),
+        ('user_profile', '0003_usage_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('reserved', 'Reserved'), ('committed', 'Committed'), ('released', 'Released')], default='reserved', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('counter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='user_profile.usagecounter')),
+                ('story', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='quota_reservation', to='gemini.story')),
+            ],
+        ),
+    ]
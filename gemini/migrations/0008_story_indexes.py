@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0007_quota_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adventure',
+            index=models.Index(fields=['user', '-created_at'], name='adventure_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['adventure', 'status', '-created_at'], name='story_adventure_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['adventure', 'created_at'], name='story_adventure_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['status', 'updated_at'], name='story_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_stories(apps, schema_editor):
+    Adventure = apps.get_model('gemini', 'Adventure')
+    Story = apps.get_model('gemini', 'Story')
+    story_counts = Story.objects.filter(
+        adventure=OuterRef('pk')
+    ).values('adventure').annotate(total=Count('id')).values('total')
+    Adventure.objects.update(story_count=Coalesce(Subquery(story_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0008_story_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adventure',
+            name='story_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_stories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0009_adventure_story_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='image_prompt',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='generation_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0010_story_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50)),
+                ('kind', models.CharField(choices=[('text', 'Text'), ('image', 'Image'), ('tts', 'Text-to-speech')], default='text', max_length=10)),
+                ('model', models.CharField(max_length=100)),
+                ('input_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('attempt', models.PositiveSmallIntegerField(default=1)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('invalid', 'Invalid'), ('error', 'Error')], default='success', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('story', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='model_calls', to='gemini.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'stage'], name='modelcall_created_stage_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0011_model_calls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='generation_run',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
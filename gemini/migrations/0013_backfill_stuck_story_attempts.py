@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# gemini.sweeper.STORY_MAX_ATTEMPTS when this migration was written
+STORY_MAX_ATTEMPTS = 3
+
+
+def exhaust_stuck_story_attempts(apps, schema_editor):
+    """
+    Stories left 'processing' before heartbeats existed have no job and no quota
+    reservation. Marking their attempts used up makes the sweeper fail them instead
+    of paying for new generations nobody is waiting for.
+    """
+    Story = apps.get_model('gemini', 'Story')
+    Story.objects.filter(status='processing', heartbeat_at__isnull=True).update(
+        generation_attempts=STORY_MAX_ATTEMPTS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gemini', '0012_story_generation_run'),
+    ]
+
+    operations = [
+        migrations.RunPython(exhaust_stuck_story_attempts, migrations.RunPython.noop),
+    ]
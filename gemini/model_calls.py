@@ -0,0 +1,152 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db.models import Avg, Count, Q, Sum
+
+from .models import ModelCall
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# List prices in USD, used only by the cost report; update them when Google's pricing changes.
+# Text models are billed per million input/output tokens, Imagen per image returned.
+MODEL_PRICES = {
+    'gemini-1.5-pro': {'input': 1.25, 'output': 5.00},
+    'imagen-3.0-generate-002': {'unit': 0.04},
+}
+# Text-to-speech is billed per million characters, by voice family (matched in order)
+TTS_PRICES = [
+    ('Studio', 160.00),
+    ('Chirp', 30.00),
+    ('Standard', 4.00),
+]
+TTS_DEFAULT_PRICE = 16.00  # Neural2, WaveNet, News and other premium voices
+
+MAX_ERROR_LENGTH = 1000
+
+
+def get_model_name(model):
+    """Returns the short model name of a GenerativeModel or ChatSession, e.g. 'gemini-1.5-pro'."""
+    model = getattr(model, 'model', model)
+    name = getattr(model, 'model_name', '') or ''
+    return name.split('/')[-1]
+
+
+def add_usage(call, response):
+    """Adds a Gemini response's token usage to a tracked call."""
+    usage = getattr(response, 'usage_metadata', None)
+    call['input_tokens'] += getattr(usage, 'prompt_token_count', 0) or 0
+    call['output_tokens'] += getattr(usage, 'candidates_token_count', 0) or 0
+
+
+@contextmanager
+def track_model_call(stage, model, story_id=None, kind='text', attempt=1):
+    """
+    Times one model request and writes its ModelCall row when the block exits.
+
+    The block fills in the yielded dict: tokens through add_usage(), 'units' for
+    images or characters, and 'outcome' = 'invalid' for a response it can't use.
+    An exception marks the call as an error and is re-raised.
+
+    Args:
+        stage (str): Pipeline step, e.g. 'outline', 'chapter', 'cover_image'
+        model (str): Model or voice name
+        story_id (int): Story the call was made for, if any
+        kind (str): 'text', 'image' or 'tts'
+        attempt (int): 1 for the first request, higher for retries
+    """
+    call = {'input_tokens': 0, 'output_tokens': 0, 'units': 0, 'outcome': 'success', 'error': ''}
+    start_time = time.monotonic()
+    try:
+        yield call
+    except Exception as e:
+        call['outcome'] = 'error'
+        call['error'] = str(e)
+        raise
+    finally:
+        record_model_call(
+            stage, model, story_id, kind, attempt, call,
+            latency_ms=int((time.monotonic() - start_time) * 1000)
+        )
+
+
+def record_model_call(stage, model, story_id, kind, attempt, call, latency_ms):
+    """Writes a ledger row. Failing to record never fails the generation itself."""
+    try:
+        ModelCall.objects.create(
+            story_id=story_id,
+            stage=stage,
+            kind=kind,
+            model=model,
+            input_tokens=call['input_tokens'],
+            output_tokens=call['output_tokens'],
+            units=call['units'],
+            latency_ms=latency_ms,
+            attempt=attempt,
+            outcome=call['outcome'],
+            error=call['error'][:MAX_ERROR_LENGTH]
+        )
+    except Exception as e:
+        logger.error(f"Error recording {stage} model call for story {story_id}: {str(e)}")
+
+
+def get_story_token_totals(story_id):
+    """
+    Returns the tokens spent on a story across all its model calls, retries and resumed runs included.
+
+    Returns:
+        tuple: (input tokens, output tokens)
+    """
+    totals = ModelCall.objects.filter(story_id=story_id).aggregate(
+        input_tokens=Sum('input_tokens'),
+        output_tokens=Sum('output_tokens')
+    )
+    return totals['input_tokens'] or 0, totals['output_tokens'] or 0
+
+
+def get_call_cost(kind, model, input_tokens, output_tokens, units):
+    """Returns the list-price cost in USD of the given usage, 0 for models without a known price."""
+    if kind == 'tts':
+        price = next((price for family, price in TTS_PRICES if family in model), TTS_DEFAULT_PRICE)
+        return units / 1_000_000 * price
+    prices = MODEL_PRICES.get(model, {})
+    return (
+        input_tokens / 1_000_000 * prices.get('input', 0)
+        + output_tokens / 1_000_000 * prices.get('output', 0)
+        + units * prices.get('unit', 0)
+    )
+
+
+def get_model_cost_report(since=None):
+    """
+    Returns spend and latency per stage and model, most expensive first.
+
+    Args:
+        since (datetime): Only calls made after this time; all calls if None
+
+    Returns:
+        list: One dict per (stage, kind, model) with call counts, tokens, units, latency and cost
+    """
+    calls = ModelCall.objects.all()
+    if since:
+        calls = calls.filter(created_at__gte=since)
+    rows = calls.values('stage', 'kind', 'model').annotate(
+        calls=Count('id'),
+        failed=Count('id', filter=~Q(outcome='success')),
+        stories=Count('story', distinct=True),
+        input_tokens=Sum('input_tokens'),
+        output_tokens=Sum('output_tokens'),
+        units=Sum('units'),
+        total_latency_ms=Sum('latency_ms'),
+        avg_latency_ms=Avg('latency_ms')
+    )
+    report = []
+    for row in rows:
+        row['cost'] = round(get_call_cost(
+            row['kind'], row['model'], row['input_tokens'], row['output_tokens'], row['units']
+        ), 4)
+        row['avg_latency_ms'] = round(row['avg_latency_ms'] or 0)
+        report.append(row)
+    return sorted(report, key=lambda row: row['cost'], reverse=True)
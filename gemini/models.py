@@ -132,6 +132,8 @@ class Adventure(models.Model):
     adventure_number = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Kept in step with the stories by gemini.signals, so the limits below need no query
+    story_count = models.PositiveIntegerField(default=0)
     
     # Store all data in JSON fields
     style_data = JSONField(default=dict)
@@ -141,25 +143,27 @@ class Adventure(models.Model):
 
     class Meta:
         unique_together = ['user', 'adventure_number']
+        indexes = [
+            # Library and home list a user's adventures newest first
+            models.Index(fields=['user', '-created_at'], name='adventure_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s Adventure {self.adventure_number}"
 
+    @property
+    def has_stories(self):
+        return self.story_count > 0
+
     @property
     def character_limit(self):
         """Return character limit based on number of stories"""
-        if not self.pk:  # If this is a new instance (not saved yet)
-            return 5
-        story_count = self.stories.count()
-        return 7 if story_count > 0 else 5
+        return 7 if self.has_stories else 5
 
     @property
     def setting_limit(self):
         """Return setting limit based on number of stories"""
-        if not self.pk:  # If this is a new instance (not saved yet)
-            return 5
-        story_count = self.stories.count()
-        return 7 if story_count > 0 else 5
+        return 7 if self.has_stories else 5
 
     def append_world_data(self, new_data):
         """Append new world data to existing data"""
@@ -246,8 +250,17 @@ class Adventure(models.Model):
             raise ValidationError(f"Too many settings. Limit is {self.setting_limit}")
 
     def save(self, *args, **kwargs):
-        """Override save to ensure validation"""
+        """
+        Override save to ensure validation.
+        story_count is maintained by atomic updates in signals.py, so saving an existing
+        adventure leaves it alone; a copy loaded before a story was added can't overwrite it.
+        """
         self.clean()
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'story_count'
+            ]
         super().save(*args, **kwargs)
 
 class Style(models.Model):
@@ -330,16 +343,33 @@ class Story(models.Model):
     error = models.TextField(blank=True)
     audio = models.FileField(upload_to='story_audio/', null=True, blank=True)
     audio_voice = models.CharField(max_length=100, null=True, blank=True)
+    # Touched by the generation job as it makes progress; a processing story whose
+    # heartbeat stops is picked up by the stuck-job sweeper
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    generation_attempts = models.PositiveSmallIntegerField(default=0)
+    # Bumped each time the story is queued; a job whose run no longer matches has been
+    # superseded and stops instead of generating the story a second time
+    generation_run = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Story for {self.adventure} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
     class Meta:
         verbose_name_plural = "Stories"
+        indexes = [
+            # Completed/processing stories of an adventure, newest first (library, home, prompt page)
+            models.Index(fields=['adventure', 'status', '-created_at'], name='story_adventure_status_idx'),
+            # Stories of an adventure in a created_at range (tier usage seeding)
+            models.Index(fields=['adventure', 'created_at'], name='story_adventure_created_idx'),
+            # Stories in a status across all users, oldest update first (admin, stuck-job sweeps)
+            models.Index(fields=['status', 'updated_at'], name='story_status_updated_idx'),
+        ]
 
 class StoryImages(models.Model):
     story = models.OneToOneField(Story, on_delete=models.CASCADE, related_name='story_images')
     cover_image = models.ImageField(upload_to='story_images/', null=True, blank=True)
+    # Resized/WebP copies of the cover: {variant_name: {'blob': str, 'width': int, 'format': str}}
+    cover_variants = JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"Images for Story {self.story.id}"
@@ -350,6 +380,8 @@ class ChapterImage(models.Model):
     chapter_key = models.CharField(max_length=20)
     image = models.ImageField(upload_to='chapter_images/')
     text_marker = models.TextField(blank=True, null=True)
+    # Resized/WebP copies of the image, same structure as StoryImages.cover_variants
+    variants = JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -360,6 +392,7 @@ class ChapterImage(models.Model):
         return f"{self.story_images.story.id} - {self.part_key} - {self.chapter_key}"
 
 class StoryContent(models.Model):
+    # Superseded by Chapter rows; kept for stories written before chapters were stored separately
     story = models.OneToOneField(Story, on_delete=models.CASCADE, related_name='content')
     raw_content = JSONField(default=dict)  # Will store {part1: {chapter1: {full_text: str, summary: str}}}
 
@@ -368,4 +401,173 @@ class StoryContent(models.Model):
 
     class Meta:
         verbose_name = "Story Content"
-        verbose_name_plural = "Story Contents"
\ No newline at end of file
+        verbose_name_plural = "Story Contents"
+
+class Chapter(models.Model):
+    """
+    One written chapter. Generation writes each chapter as its own row, so the cost of a
+    write doesn't grow with the story and edits to one chapter can't overwrite another.
+    """
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='chapters')
+    part_number = models.PositiveSmallIntegerField()
+    chapter_number = models.PositiveSmallIntegerField()
+    full_text = models.TextField()
+    summary = models.TextField(blank=True)
+    # Kept so a resumed generation can redo the part's images without rewriting the chapter
+    image_prompt = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('story', 'part_number', 'chapter_number')
+        ordering = ['part_number', 'chapter_number']
+
+    @property
+    def part_key(self):
+        return f"Part {self.part_number}"
+
+    @property
+    def chapter_key(self):
+        return f"Chapter {self.chapter_number}"
+
+    def __str__(self):
+        return f"{self.story_id} - {self.part_key} - {self.chapter_key}"
+
+class StoryPdf(models.Model):
+    """Tracks the rendered PDF for a story, keyed by a hash of everything that goes into it."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed')
+    ]
+    story = models.OneToOneField(Story, on_delete=models.CASCADE, related_name='pdf')
+    content_hash = models.CharField(max_length=64, blank=True)
+    blob_name = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"PDF for Story {self.story_id} ({self.status})"
+
+class Artifact(models.Model):
+    """
+    A generated image or audio chunk stored once under a content-addressed blob.
+    The content_key is a hash of the prompt/text, model and generation config, so
+    an identical request is served from storage instead of calling the model again.
+    """
+    KIND_CHOICES = [
+        ('image', 'Image'),
+        ('audio', 'Audio')
+    ]
+    content_key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    blob_name = models.CharField(max_length=500)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} artifact {self.content_key[:12]}"
+
+class ArtifactReference(models.Model):
+    """
+    Use of an artifact by a story. The references are the artifact's reference
+    count: once a story (or its user) is deleted and none remain, the blob can be collected.
+    """
+    artifact = models.ForeignKey(Artifact, on_delete=models.CASCADE, related_name='references')
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='artifact_references')
+    role = models.CharField(max_length=100)  # e.g. 'cover', 'Part1_Chapter2', 'audio_chunk_3'
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('story', 'role')
+
+    def __str__(self):
+        return f"Story {self.story_id} {self.role} -> {self.artifact}"
+
+class StorageCleanup(models.Model):
+    """
+    A storage prefix whose objects are to be deleted, queued when a user, adventure or
+    story is deleted. Progress is saved after every page so an interrupted run resumes.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+    prefix = models.CharField(max_length=500, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    objects_deleted = models.BigIntegerField(default=0)
+    bytes_reclaimed = models.BigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cleanup of {self.prefix} ({self.status})"
+
+class QuotaReservation(models.Model):
+    """
+    A story slot taken from the user's usage counter when the story is submitted.
+    It is committed when generation succeeds and released when it fails, so rejected
+    and failed stories never count against the limit.
+    """
+    STATUS_CHOICES = [
+        ('reserved', 'Reserved'),
+        ('committed', 'Committed'),
+        ('released', 'Released')
+    ]
+    story = models.OneToOneField(Story, on_delete=models.CASCADE, related_name='quota_reservation')
+    counter = models.ForeignKey('user_profile.UsageCounter', on_delete=models.CASCADE, related_name='reservations')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='reserved')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Quota for Story {self.story_id} ({self.status})"
+
+class ModelCall(models.Model):
+    """
+    One request to a generation model (Gemini, Imagen or text-to-speech), recorded as it
+    completes. Story token totals and the admin cost report are computed from these rows.
+    """
+    KIND_CHOICES = [
+        ('text', 'Text'),
+        ('image', 'Image'),
+        ('tts', 'Text-to-speech')
+    ]
+    OUTCOME_CHOICES = [
+        ('success', 'Success'),
+        # A response came back (and was billed) but could not be used, e.g. malformed JSON
+        ('invalid', 'Invalid'),
+        ('error', 'Error')
+    ]
+    # Kept when the story is deleted, the spend still happened
+    story = models.ForeignKey(Story, on_delete=models.SET_NULL, null=True, blank=True, related_name='model_calls')
+    stage = models.CharField(max_length=50)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='text')
+    model = models.CharField(max_length=100)
+    input_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    # Images returned, or characters synthesized
+    units = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    attempt = models.PositiveSmallIntegerField(default=1)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, default='success')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Cost report over a time window
+            models.Index(fields=['created_at', 'stage'], name='modelcall_created_stage_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage} ({self.model}) for Story {self.story_id}"
@@ -0,0 +1,85 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Adventure, Story
+from .story_store import (
+    get_user_prefix, get_adventure_prefix, get_story_prefix,
+    get_legacy_adventure_prefix, get_legacy_story_prefix
+)
+from .storage_reaper import schedule_storage_cleanup, start_storage_reaper
+from .tier_utils import release_story_quota
+
+logger = logging.getLogger(__name__)
+
+
+def queue_storage_cleanup(prefix):
+    """Queues a prefix and runs the reaper once the delete has committed."""
+    try:
+        schedule_storage_cleanup(prefix)
+        transaction.on_commit(start_storage_reaper)
+    except Exception as e:
+        # Never fail the delete itself; the reap_storage command finds leftover folders
+        logger.error(f"Error queueing storage cleanup for {prefix}: {str(e)}")
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def cleanup_user_storage(sender, instance, **kwargs):
+    # Legacy '<username>/' media is queued per adventure, as those are deleted with the user
+    queue_storage_cleanup(get_user_prefix(instance.id))
+
+
+@receiver(pre_delete, sender=Adventure)
+def remember_adventure_owner(sender, instance, **kwargs):
+    # The owner may be deleted in the same cascade, so read the username while it still exists
+    instance._owner_name = get_user_model().objects.filter(
+        id=instance.user_id
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_delete, sender=Adventure)
+def cleanup_adventure_storage(sender, instance, **kwargs):
+    queue_storage_cleanup(get_adventure_prefix(instance.user_id, instance.id))
+    # Media written before the id-keyed layout, unless migrate_media_paths already moved it
+    if getattr(instance, '_owner_name', None):
+        queue_storage_cleanup(get_legacy_adventure_prefix(instance._owner_name, instance.id))
+
+
+@receiver(pre_delete, sender=Story)
+def remember_story_owner(sender, instance, **kwargs):
+    instance._owner = Adventure.objects.filter(
+        id=instance.adventure_id
+    ).values_list('user_id', 'user__username').first()
+
+
+@receiver(post_delete, sender=Story)
+def cleanup_story_storage(sender, instance, **kwargs):
+    owner = getattr(instance, '_owner', None)
+    if owner is None:
+        return
+    user_id, user_name = owner
+    queue_storage_cleanup(get_story_prefix(user_id, instance.adventure_id, instance.id))
+    queue_storage_cleanup(get_legacy_story_prefix(user_name, instance.adventure_id, instance.id))
+
+
+@receiver(post_save, sender=Story)
+def increment_story_count(sender, instance, created, **kwargs):
+    if created:
+        Adventure.objects.filter(pk=instance.adventure_id).update(story_count=F('story_count') + 1)
+
+
+@receiver(post_delete, sender=Story)
+def decrement_story_count(sender, instance, **kwargs):
+    Adventure.objects.filter(pk=instance.adventure_id, story_count__gt=0).update(story_count=F('story_count') - 1)
+
+
+@receiver(pre_delete, sender=Story)
+def release_deleted_story_quota(sender, instance, **kwargs):
+    # The reservation cascades away with the story, so give a still-generating
+    # story's slot back first, whichever delete path removed it
+    release_story_quota(instance.id)
@@ -0,0 +1,239 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import StorageCleanup
+from .media import get_media_backend, GCS_BATCH_SIZE
+from .story_store import STORY_MEDIA_PREFIX
+from .artifacts import ARTIFACT_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Objects listed per page; progress is saved after each page is deleted
+REAPER_PAGE_SIZE = 1000
+# Batch delete requests of a page run concurrently
+REAPER_WORKERS = 8
+# A 'running' cleanup not updated for this long belongs to a worker that died and is taken over
+REAPER_STALE_AFTER = timedelta(minutes=15)
+REAPER_MAX_ATTEMPTS = 5
+
+_reaper_lock = threading.Lock()
+_reaper_thread = None
+_reaper_wakeup = threading.Event()
+
+
+def schedule_storage_cleanup(prefix):
+    """Queues every object under prefix for deletion."""
+    # The trailing slash keeps 'story_1/' from also matching 'story_10'
+    prefix = f"{prefix.rstrip('/')}/"
+    cleanup, created = StorageCleanup.objects.get_or_create(prefix=prefix)
+    if not created and cleanup.status in ('done', 'failed'):
+        StorageCleanup.objects.filter(pk=cleanup.pk).update(
+            status='pending', attempts=0, error='', updated_at=timezone.now()
+        )
+    return cleanup
+
+
+def claim_next_cleanup():
+    """
+    Marks the next pending (or abandoned) cleanup as running and returns it, or None.
+    Shorter prefixes go first so a deleted user's folder is handled before the
+    adventures and stories inside it.
+    """
+    now = timezone.now()
+    candidates = StorageCleanup.objects.filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=now - REAPER_STALE_AFTER),
+        attempts__lt=REAPER_MAX_ATTEMPTS
+    ).order_by(Length('prefix'), 'id')
+
+    for cleanup in candidates[:10]:
+        # Conditional update, so two workers never claim the same cleanup
+        claimed = StorageCleanup.objects.filter(
+            pk=cleanup.pk,
+            status=cleanup.status,
+            updated_at=cleanup.updated_at
+        ).update(status='running', attempts=F('attempts') + 1, updated_at=now)
+        if claimed:
+            cleanup.refresh_from_db()
+            return cleanup
+    return None
+
+
+def delete_page(executor, backend, cleanup, page):
+    """Deletes one listed page in parallel batches and records the progress."""
+    blob_names = [obj.name for obj in page]
+    batches = [blob_names[i:i + GCS_BATCH_SIZE] for i in range(0, len(blob_names), GCS_BATCH_SIZE)]
+    deleted = sum(executor.map(backend.delete_many, batches))
+    reclaimed = sum(obj.size or 0 for obj in page)
+
+    StorageCleanup.objects.filter(pk=cleanup.pk).update(
+        objects_deleted=F('objects_deleted') + deleted,
+        bytes_reclaimed=F('bytes_reclaimed') + reclaimed,
+        updated_at=timezone.now()
+    )
+    return deleted, reclaimed
+
+
+def reap_prefix(cleanup, backend=None, page_size=REAPER_PAGE_SIZE, max_workers=REAPER_WORKERS):
+    """
+    Deletes everything under a claimed cleanup's prefix.
+
+    Deleted objects drop out of the listing, so a run that is interrupted resumes
+    from whatever is left when the cleanup is claimed again.
+
+    Returns:
+        tuple: (objects deleted, bytes reclaimed) by this run
+    """
+    backend = backend or get_media_backend()
+
+    # Cleanups queued for folders inside this prefix are covered by this one
+    StorageCleanup.objects.filter(
+        status='pending',
+        prefix__startswith=cleanup.prefix
+    ).exclude(pk=cleanup.pk).update(status='done', updated_at=timezone.now())
+
+    deleted = 0
+    reclaimed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        page = []
+        for obj in backend.list(cleanup.prefix, page_size=page_size):
+            page.append(obj)
+            if len(page) >= page_size:
+                page_deleted, page_reclaimed = delete_page(executor, backend, cleanup, page)
+                deleted += page_deleted
+                reclaimed += page_reclaimed
+                page = []
+        if page:
+            page_deleted, page_reclaimed = delete_page(executor, backend, cleanup, page)
+            deleted += page_deleted
+            reclaimed += page_reclaimed
+
+    StorageCleanup.objects.filter(pk=cleanup.pk).update(status='done', error='', updated_at=timezone.now())
+    logger.info(f"Storage cleanup of {cleanup.prefix} deleted {deleted} objects, reclaimed {reclaimed} bytes")
+    return deleted, reclaimed
+
+
+def reap_pending_storage(page_size=REAPER_PAGE_SIZE, max_workers=REAPER_WORKERS):
+    """
+    Works through queued cleanups until none are left.
+
+    Returns:
+        tuple: (prefixes cleaned, objects deleted, bytes reclaimed)
+    """
+    backend = get_media_backend()
+    cleaned = 0
+    deleted = 0
+    reclaimed = 0
+    while True:
+        cleanup = claim_next_cleanup()
+        if cleanup is None:
+            break
+        try:
+            prefix_deleted, prefix_reclaimed = reap_prefix(cleanup, backend, page_size, max_workers)
+            cleaned += 1
+            deleted += prefix_deleted
+            reclaimed += prefix_reclaimed
+        except Exception as e:
+            logger.error(f"Storage cleanup of {cleanup.prefix} failed: {str(e)}", exc_info=True)
+            StorageCleanup.objects.filter(pk=cleanup.pk).update(
+                status='failed' if cleanup.attempts >= REAPER_MAX_ATTEMPTS else 'pending',
+                error=str(e),
+                updated_at=timezone.now()
+            )
+    return cleaned, deleted, reclaimed
+
+
+def find_orphaned_prefixes():
+    """
+    Yields users/<id>/ folders whose user no longer exists, e.g. users deleted before the reaper ran,
+    and the adventure folders of legacy '<username>/' folders whose user is gone.
+    """
+    User = get_user_model()
+    backend = get_media_backend()
+    page = {}
+
+    def missing(page):
+        existing = set(User.objects.filter(id__in=list(page)).values_list('id', flat=True))
+        return [prefix for user_id, prefix in page.items() if user_id not in existing]
+
+    for prefix in backend.list_prefixes(f"{STORY_MEDIA_PREFIX}/"):
+        user_id = prefix.rstrip('/').rsplit('/', 1)[-1]
+        if not user_id.isdigit():
+            continue
+        page[int(user_id)] = prefix
+        if len(page) >= REAPER_PAGE_SIZE:
+            yield from missing(page)
+            page = {}
+    if page:
+        yield from missing(page)
+
+    yield from find_orphaned_legacy_prefixes(backend)
+
+
+def find_orphaned_legacy_prefixes(backend=None):
+    """
+    Yields '<username>/adventure_<id>/' folders whose username no longer exists.
+    Only adventure folders are returned, so other top-level folders of the bucket are never queued.
+    """
+    User = get_user_model()
+    backend = backend or get_media_backend()
+    page = {}
+
+    def missing(page):
+        existing = set(User.objects.filter(username__in=list(page)).values_list('username', flat=True))
+        for user_name, prefix in page.items():
+            if user_name in existing:
+                continue
+            for adventure_prefix in backend.list_prefixes(prefix):
+                if adventure_prefix[len(prefix):].startswith('adventure_'):
+                    yield adventure_prefix
+
+    for prefix in backend.list_prefixes(''):
+        user_name = prefix.rstrip('/')
+        if user_name in (STORY_MEDIA_PREFIX, ARTIFACT_PREFIX):
+            continue
+        page[user_name] = prefix
+        if len(page) >= REAPER_PAGE_SIZE:
+            yield from missing(page)
+            page = {}
+    if page:
+        yield from missing(page)
+
+
+def storage_reaper_job():
+    """Thread target; keeps reaping while deletes keep queueing cleanups."""
+    global _reaper_thread
+    try:
+        while True:
+            with _reaper_lock:
+                if not _reaper_wakeup.is_set():
+                    _reaper_thread = None
+                    return
+                _reaper_wakeup.clear()
+            reap_pending_storage()
+    except Exception as e:
+        logger.error(f"Error in storage reaper: {str(e)}", exc_info=True)
+        with _reaper_lock:
+            _reaper_thread = None
+    finally:
+        connection.close()
+
+
+def start_storage_reaper():
+    """Starts the background reaper, or wakes the running one, after cleanups are queued."""
+    global _reaper_thread
+    with _reaper_lock:
+        _reaper_wakeup.set()
+        if _reaper_thread is None:
+            _reaper_thread = threading.Thread(target=storage_reaper_job)
+            _reaper_thread.daemon = True
+            _reaper_thread.start()
@@ -0,0 +1,93 @@
+import logging
+
+from django.utils import timezone
+
+from .models import Chapter
+
+logger = logging.getLogger(__name__)
+
+
+def save_chapter(story, part_number, chapter_number, full_text, summary='', image_prompt=''):
+    """
+    Inserts or overwrites one chapter in a single statement.
+    Nothing is read first and no other chapter of the story is touched.
+    """
+    Chapter.objects.bulk_create(
+        [Chapter(
+            story=story,
+            part_number=part_number,
+            chapter_number=chapter_number,
+            full_text=full_text,
+            summary=summary,
+            image_prompt=image_prompt
+        )],
+        update_conflicts=True,
+        unique_fields=['story', 'part_number', 'chapter_number'],
+        update_fields=['full_text', 'summary', 'image_prompt', 'updated_at']
+    )
+
+
+def get_raw_content(story):
+    """
+    Returns the story text in the raw_content layout the readers use:
+    {'Part 1': {'Chapter 1': {'full_text': str, 'summary': str}}}, in reading order.
+    Uses prefetch_related('chapters') when the caller did it.
+    """
+    raw_content = {}
+    for chapter in story.chapters.all():
+        raw_content.setdefault(chapter.part_key, {})[chapter.chapter_key] = {
+            'full_text': chapter.full_text,
+            'summary': chapter.summary
+        }
+    return raw_content
+
+
+def get_full_text(story):
+    """All chapter texts joined with blank lines, in reading order."""
+    return "\n\n".join(chapter.full_text for chapter in story.chapters.all())
+
+
+def get_chapter_texts(story):
+    """
+    The text of each chapter for the story editor, in reading order:
+    [{'part': 'Part 1', 'chapter': 'Chapter 1', 'text': str}, ...]
+    """
+    return [
+        {'part': chapter.part_key, 'chapter': chapter.chapter_key, 'text': chapter.full_text}
+        for chapter in story.chapters.all()
+    ]
+
+
+def update_chapter_texts(story, chapter_texts):
+    """
+    Writes edited text back to the chapters it was edited in.
+
+    Each entry names its chapter, as returned by get_chapter_texts(), so adding or removing
+    paragraphs never moves text into another chapter. Chapters not listed and summaries
+    are left untouched.
+
+    Args:
+        chapter_texts (list): [{'part': 'Part 1', 'chapter': 'Chapter 1', 'text': str}, ...]
+
+    Returns:
+        int: Number of chapters updated
+
+    Raises:
+        ValueError: If an entry names a chapter the story doesn't have
+    """
+    chapters = {(chapter.part_key, chapter.chapter_key): chapter for chapter in story.chapters.all()}
+    now = timezone.now()
+    updated = []
+    for entry in chapter_texts:
+        if not isinstance(entry, dict):
+            raise ValueError(f"Invalid chapter entry: {entry!r}")
+        chapter = chapters.get((entry.get('part'), entry.get('chapter')))
+        if chapter is None:
+            raise ValueError(f"Story {story.id} has no {entry.get('part')} {entry.get('chapter')}")
+        chapter.full_text = str(entry.get('text', '')).strip()
+        chapter.updated_at = now
+        updated.append(chapter)
+
+    Chapter.objects.bulk_update(updated, ['full_text', 'updated_at'])
+    logger.debug(f"Updated text of {len(updated)} chapters for story {story.id}")
+    return len(updated)
@@ -0,0 +1,225 @@
+import logging
+
+from django.conf import settings
+
+from .media import get_media_backend, StoredObject
+
+logger = logging.getLogger(__name__)
+
+
+# --- Configuration ---
+
+# Story folders are keyed by ids only, so a path never changes after upload and can be
+# built from the ids a job already carries. Kept apart from the legacy '<username>/' folders.
+STORY_MEDIA_PREFIX = 'users'
+
+# Until `manage.py migrate_media_paths` has copied every user's '<username>/' folder,
+# stores that know the username also look up audio, covers and PDFs there.
+# Deploy order: ship this code, run the migration, then set
+# STORY_MEDIA_LEGACY_FALLBACK = False to drop the extra listings.
+DEFAULT_LEGACY_FALLBACK = True
+
+
+def legacy_fallback_enabled():
+    return getattr(settings, 'STORY_MEDIA_LEGACY_FALLBACK', DEFAULT_LEGACY_FALLBACK)
+
+
+def get_user_prefix(user_id):
+    return f"{STORY_MEDIA_PREFIX}/{user_id}"
+
+
+def get_adventure_prefix(user_id, adventure_id):
+    return f"{get_user_prefix(user_id)}/adventure_{adventure_id}"
+
+
+def get_story_prefix(user_id, adventure_id, story_id):
+    """'users/<user id>/adventure_<id>/story_<id>', the folder every artifact of a story lives in."""
+    return f"{get_adventure_prefix(user_id, adventure_id)}/story_{story_id}"
+
+
+def get_legacy_user_prefix(user_name):
+    """Folder that held a user's stories when paths were keyed by username."""
+    return f"{user_name}/adventure_"
+
+
+def get_legacy_adventure_prefix(user_name, adventure_id):
+    return f"{get_legacy_user_prefix(user_name)}{adventure_id}"
+
+
+def get_legacy_story_prefix(user_name, adventure_id, story_id):
+    """'<username>/adventure_<id>/story_<id>', where a story lived before migrate_media_paths."""
+    return f"{get_legacy_adventure_prefix(user_name, adventure_id)}/story_{story_id}"
+
+
+def get_image_base_name(part_key=None, chapter_key=None):
+    """Returns 'PartX_ChapterY' for chapter images and 'cover' for the cover."""
+    if part_key and chapter_key:
+        part_num = str(part_key).split()[-1]  # Gets the number from "Part X"
+        chapter_num = str(chapter_key).split()[-1]  # Gets the number from "Chapter X"
+        return f"Part{part_num}_Chapter{chapter_num}"
+    return "cover"
+
+
+class StoryArtifactStore:
+    """
+    Every stored artifact of one story: images, their variants, audio and PDFs.
+
+    Keys are built by the *_key methods rather than by formatting paths at call sites.
+    list() fetches the whole story prefix in one call and caches it, so existence checks,
+    generations and metadata for any number of artifacts cost a single listing.
+
+    Readers that pass legacy_prefix can find artifacts that were not migrated yet
+    through resolve(); writes always go to the id-keyed prefix.
+    """
+
+    def __init__(self, story_prefix, backend=None, legacy_prefix=None):
+        self.prefix = story_prefix
+        self.backend = backend or get_media_backend()
+        self.legacy_prefix = legacy_prefix
+        self._listing = None
+        self._legacy_listing = None
+
+    @classmethod
+    def for_ids(cls, user_id, adventure_id, story_id, backend=None, user_name=None):
+        """
+        Builds the store from ids alone; no database access.
+        Pass user_name where the store is read from, to fall back to the legacy folder.
+        """
+        legacy_prefix = None
+        if user_name and legacy_fallback_enabled():
+            legacy_prefix = get_legacy_story_prefix(user_name, adventure_id, story_id)
+        return cls(get_story_prefix(user_id, adventure_id, story_id), backend, legacy_prefix)
+
+    @classmethod
+    def for_story(cls, story, backend=None):
+        """Needs story.adventure; use for_ids() where the ids are already at hand."""
+        return cls.for_ids(story.adventure.user_id, story.adventure_id, story.id, backend)
+
+    # --- Keys ---
+
+    def image_key(self, part_key=None, chapter_key=None):
+        """Chapter image for ('Part X', 'Chapter Y'), or the cover when no keys are given."""
+        return f"{self.prefix}/{get_image_base_name(part_key, chapter_key)}.jpg"
+
+    def cover_key(self):
+        return self.image_key()
+
+    def variant_key(self, base_name, suffix, extension):
+        """Responsive copy, e.g. ('cover', '_thumb', 'jpg') -> variants/cover_thumb.jpg"""
+        return f"{self.prefix}/variants/{base_name}{suffix}.{extension}"
+
+    def print_key(self, image_key):
+        """Print-resolution copy of an image used in the PDF."""
+        filename = image_key.rsplit('/', 1)[-1]
+        return f"{self.prefix}/print/{filename}"
+
+    def audio_key(self):
+        return f"{self.prefix}/audio.mp3"
+
+    def pdf_key(self, content_hash):
+        return f"{self.prefix}/final-{content_hash[:16]}.pdf"
+
+    def legacy_pdf_key(self):
+        """PDF name used before renders were keyed by content hash."""
+        return f"{self.prefix}/final.pdf"
+
+    # --- Batch Operations ---
+
+    def list(self, refresh=False):
+        """Returns {key: StoredObject} for everything under the story prefix."""
+        if self._listing is None or refresh:
+            self._listing = {obj.name: obj for obj in self.backend.list(f"{self.prefix}/")}
+        return self._listing
+
+    def set_listing(self, objects):
+        """Uses StoredObjects listed elsewhere, e.g. one listing of a user's folder split per story."""
+        self._listing = {obj.name: obj for obj in objects}
+
+    def exists_many(self, keys):
+        listing = self.list()
+        return {key: key in listing for key in keys}
+
+    def exists(self, key):
+        return key in self.list()
+
+    def get(self, key):
+        """Listing entry (size, generation, metadata) for a key, or None."""
+        if self.legacy_prefix and key.startswith(f"{self.legacy_prefix}/"):
+            return self.list_legacy().get(key)
+        return self.list().get(key)
+
+    # --- Legacy Fallback ---
+
+    def list_legacy(self):
+        """Returns {key: StoredObject} for the story's legacy folder, empty without a legacy_prefix."""
+        if self._legacy_listing is None:
+            self._legacy_listing = {}
+            if self.legacy_prefix:
+                self._legacy_listing = {obj.name: obj for obj in self.backend.list(f"{self.legacy_prefix}/")}
+        return self._legacy_listing
+
+    def set_legacy_listing(self, objects):
+        """Like set_listing(), for the legacy folder."""
+        self._legacy_listing = {obj.name: obj for obj in objects}
+
+    def legacy_key(self, key):
+        """Where key lived under the legacy username folder."""
+        return f"{self.legacy_prefix}{key[len(self.prefix):]}"
+
+    def unlisted_key(self, key):
+        """
+        Where to serve an artifact recorded nowhere in the database (a cover from before
+        image variants) without listing storage: its legacy copy while the fallback is on,
+        since such artifacts were only ever written there, otherwise the migrated key.
+        Neither copy is overwritten later, so the URL needs no generation.
+        """
+        return self.legacy_key(key) if self.legacy_prefix else key
+
+    def resolve(self, key):
+        """
+        Listing entry for key, or for its legacy copy when it has not been migrated yet.
+        The entry's name is the key to serve or download; None if neither exists.
+        """
+        obj = self.get(key)
+        if obj is None and self.legacy_prefix:
+            obj = self.list_legacy().get(self.legacy_key(key))
+        return obj
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return 0
+        deleted = self.backend.delete_many(keys)
+        if self._listing is not None:
+            for key in keys:
+                self._listing.pop(key, None)
+        return deleted
+
+    def delete_all(self):
+        """
+        Deletes every artifact of the story.
+
+        Returns:
+            tuple: (objects deleted, bytes reclaimed)
+        """
+        listing = self.list(refresh=True)
+        reclaimed = sum(obj.size or 0 for obj in listing.values())
+        deleted = self.delete_many(listing.keys())
+        logger.info(f"Deleted {deleted} objects ({reclaimed} bytes) under {self.prefix}/")
+        return deleted, reclaimed
+
+    # --- Single Objects ---
+
+    def upload(self, key, data, content_type, metadata=None):
+        """Uploads one artifact and returns its generation."""
+        generation = self.backend.upload(key, data, content_type, metadata)
+        if self._listing is not None:
+            self._listing[key] = StoredObject(key, len(data), generation, metadata)
+        return generation
+
+    def download(self, key):
+        """Returns the artifact's bytes, or None if it doesn't exist."""
+        return self.backend.download(key)
+
+    def url(self, key, generation=None):
+        return self.backend.url(key, generation)
@@ -0,0 +1,96 @@
+import logging
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Story
+from .jobs import enqueue_story_generation
+from .tier_utils import TIER_UNLIMITED, settle_story_quotas
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# A processing story with no heartbeat for this long has lost its job (e.g. the instance restarted).
+# The process that queued a story beats for it every STORY_HEARTBEAT_INTERVAL while it is
+# queued or running, so only stories whose process is gone go quiet this long.
+STORY_STALE_AFTER = timedelta(minutes=15)
+# Runs a story gets, the first one included, before the sweeper gives up on it
+STORY_MAX_ATTEMPTS = 3
+STORY_ABANDONED_ERROR = 'Story generation stopped responding and was not completed. Please try again.'
+
+
+def is_resumable(attempts, reservation_status, tier, max_attempts=STORY_MAX_ATTEMPTS):
+    """
+    A stale story is resumed only while it has attempts left and its generation is still
+    paid for by an open quota reservation (unlimited-tier stories don't take one).
+    Anything else, e.g. a story stuck since before reservations existed, is failed.
+    """
+    if attempts + 1 >= max_attempts:
+        return False
+    return reservation_status == 'reserved' or tier == TIER_UNLIMITED
+
+
+def get_stale_stories(stale_after=STORY_STALE_AFTER):
+    """Processing stories whose job has not reported progress within stale_after."""
+    cutoff = timezone.now() - stale_after
+    return Story.objects.filter(status='processing').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, updated_at__lt=cutoff)
+    )
+
+
+def sweep_stuck_stories(stale_after=STORY_STALE_AFTER, max_attempts=STORY_MAX_ATTEMPTS, dry_run=False):
+    """
+    Resumes stale processing stories from their saved chapters, or marks them failed
+    once they have used max_attempts or hold no open quota reservation, so no story
+    stays 'processing' forever.
+
+    Each story is claimed with a conditional update that also bumps its generation_run,
+    so two sweepers never resume the same story twice. Should the original job still be
+    alive after all (e.g. waiting for a worker in a process that stopped beating), it finds
+    its run superseded when it starts and exits.
+
+    Returns:
+        tuple: (stories resumed, stories failed)
+    """
+    stale_rows = get_stale_stories(stale_after).values_list(
+        'id', 'adventure__user_id', 'generation_attempts', 'generation_run',
+        'quota_reservation__status', 'adventure__user__profile__tier'
+    )
+    if dry_run:
+        rows = list(stale_rows)
+        resumable = sum(
+            1 for _, _, attempts, _, reservation_status, tier in rows
+            if is_resumable(attempts, reservation_status, tier, max_attempts)
+        )
+        return resumable, len(rows) - resumable
+
+    resumed = 0
+    failed_ids = []
+    for story_id, user_id, attempts, run, reservation_status, tier in stale_rows:
+        if is_resumable(attempts, reservation_status, tier, max_attempts):
+            claimed = get_stale_stories(stale_after).filter(pk=story_id, generation_run=run).update(
+                heartbeat_at=timezone.now(),
+                generation_attempts=F('generation_attempts') + 1,
+                generation_run=run + 1
+            )
+            if claimed:
+                # The quota reservation is still open, so the story keeps its slot
+                enqueue_story_generation(story_id, user_id, run + 1)
+                resumed += 1
+        else:
+            claimed = get_stale_stories(stale_after).filter(pk=story_id, generation_run=run).update(
+                status='failed',
+                generation_run=run + 1,
+                error=STORY_ABANDONED_ERROR,
+                updated_at=timezone.now()
+            )
+            if claimed:
+                failed_ids.append(story_id)
+
+    if failed_ids:
+        settle_story_quotas(failed_ids, 'released')
+    if resumed or failed_ids:
+        logger.info(f"Story sweeper resumed {resumed} and failed {len(failed_ids)} stuck stories")
+    return resumed, len(failed_ids)
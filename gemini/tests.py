@@ -1,6 +1,20 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
-from gemini.models import Adventure, Story
+from django.contrib.auth import get_user_model
+from gemini.models import Adventure, Story, QuotaReservation, StorageCleanup, Artifact
+from gemini.artifacts import add_artifact_reference, collect_unreferenced_artifacts
+from gemini.media import LocalMediaBackend, get_media_backend
+from gemini.story_content import get_chapter_texts, get_raw_content, save_chapter, update_chapter_texts
+from gemini.storage_reaper import (
+    claim_next_cleanup, find_orphaned_legacy_prefixes, reap_prefix, schedule_storage_cleanup
+)
+from gemini.tier_utils import FREE_TIER_LIMIT, get_usage_counter, reserve_story_quota
+from gemini.sweeper import STORY_STALE_AFTER, sweep_stuck_stories
+from user_profile.models import UserProfile, UsageCounter
 from django.utils import timezone
 import json
 
@@ -97,3 +111,162 @@ def create_test_data():
 # python manage.py shell
 # from gemini.models import create_test_data
 # adventure, story = create_test_data()
+
+
+def create_user_story(username='reader', status='processing'):
+    """
+    A user with a free-tier profile, one adventure and one story. The usage period is
+    opened first, so the story isn't seeded into it as already created.
+    """
+    user = get_user_model().objects.create(username=username)
+    profile = UserProfile.objects.create(user=user, tier='free')
+    get_usage_counter(profile)
+    adventure = Adventure.objects.create(user=user, adventure_number=1)
+    story = Story.objects.create(adventure=adventure, prompt='A story', status=status)
+    return profile, adventure, story
+
+
+class QuotaReservationTests(TestCase):
+    def setUp(self):
+        self.profile, self.adventure, self.story = create_user_story()
+
+    def reserve(self, story):
+        allowed, counter = reserve_story_quota(self.profile)
+        if allowed:
+            QuotaReservation.objects.create(story=story, counter=counter)
+        return allowed
+
+    def test_reservations_stop_at_the_tier_limit(self):
+        results = [reserve_story_quota(self.profile)[0] for _ in range(FREE_TIER_LIMIT + 1)]
+        self.assertEqual(results.count(True), FREE_TIER_LIMIT)
+        self.assertFalse(results[-1])
+
+    def test_deleting_a_generating_story_releases_its_slot(self):
+        self.assertTrue(self.reserve(self.story))
+        self.story.delete()
+        counter = UsageCounter.objects.get(user=self.profile.user)
+        self.assertEqual(counter.stories_reserved, 0)
+        self.assertEqual(counter.stories_created, 0)
+
+    def test_deleting_an_adventure_releases_its_stories_slots(self):
+        self.assertTrue(self.reserve(self.story))
+        self.adventure.delete()
+        self.assertEqual(UsageCounter.objects.get(user=self.profile.user).stories_reserved, 0)
+
+
+class StorySweeperTests(TestCase):
+    def test_stuck_story_without_a_reservation_is_failed_not_resumed(self):
+        profile, adventure, story = create_user_story()
+        Story.objects.filter(pk=story.pk).update(heartbeat_at=timezone.now() - STORY_STALE_AFTER * 2)
+
+        self.assertEqual(sweep_stuck_stories(), (0, 1))
+        story.refresh_from_db()
+        self.assertEqual(story.status, 'failed')
+
+
+class StorageCleanupTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.backend = LocalMediaBackend(root, 'http://media.test')
+
+    def queued_prefixes(self):
+        return set(StorageCleanup.objects.values_list('prefix', flat=True))
+
+    def test_deleting_a_story_queues_its_legacy_folder_too(self):
+        profile, adventure, story = create_user_story()
+        story_id = story.id
+        story.delete()
+        self.assertEqual(self.queued_prefixes(), {
+            f"users/{profile.user_id}/adventure_{adventure.id}/story_{story_id}/",
+            f"reader/adventure_{adventure.id}/story_{story_id}/",
+        })
+
+    def test_deleting_a_user_queues_their_legacy_adventure_folders(self):
+        profile, adventure, story = create_user_story()
+        profile.user.delete()
+        self.assertIn(f"users/{profile.user_id}/", self.queued_prefixes())
+        self.assertIn(f"reader/adventure_{adventure.id}/", self.queued_prefixes())
+
+    def test_a_claimed_cleanup_is_not_claimed_again_until_it_goes_stale(self):
+        schedule_storage_cleanup('users/1/adventure_1')
+        cleanup = claim_next_cleanup()
+        self.assertEqual(cleanup.prefix, 'users/1/adventure_1/')
+        self.assertIsNone(claim_next_cleanup())
+
+        StorageCleanup.objects.filter(pk=cleanup.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim_next_cleanup().pk, cleanup.pk)
+
+    def test_reaping_deletes_only_the_prefix_page_by_page(self):
+        for name in ['a.jpg', 'b.jpg', 'story_1/c.jpg']:
+            self.backend.upload(f"users/1/adventure_1/{name}", b'data', 'image/jpeg')
+        self.backend.upload('users/1/adventure_10/d.jpg', b'data', 'image/jpeg')
+        schedule_storage_cleanup('users/1/adventure_1')
+
+        deleted, reclaimed = reap_prefix(claim_next_cleanup(), self.backend, page_size=2)
+        self.assertEqual((deleted, reclaimed), (3, 12))
+        self.assertEqual([obj.name for obj in self.backend.list('users/')], ['users/1/adventure_10/d.jpg'])
+        self.assertEqual(StorageCleanup.objects.get().status, 'done')
+
+    def test_orphaned_legacy_folders_are_found_by_username(self):
+        get_user_model().objects.create(username='reader')
+        for name in ['gone/adventure_1/story_1/cover.jpg', 'reader/adventure_2/story_2/cover.jpg',
+                     'gone/notes/readme.txt', 'cas/image/ab/ab.jpg', 'users/5/adventure_3/story_3/cover.jpg']:
+            self.backend.upload(name, b'data', 'image/jpeg')
+        self.assertEqual(list(find_orphaned_legacy_prefixes(self.backend)), ['gone/adventure_1/'])
+
+
+class ChapterContentTests(TestCase):
+    def setUp(self):
+        profile, adventure, self.story = create_user_story(status='completed')
+        save_chapter(self.story, 1, 1, 'A1\n\nA2', summary='First')
+        save_chapter(self.story, 1, 2, 'B1')
+
+    def test_saving_a_chapter_again_overwrites_only_that_chapter(self):
+        save_chapter(self.story, 1, 1, 'A1 rewritten', summary='First again')
+        self.assertEqual(get_raw_content(self.story), {'Part 1': {
+            'Chapter 1': {'full_text': 'A1 rewritten', 'summary': 'First again'},
+            'Chapter 2': {'full_text': 'B1', 'summary': ''},
+        }})
+
+    def test_added_paragraphs_stay_in_their_chapter(self):
+        chapters = get_chapter_texts(self.story)
+        chapters[0]['text'] = 'A1\n\nNew paragraph\n\nA2'
+        self.assertEqual(update_chapter_texts(self.story, chapters), 2)
+
+        texts = [chapter['text'] for chapter in get_chapter_texts(Story.objects.get(pk=self.story.pk))]
+        self.assertEqual(texts, ['A1\n\nNew paragraph\n\nA2', 'B1'])
+
+    def test_unknown_chapters_are_rejected_without_writing(self):
+        with self.assertRaises(ValueError):
+            update_chapter_texts(self.story, [
+                {'part': 'Part 1', 'chapter': 'Chapter 1', 'text': 'changed'},
+                {'part': 'Part 2', 'chapter': 'Chapter 1', 'text': 'nowhere'},
+            ])
+        self.assertEqual(get_chapter_texts(self.story)[0]['text'], 'A1\n\nA2')
+
+
+class ArtifactGCTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(STORY_MEDIA_BACKEND='local', MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_media_backend.cache_clear()
+        self.addCleanup(get_media_backend.cache_clear)
+
+        profile, adventure, self.story = create_user_story(status='completed')
+        self.artifact = Artifact.objects.create(
+            content_key='a' * 64, kind='image', blob_name='cas/image/aa/a.jpg', content_type='image/jpeg', size=4
+        )
+        Artifact.objects.filter(pk=self.artifact.pk).update(created_at=timezone.now() - timedelta(days=1))
+
+    def test_referenced_artifacts_are_kept(self):
+        self.assertTrue(add_artifact_reference(self.artifact, self.story, 'cover'))
+        self.assertEqual(collect_unreferenced_artifacts(), (0, 0))
+
+    def test_a_collected_artifact_is_not_referenced(self):
+        self.assertEqual(collect_unreferenced_artifacts(), (1, 4))
+        self.assertFalse(add_artifact_reference(self.artifact, self.story, 'cover'))
+        self.assertFalse(self.story.artifact_references.exists())
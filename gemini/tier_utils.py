@@ -1,15 +1,16 @@
 import logging
 from datetime import timedelta
+from collections import Counter
 from django.utils import timezone
-from django.http import HttpResponseForbidden, JsonResponse # Or another response for restriction
-from functools import wraps
+from django.db import IntegrityError, transaction
+from django.db.models import F
 
 # Assuming your models are in 'your_app.models'
 # Adjust the import path as necessary
 # It's often better to pass QuerySets/objects rather than importing models
 # directly into utils, but this works for demonstration.
-from user_profile.models import UserProfile 
-from gemini.models import Story, Adventure
+from user_profile.models import UserProfile, UsageCounter
+from gemini.models import Story, QuotaReservation
 
 logger = logging.getLogger(__name__)
 
@@ -26,198 +27,163 @@ FAMILY_TIER_LIMIT = 21  # per week
 WEEK_DAYS = 7
 MONTH_DAYS = 30  # Using 30 days as a standard month
 
-# --- Tier-Specific Check Functions ---
+TIER_LIMITS = {
+    TIER_FREE: FREE_TIER_LIMIT,
+    TIER_DAILY: DAILY_TIER_LIMIT,
+    TIER_FAMILY: FAMILY_TIER_LIMIT,
+}
 
-def check_free_tier_limit(user_profile: UserProfile, story_instance=None) -> bool:
+# --- Usage Counters ---
+
+def get_usage_period(user_profile: UserProfile, now=None):
     """
-    Checks if a 'free' tier user is within their monthly story limit.
-    Month is calculated from user creation date.
-    Updates story status to 'failed' if limit is reached.
+    Returns (start, end) of the period the user's limit applies to, or None for unlimited tiers.
+    Free: the current 30-day window counted from the user's creation date.
+    Daily and family: today, in the site's time zone.
     """
-    try:
-        now = timezone.now()
+    now = now or timezone.now()
+    if user_profile.tier == TIER_FREE:
         user_created_at = user_profile.created_at
-
         if timezone.is_naive(user_created_at):
             user_created_at = timezone.make_aware(user_created_at, timezone.get_default_timezone())
-
-        # Calculate months since creation
-        delta_days = (now - user_created_at).days
-        months_passed = delta_days // MONTH_DAYS
-
-        # Calculate current month window
-        current_month_start = user_created_at + timedelta(days=months_passed * MONTH_DAYS)
-        current_month_end = current_month_start + timedelta(days=MONTH_DAYS)
-
-        # Count stories in current month
-        stories_this_month = Story.objects.filter(
-            adventure__user=user_profile.user,
-            created_at__gte=current_month_start,
-            created_at__lt=current_month_end
-        ).count()
-
-        is_allowed = stories_this_month < FREE_TIER_LIMIT
-        if not is_allowed:
-            logger.info(f"Free tier user {user_profile.user.username} reached monthly limit ({stories_this_month}/{FREE_TIER_LIMIT}).")
-            if story_instance:
-                story_instance.status = 'failed'
-                story_instance.save(update_fields=['status'])
-                logger.info(f"Updated story {story_instance.id} status to failed due to free tier limit.")
-        return is_allowed
-
-    except Exception as e:
-        logger.error(f"Error checking free tier limit for user {user_profile.user.username}: {e}", exc_info=True)
-        if story_instance:
-            story_instance.status = 'failed'
-            story_instance.save(update_fields=['status'])
-        return False
-
-def check_subscription_tier_limit(user_profile: UserProfile, limit: int, story_instance=None) -> bool:
+        months_passed = (now - user_created_at).days // MONTH_DAYS
+        period_start = user_created_at + timedelta(days=months_passed * MONTH_DAYS)
+        return period_start, period_start + timedelta(days=MONTH_DAYS)
+    if user_profile.tier in (TIER_DAILY, TIER_FAMILY):
+        period_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return period_start, period_start + timedelta(days=1)
+    return None
+
+def get_usage_counter(user_profile: UserProfile, now=None):
     """
-    Checks if a subscription tier user is within their daily story limit.
-    Updates story status to 'failed' if limit is reached.
+    Returns (counter, created) for the user's current period, or (None, False) for unlimited tiers.
+    A new period's counter is seeded once from the stories already created in it;
+    stories whose reservation is still open or was released are left out.
     """
+    period = get_usage_period(user_profile, now)
+    if period is None:
+        return None, False
+    period_start, period_end = period
+
+    counter = UsageCounter.objects.filter(user_id=user_profile.user_id, period_start=period_start).first()
+    if counter:
+        return counter, False
+
+    seeded = Story.objects.filter(
+        adventure__user_id=user_profile.user_id,
+        created_at__gte=period_start,
+        created_at__lt=period_end
+    ).exclude(
+        quota_reservation__status__in=['reserved', 'released']
+    ).count()
     try:
-        today = timezone.now().date()
-        
-        # Count stories created today
-        stories_today = Story.objects.filter(
-            adventure__user=user_profile.user,
-            created_at__date=today
-        ).count()
-
-        is_allowed = stories_today < limit
-        if not is_allowed:
-            logger.info(f"Subscription tier user {user_profile.user.username} reached daily limit ({stories_today}/{limit}).")
-            if story_instance:
-                story_instance.status = 'failed'
-                story_instance.save(update_fields=['status'])
-                logger.info(f"Updated story {story_instance.id} status to failed due to subscription tier limit.")
-        return is_allowed
-
-    except Exception as e:
-        logger.error(f"Error checking subscription tier limit for user {user_profile.user.username}: {e}", exc_info=True)
-        if story_instance:
-            story_instance.status = 'failed'
-            story_instance.save(update_fields=['status'])
-        return False
-
-# --- Main Check Function ---
-
-def can_user_access_feature(user_profile: UserProfile) -> bool:
-    """
-    Determines if the user can access the restricted feature based on their tier and usage.
+        with transaction.atomic():
+            counter = UsageCounter.objects.create(
+                user_id=user_profile.user_id,
+                period_start=period_start,
+                period_end=period_end,
+                stories_created=seeded
+            )
+        return counter, True
+    except IntegrityError:
+        # Another request created the counter first
+        return UsageCounter.objects.get(user_id=user_profile.user_id, period_start=period_start), False
+
+def get_used_slots(counter) -> int:
+    """Stories counted against the limit: created plus still generating."""
+    return counter.stories_created + counter.stories_reserved
+
+# --- Quota Reservations ---
+
+def reserve_story_quota(user_profile: UserProfile):
     """
-    if not user_profile:
-        logger.warning("Attempted access check without a user profile.")
-        return False
-
-    tier = user_profile.tier
+    Takes one story slot from the user's current period, before any model call is made.
+    The slot is taken with a conditional UPDATE, so two concurrent submissions
+    can't both get the last one.
 
-    if tier == TIER_UNLIMITED:
-        logger.debug(f"User {user_profile.user.username} has unrestricted access (Unlimited tier).")
-        return True
-    elif tier == TIER_FREE:
-        return check_free_tier_limit(user_profile)
-    elif tier == TIER_DAILY:
-        return check_subscription_tier_limit(user_profile, DAILY_TIER_LIMIT)
-    elif tier == TIER_FAMILY:
-        return check_subscription_tier_limit(user_profile, FAMILY_TIER_LIMIT)
-    else:
-        logger.warning(f"User {user_profile.user.username} has unknown tier '{tier}'. Denying access.")
-        return False
-
-
-# --- Decorator for Views (Optional but recommended) ---
-
-def check_access(view_func):
+    Returns:
+        tuple: (allowed, counter); counter is None for the unlimited tier
     """
-    Decorator for regular Django views that need access checking.
+    if user_profile.tier == TIER_UNLIMITED:
+        return True, None
+    limit = TIER_LIMITS.get(user_profile.tier)
+    if limit is None:
+        logger.warning(f"User {user_profile.user_id} has unknown tier '{user_profile.tier}'. Denying access.")
+        return False, None
+
+    counter, created = get_usage_counter(user_profile)
+    reserved = UsageCounter.objects.filter(
+        pk=counter.pk,
+        stories_reserved__lt=limit - F('stories_created')
+    ).update(
+        stories_reserved=F('stories_reserved') + 1,
+        updated_at=timezone.now()
+    )
+    if not reserved:
+        logger.info(f"User {user_profile.user_id} reached the {user_profile.tier} tier limit ({limit}).")
+    return bool(reserved), counter
+
+def settle_story_quota(story_id, status):
     """
-    @wraps(view_func)
-    def _wrapped_view(request, adventure_id, *args, **kwargs):
-        try:
-            # Get the adventure and associated user
-            adventure = Adventure.objects.get(id=adventure_id)
-            user = adventure.user
-            
-            try:
-                # Change from userprofile to profile
-                user_profile = user.profile
-            except UserProfile.DoesNotExist:
-                logger.error(f"User {user.username} does not have a UserProfile. Denying access.")
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'User profile not found'
-                }, status=403)
-            except AttributeError:
-                logger.error(f"User object {user} has no 'profile' attribute.")
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'User profile configuration error'
-                }, status=403)
-
-            # Perform the actual check
-            if can_user_access_feature(user_profile):
-                return view_func(request, adventure_id, *args, **kwargs)
-            else:
-                logger.warning(f"Access denied for user {user.username} based on tier limits.")
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'You have reached your usage limit for this feature'
-                }, status=403)
-
-        except Adventure.DoesNotExist:
-            logger.error(f"Adventure {adventure_id} not found")
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Adventure not found'
-            }, status=404)
-
-    return _wrapped_view
-
-def thread_check_access(view_func):
+    Closes a story's open reservation as 'committed' (counts as a created story) or
+    'released' (gives the slot back). Stories without an open reservation are ignored,
+    so this is safe to call more than once.
+
+    Returns:
+        bool: Whether a reservation was settled
+    """
+    with transaction.atomic():
+        reservation = QuotaReservation.objects.select_for_update().filter(
+            story_id=story_id,
+            status='reserved'
+        ).first()
+        if not reservation:
+            return False
+        reservation.status = status
+        reservation.save(update_fields=['status', 'updated_at'])
+
+        counted = 1 if status == 'committed' else 0
+        UsageCounter.objects.filter(pk=reservation.counter_id).update(
+            stories_reserved=F('stories_reserved') - 1,
+            stories_created=F('stories_created') + counted,
+            updated_at=timezone.now()
+        )
+    logger.debug(f"Quota reservation for story {story_id} {status}")
+    return True
+
+def settle_story_quotas(story_ids, status):
     """
-    Decorator specifically for threaded contexts that need access checking.
-    Does not require authentication as that should be handled before thread creation.
+    Bulk version of settle_story_quota for admin operations on many stories:
+    one update for the reservations and one per affected usage counter.
+
+    Returns:
+        int: Number of reservations settled
     """
-    @wraps(view_func)
-    def _wrapped_view(adventure_id, *args, **kwargs):
-        try:
-            # Get the adventure and associated user
-            adventure = Adventure.objects.get(id=adventure_id)
-            user = adventure.user
-            
-            try:
-                user_profile = user.profile
-            except UserProfile.DoesNotExist:
-                logger.error(f"User {user.username} does not have a UserProfile. Denying access.")
-                return {
-                    'status': 'error',
-                    'message': 'User profile not found'
-                }
-            except AttributeError:
-                logger.error(f"User object {user} has no 'profile' attribute.")
-                return {
-                    'status': 'error',
-                    'message': 'User profile configuration error'
-                }
-
-            # Perform the actual check
-            if can_user_access_feature(user_profile):
-                return view_func(adventure_id, *args, **kwargs)
-            else:
-                logger.warning(f"Access denied for user {user.username} based on tier limits.")
-                return {
-                    'status': 'error',
-                    'message': 'You have reached your usage limit for this feature'
-                }
-
-        except Adventure.DoesNotExist:
-            logger.error(f"Adventure {adventure_id} not found")
-            return {
-                'status': 'error',
-                'message': 'Adventure not found'
-            }
-
-    return _wrapped_view
\ No newline at end of file
+    with transaction.atomic():
+        reservations = list(QuotaReservation.objects.select_for_update().filter(
+            story_id__in=list(story_ids),
+            status='reserved'
+        ).values_list('id', 'counter_id'))
+        if not reservations:
+            return 0
+        QuotaReservation.objects.filter(id__in=[pk for pk, _ in reservations]).update(
+            status=status,
+            updated_at=timezone.now()
+        )
+
+        per_counter = Counter(counter_id for _, counter_id in reservations)
+        counted = 1 if status == 'committed' else 0
+        for counter_id, settled in per_counter.items():
+            UsageCounter.objects.filter(pk=counter_id).update(
+                stories_reserved=F('stories_reserved') - settled,
+                stories_created=F('stories_created') + settled * counted,
+                updated_at=timezone.now()
+            )
+    logger.debug(f"{len(reservations)} quota reservations {status}")
+    return len(reservations)
+
+def commit_story_quota(story_id):
+    return settle_story_quota(story_id, 'committed')
+
+def release_story_quota(story_id):
+    return settle_story_quota(story_id, 'released')
@@ -9,4 +9,6 @@ urlpatterns = [
     path('main_prompt/', views.main_prompt_view, name='main_prompt'),
     path('wait-for-story/<int:story_id>/', views.wait_for_story, name='wait_for_story'),
     path('stories/<int:story_id>/status/', views.check_story_status, name='check_story_status'),
+    path('cron/sweep-stories/', views.sweep_stories_cron, name='sweep_stories_cron'),
+    path('cron/collect-artifacts/', views.collect_artifacts_cron, name='collect_artifacts_cron'),
 ]
\ No newline at end of file
@@ -14,7 +14,7 @@ from django.contrib.auth.decorators import login_required
 from .models import (
     Adventure, Style, World, Character, Setting, Story,
     age_group_choices, style_gender_choices, genre_choices,
-    tone_choices, temporal_choices, StoryImages, ChapterImage
+    tone_choices, temporal_choices, StoryImages, ChapterImage, QuotaReservation
 )
 from django.http import JsonResponse
 from django.urls import reverse
@@ -30,7 +30,13 @@ import logging
 import traceback
 from django.core.files.base import ContentFile
 from main_app.tts_utils import synthesize_long_text, get_available_voices
-from gemini.tier_utils import check_access, thread_check_access, check_free_tier_limit
+from gemini.tier_utils import reserve_story_quota, commit_story_quota, release_story_quota
+from user_profile.models import UserProfile
+from .story_store import StoryArtifactStore
+from .jobs import enqueue_story_generation, claim_story_run
+from .sweeper import sweep_stuck_stories
+from .artifacts import collect_unreferenced_artifacts
+from .model_calls import get_story_token_totals
 from django.contrib.auth import get_user_model
 
 # Set up logger
@@ -260,12 +266,31 @@ def main_prompt_view(request):
         if request.method == 'POST':
             form = StoryPromptForm(request.POST)
             if form.is_valid():
-                # Create and save the story first
-                story = form.save(commit=False)
-                story.adventure = adventure
-                story.title = f"Story {adventure.stories.count() + 1}"
-                story.status = 'processing'
-                story.save()
+                try:
+                    user_profile = request.user.profile
+                except UserProfile.DoesNotExist:
+                    logger.error(f"User {request.user.id} does not have a UserProfile. Denying access.")
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'User profile not found'
+                    }, status=403)
+
+                # Take a slot from the tier limit before anything is spent on generation
+                with transaction.atomic():
+                    allowed, counter = reserve_story_quota(user_profile)
+                    if not allowed:
+                        return JsonResponse({
+                            'status': 'error',
+                            'message': 'You have reached your usage limit for this feature'
+                        }, status=403)
+
+                    story = form.save(commit=False)
+                    story.adventure = adventure
+                    story.title = f"Story {adventure.story_count + 1}"
+                    story.status = 'processing'
+                    story.save()
+                    if counter:
+                        QuotaReservation.objects.create(story=story, counter=counter)
 
                 # Clean up session if needed
                 if 'adventure_id' in request.session:
@@ -273,11 +298,10 @@ def main_prompt_view(request):
 
                 # Start the generation process in the background
                 try:
-                    # Use a background task or thread to generate the story
-                    from threading import Thread
-                    Thread(target=generate_story, args=(adventure.id,)).start()
+                    enqueue_story_generation(story.id, request.user.id, story.generation_run)
                 except Exception as e:
                     logger.error(f"Failed to start story generation: {str(e)}")
+                    release_story_quota(story.id)
                     # Don't return error here, let the user see the waiting page anyway
                 
                 # Redirect to waiting page immediately
@@ -349,6 +373,21 @@ def wait_for_story(request, story_id):
         messages.error(request, 'Story not found.')
         return redirect('gemini:main_prompt')
 
+def sweep_stories_cron(request):
+    """App Engine cron handler; resumes or fails stories whose generation job was lost."""
+    # App Engine strips this header from outside requests, so only cron can set it
+    if request.headers.get('X-Appengine-Cron') != 'true':
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+    resumed, failed = sweep_stuck_stories()
+    return JsonResponse({'status': 'success', 'resumed': resumed, 'failed': failed})
+
+def collect_artifacts_cron(request):
+    """App Engine cron handler; deletes generated artifacts no story references anymore."""
+    if request.headers.get('X-Appengine-Cron') != 'true':
+        return JsonResponse({'status': 'error', 'message': 'Forbidden'}, status=403)
+    deleted, reclaimed = collect_unreferenced_artifacts()
+    return JsonResponse({'status': 'success', 'deleted': deleted, 'reclaimed': reclaimed})
+
 @login_required
 def check_story_status(request, story_id):
     """Check the status of a story generation."""
@@ -393,7 +432,7 @@ def view_story(request, story_id):
 
 
 def get_character_formset(adventure=None):
-    max_num = 7 if adventure and adventure.stories.exists() else 3
+    max_num = 7 if adventure and adventure.has_stories else 3
     return formset_factory(
         CharacterBaseForm,
         extra=1,
@@ -402,7 +441,7 @@ def get_character_formset(adventure=None):
     )
 
 def get_setting_formset(adventure=None):
-    max_num = 7 if adventure and adventure.stories.exists() else 3
+    max_num = 7 if adventure and adventure.has_stories else 3
     return formset_factory(
         SettingBaseForm,
         extra=1,
@@ -411,35 +450,32 @@ def get_setting_formset(adventure=None):
     )
 
 
-@thread_check_access
-def generate_story(adventure_id):
+def generate_story(story_id, user_id, run=0):
+    """
+    Background job for one submitted story. The tier limit was already checked when the
+    story's quota was reserved; the reservation is committed on success and released on failure.
+    Also used by the stuck-job sweeper to resume a story from its saved outline and chapters.
+
+    run is the story's generation_run the job was queued under. A job whose run was
+    superseded by a later sweep or requeue exits without touching the story or its quota.
+    """
     try:
-        # Get all processing stories for this adventure
-        processing_stories = Story.objects.filter(
-            adventure_id=adventure_id, 
-            status='processing'
-        )
-        
-        if processing_stories.count() > 1:
-            # If multiple processing stories exist, mark all but the most recent as failed
-            latest_story = processing_stories.order_by('-created_at').first()
-            processing_stories.exclude(id=latest_story.id).update(
-                status='failed',
-                raw_file='Story generation cancelled - duplicate processing story found'
-            )
-            story = latest_story
-        elif processing_stories.count() == 1:
-            story = processing_stories.first()
-        else:
-            logger.error(f"No processing story found for adventure {adventure_id}")
+        if not claim_story_run(story_id, run):
+            if Story.objects.filter(id=story_id, status='processing').exists():
+                logger.warning(f"Story {story_id} run {run} was superseded by a later run, skipping")
+                return JsonResponse({'status': 'error', 'message': 'Superseded'}, status=409)
+            logger.error(f"No processing story found with id {story_id}")
+            release_story_quota(story_id)
             return JsonResponse({
                 'status': 'error',
                 'message': 'No processing story found'
             }, status=404)
+        story = Story.objects.get(id=story_id)
+        adventure_id = story.adventure_id
 
+        # Media paths are built from the ids the job was started with
+        store = StoryArtifactStore.for_ids(user_id, adventure_id, story.id)
         prompt = story.prompt
-        prompt_token_count = 0
-        candidates_token_count = 0
         try:
             # Configure Gemini
             google_api_key = get_secret('GOOGLE_API_KEY')
@@ -454,31 +490,32 @@ def generate_story(adventure_id):
             
             # Step 2: Create chat context
             logger.debug("Creating chat context...")
-            chat, cache_prompt_count, cache_candidates_count = create_cache(cache_data)
-            prompt_token_count += cache_prompt_count
-            candidates_token_count += cache_candidates_count
+            chat, _, _ = create_cache(cache_data, story.id)
             logger.debug("Chat context created successfully")
             
-            # Step 3: Generate and validate outline
-            logger.debug("Getting outline...")
-            outline, chat, outline_prompt_count, outline_candidates_count = get_outline(prompt, chat, age_group, story)
-            prompt_token_count += outline_prompt_count
-            candidates_token_count += outline_candidates_count
-            logger.debug("Outline generated successfully")
+            # Step 3: Generate and validate outline; a resumed story keeps the one it already has
+            outline = get_saved_outline(story, age_group)
+            if outline is None:
+                # Chapters of an earlier run belong to an outline that is being replaced
+                story.chapters.all().delete()
+                logger.debug("Getting outline...")
+                outline, chat, _, _ = get_outline(prompt, chat, age_group, story)
+                logger.debug("Outline generated successfully")
+            else:
+                logger.info(f"Resuming story {story.id} from its saved outline")
             
             # Step 4: Generate the story
             logger.debug("Generating story content...")
-            story_prompt_count, story_candidates_count = write_story(outline, age_group, chat, prompt, story)
-            prompt_token_count += story_prompt_count
-            candidates_token_count += story_candidates_count
+            write_story(outline, age_group, chat, prompt, story, store)
             logger.debug("Story content generated successfully")
-            logger.debug(f"Total prompt tokens: {prompt_token_count}")
-            logger.debug(f"Total candidates tokens: {candidates_token_count}")
+            # Token totals come from the model call ledger, so retries and resumed runs are included
+            story.input_token_count, story.output_token_count = get_story_token_totals(story.id)
+            logger.debug(f"Total prompt tokens: {story.input_token_count}")
+            logger.debug(f"Total candidates tokens: {story.output_token_count}")
             # Update the story instance with the generated content
             story.status = 'completed'
-            story.input_token_count = prompt_token_count
-            story.output_token_count = candidates_token_count
             story.save()
+            commit_story_quota(story.id)
             
             logger.info(f"Successfully generated story for adventure {adventure_id}")
             return JsonResponse({'status': 'success'})
@@ -486,8 +523,10 @@ def generate_story(adventure_id):
         except Exception as e:
             logger.error(f"Error in story generation process: {str(e)}", exc_info=True)
             story.status = 'failed'
-            story.raw_file = f"Story generation failed: {str(e)}"
+            story.error = f"Story generation failed: {str(e)}"
+            story.input_token_count, story.output_token_count = get_story_token_totals(story.id)
             story.save()
+            release_story_quota(story.id)
             return JsonResponse({
                 'status': 'error',
                 'message': str(e)
@@ -495,6 +534,7 @@ def generate_story(adventure_id):
             
     except Exception as e:
         logger.error(f"Error in story management process: {str(e)}", exc_info=True)
+        release_story_quota(story_id)
         return JsonResponse({
             'status': 'error',
             'message': str(e)
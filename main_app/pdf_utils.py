@@ -0,0 +1,408 @@
+import io
+import json
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image as PILImage
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+
+from gemini.models import Story, StoryPdf
+from gemini.story_store import StoryArtifactStore
+from gemini.story_content import get_raw_content
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Upper bound on concurrent GCS downloads while gathering PDF assets.
+# Keeps a single PDF build from exhausting the gunicorn worker's threads and sockets.
+MAX_ASSET_WORKERS = 8
+
+# Bump whenever the PDF layout changes so every story's cached PDF is rebuilt
+PDF_LAYOUT_VERSION = 1
+
+# A render that hasn't reported progress for this long is assumed dead and re-queued
+PDF_RENDER_STALE_AFTER = timedelta(minutes=10)
+
+# Size of the box every story image is placed in (70% of a letter page)
+PDF_IMAGE_WIDTH = (8.5 * inch) * 0.7
+PDF_IMAGE_HEIGHT = (11 * inch) * 0.7
+
+
+def download_image(store: StoryArtifactStore, blob_name: str) -> Optional[bytes]:
+    """
+    Downloads a single image into memory and decodes it once to make sure it's usable.
+
+    Args:
+        store (StoryArtifactStore): Store of the story the image belongs to
+        blob_name (str): Key of the image
+
+    Returns:
+        bytes or None: The raw image bytes, None if the image is missing or corrupt
+    """
+    try:
+        image_bytes = store.download(blob_name)
+    except Exception as e:
+        logger.warning(f"Could not download image {blob_name}: {str(e)}")
+        return None
+
+    if image_bytes is None:
+        logger.info(f"Image not found: {blob_name}")
+        return None
+    if not image_bytes:
+        logger.warning(f"Downloaded empty image: {blob_name}")
+        return None
+
+    try:
+        with PILImage.open(io.BytesIO(image_bytes)) as pil_img:
+            # load() fully decodes the image, which catches truncated or corrupt files
+            pil_img.load()
+            logger.info(f"Downloaded {blob_name}: {pil_img.size[0]}x{pil_img.size[1]}, {len(image_bytes)} bytes")
+    except Exception as e:
+        logger.error(f"Image verification failed for {blob_name}: {str(e)}")
+        return None
+
+    return image_bytes
+
+
+def map_concurrently(func, keys: list, max_workers: int = MAX_ASSET_WORKERS) -> Dict[Hashable, bytes]:
+    """Runs func(key) for each key on a bounded thread pool and drops empty results."""
+    if not keys:
+        return {}
+    workers = max(1, min(max_workers, len(keys)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(func, keys)
+        return {key: image_bytes for key, image_bytes in zip(keys, results) if image_bytes}
+
+
+def fetch_images(store: StoryArtifactStore, blob_names: Dict[Hashable, str], max_workers: int = MAX_ASSET_WORKERS) -> Dict[Hashable, bytes]:
+    """
+    Downloads several images concurrently.
+
+    Args:
+        store (StoryArtifactStore): Store of the story the images belong to
+        blob_names (dict): Maps a caller-defined key (e.g. ('Part 1', 'Chapter 2')) to a blob path
+        max_workers (int): Maximum number of concurrent downloads
+
+    Returns:
+        dict: Maps each key to its image bytes. Missing or corrupt images are left out.
+    """
+    return map_concurrently(
+        lambda key: download_image(store, blob_names[key]),
+        list(blob_names.keys()),
+        max_workers
+    )
+
+
+# --- Print Image Preparation ---
+
+def get_print_size() -> Tuple[int, int]:
+    """Pixel size of the story image box at the configured print DPI."""
+    dpi = getattr(settings, 'PDF_IMAGE_DPI', 150)
+    return round(PDF_IMAGE_WIDTH / 72 * dpi), round(PDF_IMAGE_HEIGHT / 72 * dpi)
+
+
+def get_print_variant_metadata(source_generation) -> Dict[str, str]:
+    """Metadata identifying which source image and settings a print variant was made from."""
+    width, height = get_print_size()
+    return {
+        'source_generation': str(source_generation),
+        'print_size': f"{width}x{height}",
+        'quality': str(getattr(settings, 'PDF_IMAGE_QUALITY', 80)),
+    }
+
+
+def prepare_print_image(image_bytes: bytes) -> bytes:
+    """
+    Resamples an image once to the print size of the PDF image box and recompresses it.
+    Images already smaller than the box are only recompressed.
+    """
+    target_width, target_height = get_print_size()
+    with PILImage.open(io.BytesIO(image_bytes)) as pil_img:
+        pil_img = pil_img.convert('RGB')
+        if pil_img.size[0] > target_width or pil_img.size[1] > target_height:
+            pil_img = pil_img.resize((target_width, target_height), PILImage.Resampling.LANCZOS)
+        output = io.BytesIO()
+        pil_img.save(
+            output,
+            format='JPEG',
+            quality=getattr(settings, 'PDF_IMAGE_QUALITY', 80),
+            optimize=True
+        )
+    return output.getvalue()
+
+
+def get_print_image(store: StoryArtifactStore, blob_name: str) -> Optional[bytes]:
+    """
+    Returns the print-ready version of an image, reusing the story's cached variant
+    when it was made from the same source generation with the same settings.
+
+    Args:
+        store (StoryArtifactStore): Store of the story, already listed once by the caller
+        blob_name (str): Key of the original image
+    """
+    source_blob = store.get(blob_name)
+    if not source_blob:
+        return None
+
+    variant_name = store.print_key(blob_name)
+    expected_metadata = get_print_variant_metadata(source_blob.generation)
+    variant_blob = store.get(variant_name)
+    if variant_blob and (variant_blob.metadata or {}) == expected_metadata:
+        if variant_bytes := download_image(store, variant_name):
+            return variant_bytes
+
+    image_bytes = download_image(store, blob_name)
+    if not image_bytes:
+        return None
+    print_bytes = prepare_print_image(image_bytes)
+    logger.info(f"Prepared print image for {blob_name}: {len(image_bytes)} -> {len(print_bytes)} bytes")
+
+    try:
+        store.upload(variant_name, print_bytes, 'image/jpeg', metadata=expected_metadata)
+    except Exception as e:
+        # The PDF can still be built, the variant just won't be cached
+        logger.warning(f"Could not cache print image {variant_name}: {str(e)}")
+
+    return print_bytes
+
+
+def fetch_print_images(store: StoryArtifactStore, blob_names: Dict[Hashable, str], max_workers: int = MAX_ASSET_WORKERS) -> Dict[Hashable, bytes]:
+    """Concurrent version of get_print_image for every image in the PDF."""
+    store.list()  # One listing up front; the workers only read it
+    return map_concurrently(
+        lambda key: get_print_image(store, blob_names[key]),
+        list(blob_names.keys()),
+        max_workers
+    )
+
+
+def get_pdf_image(image_bytes: bytes) -> Image:
+    """Wraps in-memory image bytes in a reportlab Image sized to the story image box."""
+    return Image(io.BytesIO(image_bytes), width=PDF_IMAGE_WIDTH, height=PDF_IMAGE_HEIGHT)
+
+
+# --- Content Hashing ---
+
+def get_image_blob_names(raw_content: dict, store: StoryArtifactStore) -> Dict[Hashable, str]:
+    """
+    Maps ('Part X', 'Chapter Y') keys and 'cover' to the image keys used in the PDF,
+    pointing at the legacy copy of an image the store resolves there.
+    """
+    def resolve(key):
+        image = store.resolve(key)
+        return image.name if image else key
+
+    blob_names = {}
+    for part_key, part_data in raw_content.items():
+        for chapter_key in part_data.keys():
+            blob_names[(part_key, chapter_key)] = resolve(store.image_key(part_key, chapter_key))
+    blob_names['cover'] = resolve(store.cover_key())
+    return blob_names
+
+
+def compute_pdf_hash(story: Story, raw_content: dict, image_blob_names: Dict[Hashable, str], store: StoryArtifactStore) -> str:
+    """
+    Hashes everything that affects the rendered PDF: title, chapter text,
+    the GCS generation of each image, the print image settings and the layout version.
+    """
+    payload = {
+        'layout_version': PDF_LAYOUT_VERSION,
+        'print_settings': get_print_variant_metadata(None),
+        'title': story.title,
+        'content': raw_content,
+        'images': sorted(
+            (blob_name, store.get(blob_name).generation if store.get(blob_name) else None)
+            for blob_name in image_blob_names.values()
+        ),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# --- PDF Building ---
+
+def build_story_pdf(title: str, raw_content: dict, images: Dict[Hashable, bytes]) -> bytes:
+    """
+    Lays out the title page, cover and chapters and returns the PDF bytes.
+
+    Args:
+        title (str): Story title
+        raw_content (dict): {part_key: {chapter_key: {'full_text': str, ...}}}
+        images (dict): Image bytes keyed by 'cover' or ('Part X', 'Chapter Y')
+    """
+    styles = getSampleStyleSheet()
+    paragraph_style = ParagraphStyle(
+        name = 'chapter_text',
+        fontSize = 16,
+        leftIndent = 24,
+        spaceAfter = 14,
+        leading = 21
+    )
+    story_elements = []
+
+    # Handle cover image
+    if cover_bytes := images.get('cover'):
+        story_elements.append(Paragraph(f"<h1>{title}</h1>", styles['Title']))
+        story_elements.append(Spacer(1, 2 * inch))
+        story_elements.append(get_pdf_image(cover_bytes))
+
+    pdf_buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        pdf_buffer,
+        pagesize=(8.5 * inch, 11 * inch),
+        leftMargin=1 * inch,
+        rightMargin=1 * inch,
+        topMargin=1 * inch,
+        bottomMargin=1 * inch
+    )
+
+    # Add title page if not already added with cover
+    if not story_elements:
+        story_elements.append(Paragraph(f"<h1>{title}</h1>", styles['Title']))
+        story_elements.append(PageBreak())
+
+    text_data = {
+        (part_key, chapter_key): chapter_data['full_text']
+        for part_key, part_data in raw_content.items()
+        for chapter_key, chapter_data in part_data.items()
+    }
+
+    # Add chapters with images
+    for part_chapter in sorted(text_data.keys()):
+        part_name, chapter_name = part_chapter
+
+        # Add PageBreak before each chapter
+        story_elements.append(PageBreak())
+
+        # If this is Chapter 1 of any part, add the part title first
+        if "Chapter 1" in chapter_name:
+            story_elements.append(Paragraph(f"<h1>{part_name}</h1>", styles['Title']))
+            story_elements.append(PageBreak())
+
+        # Then add the chapter image
+        if chapter_bytes := images.get(part_chapter):
+            story_elements.append(get_pdf_image(chapter_bytes))
+            story_elements.append(PageBreak())
+
+        # Finally add the chapter text
+        story_elements.append(Paragraph(f"<h1>{chapter_name}</h1>", styles['Title']))
+        story_elements.append(Spacer(1, 0.5 * inch))
+        story_elements.append(Paragraph(text_data[part_chapter], paragraph_style))
+        story_elements.append(Spacer(1, 0.5 * inch))
+
+    doc.build(story_elements, onFirstPage=lambda canvas, doc: canvas.setPageSize((8.5*inch, 11*inch)))
+    return pdf_buffer.getvalue()
+
+
+# --- Background Rendering ---
+
+def set_render_progress(story_pdf_id: int, **fields):
+    """Updates the render record without loading it first."""
+    StoryPdf.objects.filter(id=story_pdf_id).update(updated_at=timezone.now(), **fields)
+
+
+def render_story_pdf(story_pdf_id: int, story_prefix: str, content_hash: str, legacy_prefix: Optional[str] = None):
+    """
+    Background job: fetches images, builds the PDF and uploads it under a content-addressed name.
+    Progress is written to the StoryPdf record so the UI can poll it.
+    """
+    try:
+        story_pdf = StoryPdf.objects.select_related('story').prefetch_related('story__chapters').get(id=story_pdf_id)
+        story = story_pdf.story
+        raw_content = get_raw_content(story)
+        set_render_progress(story_pdf_id, status='processing', progress=5, error='')
+
+        store = StoryArtifactStore(story_prefix, legacy_prefix=legacy_prefix)
+        images = fetch_print_images(store, get_image_blob_names(raw_content, store))
+        logger.info(f"Fetched {len(images)} images for story {story.id}")
+        set_render_progress(story_pdf_id, progress=50)
+
+        pdf_bytes = build_story_pdf(story.title, raw_content, images)
+        set_render_progress(story_pdf_id, progress=80)
+
+        blob_name = store.pdf_key(content_hash)
+        store.upload(blob_name, pdf_bytes, 'application/pdf')
+
+        # Remove the PDF this one replaces
+        previous_blob_name = story_pdf.blob_name
+        if previous_blob_name and previous_blob_name != blob_name:
+            store.delete_many([previous_blob_name])
+
+        # Only mark complete if nobody queued a newer version while we were rendering
+        StoryPdf.objects.filter(id=story_pdf_id, content_hash=content_hash).update(
+            status='completed',
+            progress=100,
+            blob_name=blob_name,
+            updated_at=timezone.now()
+        )
+        logger.info(f"PDF for story {story.id} uploaded to {blob_name} ({len(pdf_bytes)} bytes)")
+
+    except Exception as e:
+        logger.error(f"Error rendering PDF {story_pdf_id}: {str(e)}", exc_info=True)
+        StoryPdf.objects.filter(id=story_pdf_id, content_hash=content_hash).update(
+            status='failed',
+            error=str(e),
+            updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def request_story_pdf(story: Story, store: StoryArtifactStore) -> StoryPdf:
+    """
+    Returns the story's PDF record, queueing a background render if the
+    content hash changed or a previous render failed or stalled.
+    """
+    raw_content = get_raw_content(story)
+    image_blob_names = get_image_blob_names(raw_content, store)
+    content_hash = compute_pdf_hash(story, raw_content, image_blob_names, store)
+
+    with transaction.atomic():
+        story_pdf, created = StoryPdf.objects.select_for_update().get_or_create(story=story)
+
+        if story_pdf.content_hash == content_hash:
+            if story_pdf.status == 'completed' and store.get(story_pdf.blob_name):
+                return story_pdf
+            in_flight = story_pdf.status in ('queued', 'processing')
+            if in_flight and timezone.now() - story_pdf.updated_at < PDF_RENDER_STALE_AFTER:
+                return story_pdf
+
+        story_pdf.content_hash = content_hash
+        story_pdf.status = 'queued'
+        story_pdf.progress = 0
+        story_pdf.error = ''
+        story_pdf.save()
+
+    thread = threading.Thread(
+        target=render_story_pdf,
+        args=(story_pdf.id, store.prefix, content_hash, store.legacy_prefix)
+    )
+    thread.daemon = True
+    transaction.on_commit(thread.start)
+    return story_pdf
+
+
+def invalidate_story_pdf(story: Story, store: StoryArtifactStore):
+    """
+    Deletes the rendered PDF for a story, plus the legacy final.pdf from before
+    renders were content-addressed, and resets its record so the next request rebuilds it.
+    """
+    story_pdf = StoryPdf.objects.filter(story=story).first()
+    blob_names = [store.legacy_pdf_key()]
+    if store.legacy_prefix:
+        blob_names.append(store.legacy_key(store.legacy_pdf_key()))
+    if story_pdf and story_pdf.blob_name:
+        blob_names.append(story_pdf.blob_name)
+    store.delete_many(blob_names)
+    if story_pdf:
+        story_pdf.delete()
@@ -7,10 +7,11 @@ from typing import List, Dict, Tuple, Optional
 # pip install google-cloud-texttospeech
 from google.cloud import texttospeech
 from google.api_core import exceptions as google_exceptions
-from google.cloud import storage
-from django.contrib.auth import get_user_model
-
-User = get_user_model()  # This will get your custom User model from access.User
+from .voice_catalog import get_voice_catalog, get_voice, validate_voice_name
+from gemini.models import Story
+from gemini.story_store import StoryArtifactStore
+from gemini.model_calls import track_model_call
+from gemini.artifacts import get_content_key, get_artifacts, load_artifact, store_artifact, add_artifact_reference, prune_artifact_references
 
 # --- Configuration ---
 
@@ -18,7 +19,7 @@ User = get_user_model()  # This will get your custom User model from access.User
 # We chunk text safely below this limit. 4500 characters is generally safe.
 MAX_CHUNK_SIZE = 4500
 
-# Define some popular voices. You can find more via client.list_voices()
+# Define some popular voices. The full list is available via voice_catalog.get_voice_catalog()
 # Format: { 'display_name': 'voice_name (language_code)', ... }
 # See: https://cloud.google.com/text-to-speech/docs/voices
 POPULAR_VOICES = {
@@ -69,19 +70,14 @@ def get_tts_client() -> Optional[texttospeech.TextToSpeechClient]:
 
 def get_voice_details(voice_name: str) -> Optional[Tuple[str, str]]:
     """
-    Extracts language code and base voice name.
-    Assumes voice_name format like 'en-US-Wavenet-F'.
-    Returns (language_code, base_voice_name) or None if format is wrong.
+    Looks up the language code for a voice in the voice catalog.
+    Returns (language_code, voice_name) or None if the voice is unknown.
     """
-    parts = voice_name.split('-')
-    if len(parts) >= 2:
-        language_code = f"{parts[0]}-{parts[1]}"
-        # The rest is considered the 'name' part for the API
-        base_voice_name = voice_name
-        return language_code, base_voice_name
-    else:
-        logger.warning(f"Could not parse language code from voice_name: {voice_name}")
-        return None
+    voice = get_voice(voice_name)
+    if voice:
+        return voice['language_code'], voice['name']
+    logger.warning(f"Voice not found in voice catalog: {voice_name}")
+    return None
 
 def split_text_into_chunks(text: str, max_length: int = 4500) -> List[str]:
     """
@@ -130,13 +126,24 @@ def split_text_into_chunks(text: str, max_length: int = 4500) -> List[str]:
     return chunks
 
 
+def get_audio_content_key(text_chunk: str, voice_name: str, language_code: str) -> str:
+    """Content key of a synthesized chunk: same text, voice and encoding, same audio."""
+    return get_content_key(
+        'audio',
+        voice_name,
+        {'language_code': language_code, 'audio_encoding': 'MP3'},
+        text_chunk
+    )
+
+
 # --- Core Synthesis Functions ---
 
 def synthesize_single_chunk(
     client: texttospeech.TextToSpeechClient,
     text_chunk: str,
     voice_name: str,
-    audio_format: texttospeech.AudioEncoding = texttospeech.AudioEncoding.MP3
+    audio_format: texttospeech.AudioEncoding = texttospeech.AudioEncoding.MP3,
+    story_id: Optional[int] = None
 ) -> Optional[bytes]:
     """Synthesizes audio for a single text chunk (must be under API limit)."""
     voice_details = get_voice_details(voice_name)
@@ -161,9 +168,11 @@ def synthesize_single_chunk(
     )
 
     try:
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
+        with track_model_call('audio', base_voice_name, story_id, kind='tts') as call:
+            call['units'] = len(text_chunk)
+            response = client.synthesize_speech(
+                input=synthesis_input, voice=voice, audio_config=audio_config
+            )
         logger.debug(f"Successfully synthesized chunk starting with: {text_chunk[:50]}...")
         return response.audio_content
     except google_exceptions.InvalidArgument as e:
@@ -175,56 +184,73 @@ def synthesize_single_chunk(
         return None
 
 
-def synthesize_long_text(text: str, voice_name: str, story_id: int, user_id: int, adventure_id: int):
+def synthesize_long_text(text: str, voice_name: str, story_id: int, user_id: int, adventure_id: int,
+                         user_name: str = None):
     try:
-        # Get the username using your custom User model
-        user = User.objects.get(id=user_id)
-        username = user.username
-        
-        # Use username in the file path
-        output_filename = f"{username}/adventure_{adventure_id}/story_{story_id}/audio.mp3"
-        
-        # Check if file already exists
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(output_filename)
+        # Validate the voice before any storage or synthesis calls are made
+        voice_details = validate_voice_name(voice_name)
+        language_code = voice_details['language_code']
+
+        # The path is built from ids alone, no user lookup needed
+        store = StoryArtifactStore.for_ids(user_id, adventure_id, story_id, user_name=user_name)
+        output_filename = store.audio_key()
         
-        if blob.exists():
+        # Check if file already exists, in the legacy folder too if not migrated yet
+        if store.resolve(output_filename):
             logger.info(f"Audio file already exists: {output_filename}")
             return
             
-        # Rest of the function remains the same...
-        client = texttospeech.TextToSpeechClient()
+        client = None
+        story = Story.objects.get(id=story_id)
         
         # Split text into chunks if needed
         text_chunks = split_text_into_chunks(text)
         all_audio_content = []
+
+        # Chunks already synthesized with this voice (e.g. an unchanged chapter in a
+        # regenerated story) are reused from the artifact store
+        content_keys = [get_audio_content_key(chunk, voice_name, language_code) for chunk in text_chunks]
+        artifacts = get_artifacts(content_keys)
         
-        for chunk in text_chunks:
+        for index, (chunk, content_key) in enumerate(zip(text_chunks, content_keys)):
+            artifact = artifacts.get(content_key)
+            audio_content = load_artifact(artifact) if artifact else None
+            if audio_content:
+                logger.debug(f"Audio chunk {index} for story {story_id} was a cache hit")
+                all_audio_content.append(audio_content)
+                add_artifact_reference(artifact, story, f"audio_chunk_{index}")
+                continue
+
+            if client is None:
+                client = texttospeech.TextToSpeechClient()
             synthesis_input = texttospeech.SynthesisInput(text=chunk)
             voice = texttospeech.VoiceSelectionParams(
-                language_code=voice_name[:5],
+                language_code=language_code,
                 name=voice_name
             )
             audio_config = texttospeech.AudioConfig(
                 audio_encoding=texttospeech.AudioEncoding.MP3
             )
             
-            response = client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
-            )
+            # Billed per character synthesized
+            with track_model_call('audio', voice_name, story_id, kind='tts') as call:
+                call['units'] = len(chunk)
+                response = client.synthesize_speech(
+                    input=synthesis_input,
+                    voice=voice,
+                    audio_config=audio_config
+                )
             all_audio_content.append(response.audio_content)
+            artifact = store_artifact('audio', content_key, response.audio_content, 'audio/mpeg', 'mp3')
+            add_artifact_reference(artifact, story, f"audio_chunk_{index}")
+        
+        prune_artifact_references(story, 'audio_chunk_', [f"audio_chunk_{index}" for index in range(len(text_chunks))])
         
         # Combine all audio content
         combined_audio = b''.join(all_audio_content)
         
         # Upload to Google Cloud Storage
-        blob.upload_from_string(
-            combined_audio,
-            content_type='audio/mpeg'
-        )
+        store.upload(output_filename, combined_audio, 'audio/mpeg')
         
         logger.info(f"Successfully generated and uploaded audio file: {output_filename}")
         
@@ -235,10 +261,13 @@ def synthesize_long_text(text: str, voice_name: str, story_id: int, user_id: int
 # --- Public Accessors ---
 
 def get_available_voices() -> Dict[str, str]:
-    """Returns the predefined list of popular voices."""
-    # You could potentially expand this to actually query the API
-    # using client.list_voices() if needed, but that's an extra API call.
-    return POPULAR_VOICES
+    """Returns the popular voices that exist in the voice catalog."""
+    voices_by_name = get_voice_catalog()['by_name']
+    return {
+        display_name: voice_name
+        for display_name, voice_name in POPULAR_VOICES.items()
+        if voice_name in voices_by_name
+    }
 
 
 # --- Example Usage (for testing locally) ---
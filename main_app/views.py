@@ -2,7 +2,7 @@ from django.shortcuts import render
 #from .models import Story  # Import your Story model
 from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
-from gemini.models import Adventure, Story  # Import from gemini app instead of main_app
+from gemini.models import Adventure, Story, StoryPdf  # Import from gemini app instead of main_app
 import json
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils import timezone
@@ -15,6 +15,7 @@ from main_app.tts_utils import get_available_voices
 from django.core.files.base import ContentFile
 from django.views.decorators.http import require_http_methods
 from .tts_utils import synthesize_long_text, split_text_into_chunks
+from .voice_catalog import validate_voice_name
 import os
 from google.cloud import storage, texttospeech
 import logging
@@ -22,20 +23,36 @@ from typing import List
 import io
 import threading
 from django.conf import settings
-from gemini.img_utils import get_stored_image
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from urllib.request import urlretrieve
-import tempfile
-from PIL import Image as PILImage  # Add this to avoid conflict with reportlab Image
-from reportlab.lib.utils import ImageReader
+from gemini.img_utils import get_stored_image, build_srcset, get_variant_url
+from gemini.media import media_url
+from gemini.story_store import StoryArtifactStore
+from reportlab.platypus import Paragraph
 from reportlab.lib.pagesizes import letter
+from .pdf_utils import request_story_pdf, invalidate_story_pdf
+from gemini.story_content import get_raw_content, get_full_text, get_chapter_texts, update_chapter_texts
 
 
 
 logger = logging.getLogger(__name__)
 
+def get_cover_image_urls(story, store):
+    """
+    Returns the cover URL plus thumbnail/srcset entries for library cards, without
+    any storage calls. Stories created before image variants existed fall back to the
+    unversioned full cover, in the legacy username folder until it has been migrated.
+    """
+    try:
+        variants = story.story_images.cover_variants
+    except Story.story_images.RelatedObjectDoesNotExist:
+        variants = {}
+    cover_image_url = get_variant_url(variants, 'full', media_url(store.unlisted_key(store.cover_key())))
+    return {
+        'cover_image_url': cover_image_url,
+        'cover_thumbnail_url': get_variant_url(variants, 'medium', cover_image_url),
+        'cover_srcset': build_srcset(variants, 'jpeg'),
+        'cover_webp_srcset': build_srcset(variants, 'webp'),
+    }
+
 @login_required
 def home_view(request):
     sleep(0.1)  # Add a small delay to ensure database connection is ready
@@ -47,7 +64,7 @@ def home_view(request):
         stories = Story.objects.filter(
             adventure=adventure,
             status='completed'
-        ).order_by('-created_at')
+        ).select_related('story_images').order_by('-created_at')
         
         for story in stories:
             # Parse the outline JSON if it's stored as a JSON string
@@ -64,7 +81,10 @@ def home_view(request):
                 'story_id': story.id,
                 'adventure_id': adventure.id,
                 'status': story.status,
-                'cover_image_url': f'https://storage.googleapis.com/write-res/{user.username}/adventure_{adventure.id}/story_{story.id}/cover.jpg'
+                **get_cover_image_urls(
+                    story,
+                    StoryArtifactStore.for_ids(user.id, adventure.id, story.id, user_name=user.username)
+                )
             })
     
     return render(request, 'main_app/home.html', {'library_items': library_items})
@@ -81,7 +101,7 @@ def library_view(request):
     featured_adventure_id = request.GET.get('adventure_id')
     user = request.user
     # Get all adventures with prefetched stories
-    base_queryset = Adventure.objects.filter(user=request.user).prefetch_related('stories')
+    base_queryset = Adventure.objects.filter(user=request.user).prefetch_related('stories', 'stories__story_images')
     
     # Handle featured adventure ordering
     if source == 'home' and featured_adventure_id:
@@ -121,7 +141,10 @@ def library_view(request):
                 'title': story.title,
                 'created_at': story.created_at,
                 'summary': story.summary,
-                'cover_image_url': f'https://storage.googleapis.com/write-res/{user.username}/adventure_{adventure.id}/story_{story.id}/cover.jpg',
+                **get_cover_image_urls(
+                    story,
+                    StoryArtifactStore.for_ids(user.id, adventure.id, story.id, user_name=user.username)
+                ),
                 'status': story.status
             })
         
@@ -184,36 +207,40 @@ def start_new_adventure(request):
 @require_http_methods(["POST"])
 def generate_audio(request, story_id):
     try:
-        story = Story.objects.select_related('content').get(id=story_id)
-        adventure_id = story.adventure.id
+        story = Story.objects.prefetch_related('chapters').get(id=story_id, adventure__user=request.user)
+        adventure_id = story.adventure_id
         data = json.loads(request.body)
         voice_name = data.get('voice', 'en-US-Neural2-J')
+
+        # Reject unknown voices before the background job starts
+        try:
+            validate_voice_name(voice_name)
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=400)
         
-        # Get the raw content from StoryContent
+        # Build the narration text from the story's chapters
         try:
-            story_content = story.content
+            raw_content = get_raw_content(story)
+            if not raw_content:
+                raise AttributeError("story has no chapters")
             full_text = []
             
-            # Iterate through parts in order
-            for part_num in range(1, 6):  # Max 5 parts
-                part_key = f"Part {part_num}"
-                if part_key in story_content.raw_content:
-                    full_text.append(f"\n{part_key}\n")
-                    part_data = story_content.raw_content[part_key]
-                    
-                    # Add chapters in order
-                    for chapter_num in range(1, 6):  # Max 5 chapters
-                        chapter_key = f"Chapter {chapter_num}"
-                        if chapter_key in part_data:
-                            full_text.append(f"\n{chapter_key}\n")
-                            full_text.append(part_data[chapter_key]['full_text'])
+            # Parts and chapters come back in reading order
+            for part_key, part_data in raw_content.items():
+                full_text.append(f"\n{part_key}\n")
+                for chapter_key, chapter in part_data.items():
+                    full_text.append(f"\n{chapter_key}\n")
+                    full_text.append(chapter['full_text'])
             
             raw_text = "\n".join(full_text)
             
             # Start the background task in a thread
             thread = threading.Thread(
                 target=synthesize_long_text,
-                args=(raw_text, voice_name, story_id, request.user.id, adventure_id)
+                args=(raw_text, voice_name, story_id, request.user.id, adventure_id, request.user.username)
             )
             thread.daemon = True
             thread.start()
@@ -245,23 +272,18 @@ def generate_audio(request, story_id):
 @login_required
 def check_audio(request, story_id):
     try:
-        story = Story.objects.get(id=story_id)
+        story = Story.objects.get(id=story_id, adventure__user=request.user)
         adventure_id = story.adventure.id
         
-        filename = f"{request.user.username}/adventure_{adventure_id}/story_{story_id}/audio.mp3"
-        logger.info(f"Checking for audio file: {filename}")
-
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(filename)
+        store = StoryArtifactStore.for_ids(request.user.id, adventure_id, story_id, user_name=request.user.username)
+        logger.info(f"Checking for audio file: {store.audio_key()}")
 
-        logger.info(f"Checking blob existence for: gs://write-res/{filename}")
-        exists = blob.exists()
-        logger.info(f"Blob exists: {exists}")
+        # The listing entry gives existence and the generation for the versioned URL,
+        # from the legacy folder if the story's media has not been migrated yet
+        audio = store.resolve(store.audio_key())
 
-        if exists:
-            # Instead of make_public(), construct the public URL directly
-            audio_url = f"https://storage.googleapis.com/write-res/{filename}"
+        if audio:
+            audio_url = media_url(audio.name, audio.generation)
             logger.info(f"Audio URL generated: {audio_url}")
             
             return JsonResponse({
@@ -283,17 +305,20 @@ def check_audio(request, story_id):
 def story_images(request, story_id):
     """Endpoint to get all images associated with a story."""
     try:
-        story = Story.objects.get(id=story_id, adventure__user=request.user)
+        story = Story.objects.select_related('story_images').get(id=story_id, adventure__user=request.user)
         images = []
         
-        # Get the base GCS URL from settings
-        base_url = f'https://storage.googleapis.com/write-res/{request.user.id}/adventure_{story.adventure.id}/story_{story.id}/story_images/'
+        store = StoryArtifactStore.for_ids(
+            request.user.id, story.adventure_id, story.id, user_name=request.user.username
+        )
         
         # Add cover image if it exists
-        cover_image_url = base_url + f'cover.jpg'
+        cover_urls = get_cover_image_urls(story, store)
         images.append({
-            'url': cover_image_url,
-            'thumbnail_url': cover_image_url,  # You could create actual thumbnails in the future
+            'url': cover_urls['cover_image_url'],
+            'thumbnail_url': cover_urls['cover_thumbnail_url'],
+            'srcset': cover_urls['cover_srcset'],
+            'webp_srcset': cover_urls['cover_webp_srcset'],
             'type': 'cover'
         })
         
@@ -301,12 +326,21 @@ def story_images(request, story_id):
         if hasattr(story, 'story_images'):
             chapter_images = story.story_images.chapter_images.all()
             for chapter_image in chapter_images:
-                image_url = chapter_image.image.url
+                # Original images are overwritten on regeneration and cached as immutable,
+                # so the fallback URL carries the generation too
+                variants = chapter_image.variants or {}
+                image_url = None
+                if not (variants.get('full') and variants.get('thumb')):
+                    image = store.get(chapter_image.image.name)
+                    image_url = media_url(chapter_image.image.name, image.generation if image else None)
                 images.append({
-                    'url': image_url,
-                    'thumbnail_url': image_url,  # You could create actual thumbnails in the future
+                    'url': get_variant_url(chapter_image.variants, 'full', image_url),
+                    'thumbnail_url': get_variant_url(chapter_image.variants, 'thumb', image_url),
+                    'srcset': build_srcset(chapter_image.variants, 'jpeg'),
+                    'webp_srcset': build_srcset(chapter_image.variants, 'webp'),
                     'type': 'chapter',
-                    'chapter_number': chapter_image.chapter_number,
+                    'part_key': chapter_image.part_key,
+                    'chapter_key': chapter_image.chapter_key,
                     'text_marker': chapter_image.text_marker
                 })
         
@@ -330,23 +364,30 @@ def story_images(request, story_id):
 @login_required
 def check_story_file(request, story_id):
     try:
-        story = Story.objects.get(id=story_id)
-        adventure_id = story.adventure.id
-        
-        filename = f"{request.user.username}/adventure_{adventure_id}/story_{story_id}/final.pdf"
-        logger.info(f"Checking for PDF file: {filename}")
+        story = Story.objects.get(id=story_id, adventure__user=request.user)
+        adventure_id = story.adventure_id
 
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        blob = bucket.blob(filename)
+        # Stories rendered through the PDF pipeline have a record with the current blob
+        story_pdf = StoryPdf.objects.filter(story=story).first()
+        if story_pdf:
+            if story_pdf.status == 'completed':
+                return JsonResponse({
+                    'exists': True,
+                    'story_url': media_url(story_pdf.blob_name)
+                })
+            return JsonResponse({
+                'exists': False,
+                'status': story_pdf.status,
+                'progress': story_pdf.progress
+            })
+        
+        store = StoryArtifactStore.for_ids(request.user.id, adventure_id, story_id, user_name=request.user.username)
+        logger.info(f"Checking for PDF file: {store.legacy_pdf_key()}")
 
-        logger.info(f"Checking blob existence for: gs://write-res/{filename}")
-        exists = blob.exists()
-        logger.info(f"Blob exists: {exists}")
+        story_file = store.resolve(store.legacy_pdf_key())
 
-        if exists:
-            # Construct the public URL for the PDF file
-            story_url = f"https://storage.googleapis.com/write-res/{filename}"
+        if story_file:
+            story_url = media_url(story_file.name, story_file.generation)
             logger.info(f"PDF URL generated: {story_url}")
             
             return JsonResponse({
@@ -369,13 +410,6 @@ def check_story_file(request, story_id):
             'message': str(e)
         }, status=500)
     
-@login_required
-def check_image_in_bucket(bucket, image_path):
-    blob = bucket.blob(image_path)
-    exists = blob.exists()
-    logger.info(f"Image {image_path} exists in bucket: {exists}")
-    return exists
-
 def center_text_on_page(canvas, doc, text, style):
     canvas.saveState()
     text_obj = Paragraph(text, style)
@@ -385,168 +419,44 @@ def center_text_on_page(canvas, doc, text, style):
     text_obj.drawOn(canvas, x, y)
     canvas.restoreState()
 
+def get_pdf_status_response(story_pdf):
+    """Builds the JSON payload describing a story's PDF render."""
+    if story_pdf.status == 'completed':
+        return JsonResponse({
+            'status': 'success',
+            'message': 'PDF is ready',
+            'filename': story_pdf.blob_name,
+            'story_url': media_url(story_pdf.blob_name),
+            'progress': 100
+        })
+    if story_pdf.status == 'failed':
+        return JsonResponse({
+            'status': 'error',
+            'message': story_pdf.error or 'PDF generation failed',
+            'progress': story_pdf.progress
+        }, status=500)
+    return JsonResponse({
+        'status': 'processing',
+        'message': 'PDF generation in progress',
+        'progress': story_pdf.progress
+    }, status=202)
+
 @login_required
 def create_final_story(request, story_id):
     try:
-        # Get story with related content and images
-        story = Story.objects.select_related(
-            'content',
-            'story_images'
-        ).prefetch_related(
-            'story_images__chapter_images'
-        ).get(id=story_id)
-        
-        adventure_id = story.adventure.id
-        user_name = request.user.username
+        story = Story.objects.prefetch_related('chapters').get(id=story_id, adventure__user=request.user)
+        store = StoryArtifactStore.for_ids(request.user.id, story.adventure_id, story_id, user_name=request.user.username)
 
-        # Create a temporary directory to store images
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Create the nested directory structure for the PDF
-            pdf_dir = os.path.join(temp_dir, user_name, f"adventure_{adventure_id}", f"story_{story_id}")
-            os.makedirs(pdf_dir, exist_ok=True)
-            
-            # Prepare text data and download images
-            text_data = {}
-            image_paths = {}
-            styles = getSampleStyleSheet()
-            paragraph_style = ParagraphStyle(
-                name = 'chapter_text',
-                fontSize = 16,
-                leftIndent = 24,
-                spaceAfter = 14,
-                leading = 21
-            )
-            story_elements = []  # Initialize story_elements here
-            
-            try:
-                story_content = story.content.raw_content
-                # Organize text data and download images
-                for part_key, part_data in story_content.items():
-                    for chapter_key, chapter_data in part_data.items():
-                        part_chapter = (part_key, chapter_key)
-                        text_data[part_chapter] = chapter_data['full_text']
-                        
-                        # Extract numbers from part_key and chapter_key
-                        part_num = part_key.split()[-1]  # Gets the number from "Part X"
-                        chapter_num = chapter_key.split()[-1]  # Gets the number from "Chapter X"
-                        
-                        # Construct the image URL directly
-                        image_url = f"https://storage.googleapis.com/write-res/{user_name}/adventure_{adventure_id}/story_{story_id}/Part{part_num}_Chapter{chapter_num}.jpg"
-                        # Use a simpler temporary filename, matching cover image pattern
-                        image_path = os.path.join(temp_dir, f"chapter_{part_num}_{chapter_num}.jpg")
-                        
-                        try:
-                            logger.info(f"Attempting to download image from: {image_url}")
-                            urlretrieve(image_url, image_path)
-                            
-                            if os.path.exists(image_path):
-                                file_size = os.path.getsize(image_path)
-                                logger.info(f"Downloaded image size: {file_size} bytes")
-                                if file_size > 0:
-                                    # Store the full path in image_paths
-                                    image_paths[part_chapter] = image_path
-                                    logger.info(f"Successfully downloaded image to {image_path}")
-                        except Exception as e:
-                            logger.warning(f"Could not download image {image_url}: {str(e)}")
-
-                # Handle cover image
-                cover_url = f"https://storage.googleapis.com/write-res/{user_name}/adventure_{adventure_id}/story_{story_id}/cover.jpg"
-                cover_path = os.path.join(temp_dir, "cover.jpg")
-                try:
-                    logger.info(f"Attempting to download cover from: {cover_url}")
-                    urlretrieve(cover_url, cover_path)
-                    
-                    if os.path.exists(cover_path) and os.path.getsize(cover_path) > 0:
-                        if cover_img := verify_and_get_image(cover_path):
-                            logger.info("Successfully added cover image to PDF")
-                            story_elements.append(Paragraph(f"<h1>{story.title}</h1>", styles['Title']))
-                            story_elements.append(Spacer(1, 2 * inch))
-                            story_elements.append(cover_img)
-                except Exception as e:
-                    logger.warning(f"Could not download cover image: {str(e)}")
-
-                # Set up the PDF path
-                pdf_filename = f"{user_name}/adventure_{adventure_id}/story_{story_id}/final.pdf"
-                pdf_path = os.path.join(pdf_dir, "final.pdf")
-                
-                # Generate PDF
-                #doc = SimpleDocTemplate(pdf_path, pagesize=(8.5 * inch, 11 * inch))
-                doc = SimpleDocTemplate(
-                    pdf_path,
-                    pagesize=(8.5 * inch, 11 * inch),
-                    leftMargin=1 * inch,
-                    rightMargin=1 * inch,
-                    topMargin=1 * inch,
-                    bottomMargin=1 * inch
-                )
-                #styles = getSampleStyleSheet()
-
-                # Add title page if not already added with cover
-                if not story_elements:
-                    title = Paragraph(f"<h1>{story.title}</h1>", styles['Title'])
-                    story_elements.append(title)
-                    story_elements.append(PageBreak())
-
-                # Add chapters with images
-                sorted_chapters = sorted(text_data.keys())
-                for part_chapter in sorted_chapters:
-                    part_name, chapter_name = part_chapter
-                    text = text_data[part_chapter]
-                    image_path = image_paths.get(part_chapter)
-
-                    # Add PageBreak before each chapter
-                    story_elements.append(PageBreak())
-
-                    # If this is Chapter 1 of any part, add the part title first
-                    if "Chapter 1" in chapter_name:
-                        story_elements.append(Paragraph(f"<h1>{part_name}</h1>", styles['Title']))
-                        story_elements.append(PageBreak())
-
-                    # Then add the chapter heading and image
-                    if image_path and os.path.exists(image_path):
-                        try:
-                            if chapter_img := verify_and_get_image(image_path):
-                                logger.info(f"Successfully added chapter image to PDF: {image_path}")
-                                story_elements.append(chapter_img)
-                                story_elements.append(PageBreak())
-                                
-                                logger.info("Chapter image added to story_elements")
-                        except Exception as e:
-                            logger.error(f"Error adding chapter image to PDF: {str(e)}")
-
-                    # Finally add the chapter text
-                    text_paragraph = Paragraph(text, paragraph_style)
-                    story_elements.append(Paragraph(f"<h1>{chapter_name}</h1>", styles['Title']))
-                    story_elements.append(Spacer(1, 0.5 * inch))
-                    story_elements.append(text_paragraph)
-                    story_elements.append(Spacer(1, 0.5 * inch))
-
-                # Build the PDF with additional settings
-                doc.build(story_elements, onFirstPage=lambda canvas, doc: canvas.setPageSize((8.5*inch, 11*inch)))
-
-                # Initialize storage client for PDF upload
-                storage_client = storage.Client()
-                bucket = storage_client.bucket('write-res')
-                blob = bucket.blob(pdf_filename)
-                
-                with open(pdf_path, 'rb') as pdf_file:
-                    blob.upload_from_file(
-                        pdf_file, 
-                        content_type='application/pdf',
-                    )
-
-                return JsonResponse({
-                    'status': 'success',
-                    'message': 'PDF generated and uploaded successfully',
-                    'filename': pdf_filename
-                })
+        if not story.chapters.all():
+            logger.error(f"Content missing for story {story_id}")
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Required content missing'
+            }, status=404)
 
-            except AttributeError as e:
-                logger.error(f"Content or image data missing: {e}")
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'Required content missing'
-                }, status=404)
+        # Returns the existing PDF if nothing changed, otherwise queues a rebuild
+        story_pdf = request_story_pdf(story, store)
+        return get_pdf_status_response(story_pdf)
 
     except Story.DoesNotExist:
         return JsonResponse({
@@ -563,22 +473,13 @@ def create_final_story(request, story_id):
 @login_required
 def get_story_content(request, story_id):
     try:
-        story = Story.objects.select_related('content').get(id=story_id)
-        
-        # Combine all full_text content from raw_content
-        combined_text = ""
-        raw_content = story.content.raw_content
-        
-        # Sort parts and chapters to maintain order
-        for part_key in sorted(raw_content.keys()):
-            part = raw_content[part_key]
-            for chapter_key in sorted(part.keys()):
-                chapter = part[chapter_key]
-                combined_text += chapter['full_text'] + "\n\n"
+        story = Story.objects.prefetch_related('chapters').get(id=story_id, adventure__user=request.user)
         
+        # 'content' is for display; edits are sent back per chapter
         return JsonResponse({
             'status': 'success',
-            'content': combined_text.strip()
+            'content': get_full_text(story),
+            'chapters': get_chapter_texts(story)
         })
     except Story.DoesNotExist:
         return JsonResponse({
@@ -596,46 +497,31 @@ def get_story_content(request, story_id):
 def update_story_content(request, story_id):
     try:
         data = json.loads(request.body)
-        content = data.get('content', '').strip()
-        
-        story = Story.objects.select_related('content').get(id=story_id)
-        
-        # Split content into parts and chapters
-        paragraphs = [p for p in content.split('\n\n') if p.strip()]
-        
-        # Reconstruct the raw_content structure
-        raw_content = {}
-        current_part = 1
-        current_chapter = 1
-        chapters_per_part = 3  # Adjust based on your structure
-        
-        for i, text in enumerate(paragraphs):
-            part_num = f"part{(i // chapters_per_part) + 1}"
-            chapter_num = f"chapter{(i % chapters_per_part) + 1}"
-            
-            if part_num not in raw_content:
-                raw_content[part_num] = {}
-            
-            raw_content[part_num][chapter_num] = {
-                'full_text': text,
-                'summary': story.content.raw_content.get(part_num, {}).get(chapter_num, {}).get('summary', '')
-            }
+        chapter_texts = data.get('chapters')
+        if not isinstance(chapter_texts, list):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Send the edited text per chapter, as returned in "chapters"'
+            }, status=400)
         
-        # Update the content
-        story.content.raw_content = raw_content
-        story.content.save()
+        story = Story.objects.prefetch_related('chapters').get(id=story_id, adventure__user=request.user)
         
-        # Check if PDF exists and delete it
-        storage_client = storage.Client()
-        bucket = storage_client.bucket('write-res')
-        pdf_blob_name = f"{request.user.id}/adventure_{story.adventure_id}/story_{story_id}/edited.pdf"
-        blob = bucket.blob(pdf_blob_name)
+        # Each chapter's text goes back to that chapter only
+        update_chapter_texts(story, chapter_texts)
         
-        if blob.exists():
-            blob.delete()
+        # Delete the rendered PDF so the next request rebuilds it from the edited text
+        invalidate_story_pdf(
+            story,
+            StoryArtifactStore.for_ids(request.user.id, story.adventure_id, story_id, user_name=request.user.username)
+        )
         
         return JsonResponse({'status': 'success'})
     
+    except ValueError as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=400)
     except Story.DoesNotExist:
         return JsonResponse({
             'status': 'error',
@@ -646,30 +532,3 @@ def update_story_content(request, story_id):
             'status': 'error',
             'message': str(e)
         }, status=500)
-
-def verify_and_get_image(image_path):
-    try:
-        logger.info(f"Starting image verification for: {image_path}")
-        # First verify with PIL
-        with PILImage.open(image_path) as pil_img:
-            pil_img.verify()
-            logger.info("PIL verification passed")
-            # Get image dimensions
-            with PILImage.open(image_path) as pil_img:
-                img_width, img_height = pil_img.size
-                logger.info(f"Image dimensions: {img_width}x{img_height}")
-        
-        # Calculate proportional dimensions
-        img_width = (8.5 * inch) * 0.7
-        img_height = (11 * inch) * 0.7
-
-        # Just pass the file path directly to Image
-        img = Image(image_path, width=img_width, height=img_height)
-        logger.info(f"Image object created: {img}")
-        
-        return img
-    except Exception as e:
-        logger.error(f"Image verification failed: {str(e)}")
-        return None
-
-    
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import List, Optional
+
+from google.cloud import texttospeech
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# How long the in-process voice list stays fresh before list_voices() is called again.
+VOICE_CATALOG_TTL = 24 * 60 * 60  # 24 hours in seconds
+
+# Checked-in copy of the list_voices() response, used when the API can't be reached
+# (local development without credentials, outages) or when TTS_VOICE_CATALOG_OFFLINE is set.
+VOICE_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), 'voices_snapshot.json')
+
+# --- Catalog State ---
+
+_catalog = None
+_catalog_loaded_at = 0.0
+_catalog_lock = threading.Lock()
+
+
+def get_model_family(voice_name: str) -> str:
+    """
+    Returns the model family of a voice name.
+    'en-US-Neural2-C' -> 'Neural2', 'en-US-Chirp3-HD-Aoede' -> 'Chirp3-HD'.
+    """
+    parts = voice_name.split('-')
+    if len(parts) > 3:
+        return '-'.join(parts[2:-1])
+    if len(parts) == 3:
+        return parts[2]
+    return ''
+
+
+def build_catalog(voices: List[dict]) -> dict:
+    """
+    Indexes a list of voice dicts by name, language, gender and model family.
+
+    Args:
+        voices (list): Dicts with 'name', 'language_codes', 'ssml_gender' and
+            'natural_sample_rate_hertz' keys, as returned by list_voices().
+
+    Returns:
+        dict: {'by_name': {...}, 'by_language': {...}, 'by_gender': {...}, 'by_family': {...}}
+    """
+    catalog = {
+        'by_name': {},
+        'by_language': {},
+        'by_gender': {},
+        'by_family': {},
+    }
+    for voice in voices:
+        name = voice['name']
+        entry = {
+            'name': name,
+            'language_codes': list(voice.get('language_codes') or []),
+            'language_code': (voice.get('language_codes') or [''])[0],
+            'ssml_gender': voice.get('ssml_gender', 'SSML_VOICE_GENDER_UNSPECIFIED'),
+            'natural_sample_rate_hertz': voice.get('natural_sample_rate_hertz'),
+            'model_family': get_model_family(name),
+        }
+        catalog['by_name'][name] = entry
+        for language_code in entry['language_codes']:
+            catalog['by_language'].setdefault(language_code, []).append(entry)
+        catalog['by_gender'].setdefault(entry['ssml_gender'], []).append(entry)
+        catalog['by_family'].setdefault(entry['model_family'], []).append(entry)
+    return catalog
+
+
+def fetch_voices_from_api() -> List[dict]:
+    """Calls list_voices() once and converts the response to plain dicts."""
+    client = texttospeech.TextToSpeechClient()
+    response = client.list_voices()
+    return [
+        {
+            'name': voice.name,
+            'language_codes': list(voice.language_codes),
+            'ssml_gender': texttospeech.SsmlVoiceGender(voice.ssml_gender).name,
+            'natural_sample_rate_hertz': voice.natural_sample_rate_hertz,
+        }
+        for voice in response.voices
+    ]
+
+
+def load_voice_snapshot() -> List[dict]:
+    """Reads the checked-in voice snapshot."""
+    with open(VOICE_SNAPSHOT_PATH, 'r') as f:
+        return json.load(f)['voices']
+
+
+def get_voice_catalog(force_refresh: bool = False) -> dict:
+    """
+    Returns the indexed voice catalog, loading it at most once per TTL per process.
+    Falls back to the checked-in snapshot if list_voices() fails.
+    """
+    global _catalog, _catalog_loaded_at
+
+    if not force_refresh and _catalog and time.time() - _catalog_loaded_at < VOICE_CATALOG_TTL:
+        return _catalog
+
+    with _catalog_lock:
+        # Another thread may have refreshed the catalog while we waited for the lock
+        if not force_refresh and _catalog and time.time() - _catalog_loaded_at < VOICE_CATALOG_TTL:
+            return _catalog
+
+        voices = None
+        if not os.environ.get('TTS_VOICE_CATALOG_OFFLINE'):
+            try:
+                voices = fetch_voices_from_api()
+                logger.info(f"Loaded {len(voices)} voices from list_voices()")
+            except Exception as e:
+                logger.warning(f"list_voices() failed, using voice snapshot instead: {e}")
+
+        if not voices:
+            voices = load_voice_snapshot()
+            logger.info(f"Loaded {len(voices)} voices from snapshot {VOICE_SNAPSHOT_PATH}")
+
+        _catalog = build_catalog(voices)
+        _catalog_loaded_at = time.time()
+        return _catalog
+
+
+def get_voice(voice_name: str) -> Optional[dict]:
+    """Returns the catalog entry for a voice name, or None if it doesn't exist."""
+    return get_voice_catalog()['by_name'].get(voice_name)
+
+
+def get_voices_by_language(language_code: str) -> List[dict]:
+    return get_voice_catalog()['by_language'].get(language_code, [])
+
+
+def get_voices_by_gender(ssml_gender: str) -> List[dict]:
+    return get_voice_catalog()['by_gender'].get(ssml_gender.upper(), [])
+
+
+def get_voices_by_family(model_family: str) -> List[dict]:
+    return get_voice_catalog()['by_family'].get(model_family, [])
+
+
+def validate_voice_name(voice_name: str) -> dict:
+    """
+    Returns the catalog entry for voice_name.
+    Raises ValueError if the voice doesn't exist, so synthesis jobs fail before any chunk is sent.
+    """
+    voice = get_voice(voice_name) if voice_name else None
+    if not voice:
+        raise ValueError(f"Unknown TTS voice: {voice_name}")
+    return voice
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0002_usage_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usagecounter',
+            name='stories_reserved',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
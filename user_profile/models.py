@@ -43,3 +43,29 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s Profile - {self.tier.title()}"
 
 # Remove the post_save signals for now since we'll handle profile creation manually
+
+
+class UsageCounter(models.Model):
+    """
+    Stories a user created in one limit period: a 30-day window anchored on sign-up for
+    the free tier, a calendar day for daily and family. Tier checks read this one row
+    instead of counting stories.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='usage_counters'
+    )
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    stories_created = models.PositiveIntegerField(default=0)
+    # Submitted stories still generating; they hold a slot until committed or released
+    stories_reserved = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period_start')
+
+    def __str__(self):
+        return f"User {self.user_id} usage from {self.period_start:%Y-%m-%d}: {self.stories_created}"